@@ -0,0 +1,463 @@
+"""Content fingerprints of audio files, for finding duplicate tracks.
+
+Usage: python3 cli/audio_fingerprint.py [ROOT] [--workers 4] [--every SECONDS]
+
+The fingerprint is a BLAKE2b hash of the audio payload only: ID3v2/ID3v1/APE
+tags of MP3s, FLAC metadata blocks, MP4 atoms other than mdat, Ogg header
+packets and page headers, RIFF/AIFF chunks other than the sound data are
+skipped. Retagging a file (genre, lyrics, cover) keeps its fingerprint; two
+downloads of the same encoded audio share it. Files are read in small chunks
+and digests are cached in var/storage/fingerprint_index.sqlite by path, size
+and mtime, so only new or modified files are hashed again.
+
+Prints the groups of files below ROOT whose audio is identical, as JSON.
+ROOT defaults to music_library_path from the config. With --every, keeps the
+index of the library current instead (supervisord program `fingerprints`):
+a pass every SECONDS while music_library_dedupe is enabled, so the library
+move (`tag_rename_move.py --dedupe`) only has to look digests up. Digests are
+committed in batches, so an interrupted pass keeps its progress.
+"""
+import os
+import sys
+import json
+import signal
+import struct
+import sqlite3
+import hashlib
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tag_index import STORAGE_DIR
+from crawler import scan_files, entry_stat
+
+INDEX_FILE = os.path.join(STORAGE_DIR, 'fingerprint_index.sqlite')
+CONFIG_FILE = os.path.join(STORAGE_DIR, 'config.json')
+# Digests are committed every COMMIT_EVERY writes or COMMIT_INTERVAL seconds, whichever comes first
+COMMIT_EVERY = 200
+COMMIT_INTERVAL = 2.0
+BUFFER_SIZE = 64 * 1024
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.m4a', '.mp4', '.aac', '.ogg', '.opus', '.oga', '.wav', '.aif', '.aiff')
+
+def syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def mpeg_ranges(f, size):
+    """MP3 (and bare AAC/ADTS): everything between the leading ID3v2 tags and the trailing APE/Lyrics3/ID3v1 tags."""
+    start = 0
+    while True:
+        f.seek(start)
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b'ID3':
+            break
+        start += 10 + syncsafe(header[6:10]) + (10 if header[5] & 0x10 else 0)
+
+    end = size
+    while end > start:
+        if end - start >= 128:
+            f.seek(end - 128)
+            if f.read(3) == b'TAG':
+                end -= 128
+                continue
+        if end - start >= 32:
+            f.seek(end - 32)
+            footer = f.read(32)
+            if footer[:8] == b'APETAGEX':
+                tag_size, flags = struct.unpack('<II', footer[12:20])
+                end -= tag_size + (32 if flags & 0x80000000 else 0)
+                continue
+        if end - start >= 15:
+            f.seek(end - 15)
+            trailer = f.read(15)
+            if trailer[6:] == b'LYRICS200' and trailer[:6].isdigit():
+                end -= 15 + int(trailer[:6])
+                continue
+        break
+    return [(start, max(start, end))]
+
+def flac_ranges(f, size):
+    """FLAC: the frames after the last metadata block (an ID3v2 prefix is skipped too)."""
+    start = mpeg_ranges(f, size)[0][0]
+    f.seek(start)
+    if f.read(4) != b'fLaC':
+        return None
+    offset = start + 4
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            return None
+        length = int.from_bytes(header[1:4], 'big')
+        offset += 4 + length
+        if header[0] & 0x80:
+            break
+        f.seek(offset)
+    end = mpeg_ranges(f, size)[0][1]
+    return [(offset, max(offset, end))]
+
+def mp4_ranges(f, size):
+    """MP4/M4A: the contents of the top-level mdat atoms (moov, udta, free, ... are metadata)."""
+    ranges = []
+    offset = 0
+    while offset + 8 <= size:
+        f.seek(offset)
+        header = f.read(8)
+        atom_size, kind = struct.unpack('>I4s', header)
+        header_size = 8
+        if atom_size == 1:
+            atom_size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = size - offset
+        if atom_size < header_size:
+            return None
+        if kind == b'mdat':
+            ranges.append((offset + header_size, min(size, offset + atom_size)))
+        offset += atom_size
+    return ranges or None
+
+def riff_ranges(f, size):
+    """WAV (RIFF, little endian) and AIFF (FORM, big endian): the data / SSND chunk."""
+    f.seek(0)
+    header = f.read(12)
+    order = '<I' if header[:4] == b'RIFF' else '>I'
+    wanted = b'data' if header[:4] == b'RIFF' else b'SSND'
+    offset = 12
+    while offset + 8 <= size:
+        f.seek(offset)
+        chunk = f.read(8)
+        chunk_size = struct.unpack(order, chunk[4:8])[0]
+        if chunk[:4] == wanted:
+            return [(offset + 8, min(size, offset + 8 + chunk_size))]
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+def ogg_header_packets(first_packet):
+    if first_packet.startswith(b'\x01vorbis'):
+        return 3
+    if first_packet.startswith(b'OpusHead'):
+        return 2
+    if first_packet.startswith(b'\x7fFLAC') and len(first_packet) >= 9:
+        return 1 + struct.unpack('>H', first_packet[7:9])[0]
+    return 1
+
+def hash_ogg(f, digest):
+    """Ogg: hashes the page payloads of the first stream once its header packets are over.
+
+    Page headers (sequence numbers, CRCs) change whenever the comment packet is
+    rewritten, so they are left out. Returns the number of bytes hashed.
+    """
+    serial = None
+    headers_left = None
+    packets = 0
+    first_packet = b''
+    hashed = 0
+    while True:
+        header = f.read(27)
+        if len(header) < 27 or header[:4] != b'OggS':
+            break
+        page_serial = struct.unpack('<I', header[14:18])[0]
+        lacing = f.read(header[26])
+        length = sum(lacing)
+        if serial is None:
+            serial = page_serial
+        if page_serial != serial:
+            f.seek(length, os.SEEK_CUR)
+            continue
+        if headers_left is None or packets < headers_left:
+            payload = f.read(length)
+            if headers_left is None:
+                first_packet = payload[:lacing[0]] if lacing and lacing[0] < 255 else payload[:64]
+                headers_left = ogg_header_packets(first_packet)
+            # A lacing value below 255 ends a packet; audio always starts on a fresh page
+            packets += sum(1 for value in lacing if value < 255)
+            continue
+        remaining = length
+        while remaining:
+            chunk = f.read(min(BUFFER_SIZE, remaining))
+            if not chunk:
+                return hashed
+            digest.update(chunk)
+            remaining -= len(chunk)
+            hashed += len(chunk)
+    return hashed
+
+def hash_ranges(f, ranges, digest, buffer_size=BUFFER_SIZE):
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    hashed = 0
+    for start, end in ranges:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            n = f.readinto(view[:min(buffer_size, remaining)])
+            if not n:
+                break
+            digest.update(view[:n])
+            remaining -= n
+            hashed += n
+    return hashed
+
+def audio_digest(path, buffer_size=BUFFER_SIZE):
+    """Hex digest of the audio payload of a file, or None if it has no audio data."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        magic = f.read(12)
+        if magic[:4] == b'OggS':
+            kind, ranges = b'ogg', None
+        elif magic[:4] == b'fLaC' or (magic[:3] == b'ID3' and path.lower().endswith('.flac')):
+            kind, ranges = b'flac', flac_ranges(f, size)
+        elif magic[4:8] == b'ftyp':
+            kind, ranges = b'mp4', mp4_ranges(f, size)
+        elif magic[:4] in (b'RIFF', b'FORM'):
+            kind, ranges = magic[:4].lower(), riff_ranges(f, size)
+        else:
+            kind, ranges = b'mpeg', mpeg_ranges(f, size)
+
+        # The container kind is hashed first: equal bytes in two codecs are not the same audio
+        digest = hashlib.blake2b(kind, digest_size=16)
+        if kind == b'ogg':
+            f.seek(0)
+            hashed = hash_ogg(f, digest)
+        else:
+            # Unknown layout: the whole file is better than no fingerprint
+            hashed = hash_ranges(f, ranges or [(0, size)], digest, buffer_size)
+    return digest.hexdigest() if hashed else None
+
+class FingerprintIndex:
+    """Persistent cache of audio digests, keyed by path and validated by size + mtime.
+
+    Same rules as the tag index: a digest is only served for a file whose size
+    and mtime are unchanged. Safe to share between threads.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or INDEX_FILE
+        self.lock = threading.Lock()
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            ' path TEXT PRIMARY KEY,'
+            ' size INTEGER NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' digest TEXT'
+            ')'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS fingerprints_digest ON fingerprints (digest)')
+        self.conn.commit()
+        self.pending = 0
+        self.first_pending = 0.0
+
+    def _written(self):
+        # Called under self.lock after each write; keeps the write lock short for other processes
+        if not self.pending:
+            self.first_pending = time.monotonic()
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY or time.monotonic() - self.first_pending >= COMMIT_INTERVAL:
+            self.conn.commit()
+            self.pending = 0
+
+    def lookup(self, path, size, mtime_ns):
+        """Returns (True, digest) for an unchanged file (digest may be None), (False, None) otherwise."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT size, mtime_ns, digest FROM fingerprints WHERE path = ?', (path,)
+            ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return False, None
+        return True, row[2]
+
+    def store(self, path, size, mtime_ns, digest):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)',
+                (path, size, mtime_ns, digest)
+            )
+            self._written()
+
+    def claim(self, digest, path, size, mtime_ns, root=None):
+        """Returns a file below root that still has this digest, or registers path for it and returns None.
+
+        Only rows matching the file on disk (size + mtime) count. Check and
+        registration happen under one lock.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT path, size, mtime_ns FROM fingerprints WHERE digest = ?', (digest,)
+            ).fetchall()
+            prefix = os.path.join(root, '') if root else ''
+            for other, other_size, other_mtime_ns in rows:
+                if not other.startswith(prefix):
+                    continue
+                try:
+                    st = os.stat(other)
+                except OSError:
+                    continue
+                if st.st_size == other_size and st.st_mtime_ns == other_mtime_ns:
+                    return other
+            self.conn.execute(
+                'INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)',
+                (path, size, mtime_ns, digest)
+            )
+            self._written()
+        return None
+
+    def prune(self, root, seen_paths):
+        """Removes rows below root that were not seen during the last full crawl."""
+        prefix = os.path.join(root, '')
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT path FROM fingerprints WHERE substr(path, 1, ?) = ?', (len(prefix), prefix)
+            ).fetchall()
+            stale = [(path,) for (path,) in rows if path not in seen_paths]
+            if stale:
+                self.conn.executemany('DELETE FROM fingerprints WHERE path = ?', stale)
+        return len(stale)
+
+    def duplicate_groups(self, root):
+        """Lists of (path, size) below root sharing one digest, largest groups first."""
+        prefix = os.path.join(root, '')
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT digest, path, size FROM fingerprints WHERE digest IN ('
+                ' SELECT digest FROM fingerprints WHERE digest IS NOT NULL AND substr(path, 1, ?) = ?'
+                ' GROUP BY digest HAVING COUNT(*) > 1'
+                ') AND substr(path, 1, ?) = ? ORDER BY digest, path',
+                (len(prefix), prefix, len(prefix), prefix)
+            ).fetchall()
+        groups = {}
+        for digest, path, size in rows:
+            groups.setdefault(digest, []).append((path, size))
+        return sorted(groups.items(), key=lambda item: -len(item[1]))
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        try:
+            self.commit()
+        finally:
+            self.conn.close()
+
+def open_fingerprint_index(db_path=None):
+    """Opens the persistent index, falling back to a session-only one if storage is unavailable."""
+    try:
+        return FingerprintIndex(db_path)
+    except (sqlite3.Error, OSError):
+        return FingerprintIndex(':memory:')
+
+def safe_audio_digest(path):
+    try:
+        return audio_digest(path)
+    except (OSError, struct.error, ValueError):
+        return None
+
+def fingerprint(path, index=None):
+    """Digest of a file's audio, served from the index when the file is unchanged."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if index is not None:
+        cached, digest = index.lookup(path, st.st_size, st.st_mtime_ns)
+        if cached:
+            return digest
+    digest = safe_audio_digest(path)
+    if index is not None:
+        index.store(path, st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+def index_directory(root, index, workers=4, prune=True):
+    """Brings the fingerprints of every audio file below root up to date; returns counters."""
+    stats = {'files': 0, 'cached': 0, 'hashed': 0}
+    seen = set()
+    todo = []
+    for entry in scan_files(root, AUDIO_EXTENSIONS):
+        st = entry_stat(entry)
+        if st is None:
+            continue
+        stats['files'] += 1
+        seen.add(entry.path)
+        if index.lookup(entry.path, st.st_size, st.st_mtime_ns)[0]:
+            stats['cached'] += 1
+        else:
+            todo.append((entry.path, st.st_size, st.st_mtime_ns))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for (path, size, mtime_ns), digest in zip(todo, executor.map(lambda item: safe_audio_digest(item[0]), todo)):
+            index.store(path, size, mtime_ns, digest)
+            stats['hashed'] += 1
+    if prune:
+        stats['pruned'] = index.prune(root, seen)
+    index.commit()
+    return stats
+
+def load_config():
+    try:
+        with open(CONFIG_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def keep_indexed(root, every, workers=4):
+    """Background mode: indexes the library every `every` seconds while dedupe is enabled."""
+    while True:
+        config = load_config()
+        path = root or config.get('music_library_path', '')
+        if config.get('music_library_dedupe') and path and os.path.isdir(path):
+            index = open_fingerprint_index()
+            try:
+                stats = index_directory(os.path.abspath(path), index, workers=workers)
+            finally:
+                index.close()
+            print(json.dumps(dict(stats, root=path, time=time.time())), file=sys.stderr, flush=True)
+        time.sleep(every)
+
+def main():
+    argv = sys.argv[1:]
+    options = {'--workers': 4, '--every': None}
+    for name in options:
+        if name in argv:
+            try:
+                options[name] = int(argv[argv.index(name) + 1])
+            except (IndexError, ValueError):
+                pass
+    workers = options['--workers']
+    positional = [arg for i, arg in enumerate(argv) if not arg.startswith('--') and (i == 0 or argv[i - 1] not in options)]
+
+    if options['--every']:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        keep_indexed(positional[0] if positional else None, options['--every'], workers=workers)
+        return
+
+    root = positional[0] if positional else load_config().get('music_library_path', '')
+    if not root or not os.path.isdir(root):
+        print(json.dumps({'error': 'Usage: audio_fingerprint.py [ROOT] [--workers 4] [--every SECONDS]'}))
+        sys.exit(1)
+    root = os.path.abspath(root)
+
+    index = open_fingerprint_index()
+    try:
+        stats = index_directory(root, index, workers=workers)
+        groups = []
+        for digest, files in index.duplicate_groups(root):
+            groups.append({
+                'digest': digest,
+                'files': [{'path': path, 'size': size} for path, size in files],
+                # Keeping one copy per group; tags may differ, so the sizes may too
+                'wasted_bytes': sum(size for _, size in files) - max(size for _, size in files),
+            })
+    finally:
+        index.close()
+
+    stats['groups'] = len(groups)
+    stats['wasted_bytes'] = sum(group['wasted_bytes'] for group in groups)
+    print(json.dumps({'stats': stats, 'groups': groups}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Counts the filesystem syscalls of the old walk loops vs crawler.scan_files().
+
+Usage: python3 cli/benchmarks/bench_crawler.py [--artists 200] [--tracks 25] [--strace]
+
+Each pass lists the audio files of a synthetic Artist/track tree and gets
+their size + mtime, like the music files page does. Calls are counted at the
+os module boundary: every os.stat / os.lstat / os.listdir / os.scandir call
+is one syscall (os.path.isfile/getsize/getmtime go through os.stat), and so
+is the first stat() of a DirEntry (is_dir/is_file come from d_type, except
+for symlinks). With --strace and strace on PATH, each pass also runs in a
+child process under `strace -c` for kernel-side numbers.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawler
+
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.m4a', '.opus', '.ogg', '.wav')
+
+class Counter:
+    """Patches the os functions used by the crawl loops and counts the calls."""
+
+    def __init__(self):
+        self.counts = {}
+        self.originals = {}
+
+    def bump(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def wrap(self, name):
+        original = getattr(os, name)
+        self.originals[name] = original
+
+        def counted(*args, **kwargs):
+            self.bump(name)
+            return original(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        for name in ('stat', 'lstat', 'listdir'):
+            setattr(os, name, self.wrap(name))
+        scandir = os.scandir
+        self.originals['scandir'] = scandir
+        counter = self
+
+        class CountingScandir:
+            def __init__(self, path='.'):
+                counter.bump('scandir')
+                self.it = scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.it.close()
+
+            def __iter__(self):
+                return (CountingEntry(entry, counter) for entry in self.it)
+
+            def __next__(self):
+                return CountingEntry(next(self.it), counter)
+
+            def close(self):
+                self.it.close()
+
+        os.scandir = CountingScandir
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self.originals.items():
+            setattr(os, name, original)
+
+class CountingEntry:
+    """DirEntry proxy counting the syscalls the real DirEntry would make (its stat cache included)."""
+
+    def __init__(self, entry, counter):
+        self.entry = entry
+        self.counter = counter
+        self.name = entry.name
+        self.path = entry.path
+        self.cached = set()
+
+    def __fspath__(self):
+        return self.path
+
+    def _stat_cost(self, follow_symlinks):
+        key = bool(follow_symlinks) and self.entry.is_symlink()
+        if key not in self.cached:
+            self.cached.add(key)
+            self.counter.bump('direntry.stat')
+
+    def stat(self, follow_symlinks=True):
+        self._stat_cost(follow_symlinks)
+        return self.entry.stat(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self.entry.is_symlink()
+
+    def is_dir(self, follow_symlinks=True):
+        if follow_symlinks and self.entry.is_symlink():
+            self._stat_cost(True)
+        return self.entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        if follow_symlinks and self.entry.is_symlink():
+            self._stat_cost(True)
+        return self.entry.is_file(follow_symlinks=follow_symlinks)
+
+def legacy_getsize_getmtime(root):
+    # Original verify_directory: os.walk + getsize + getmtime per file
+    found = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                path = os.path.join(directory, name)
+                found.append((path, os.path.getsize(path), os.path.getmtime(path)))
+    return found
+
+def legacy_listdir_isfile(root):
+    # Lyrics fetcher / tag_rename_move style: listdir + isfile + stat, one level per call
+    found = []
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                pending.append(path)
+            elif os.path.isfile(path) and name.lower().endswith(AUDIO_EXTENSIONS):
+                st = os.stat(path)
+                found.append((path, st.st_size, st.st_mtime))
+    return found
+
+def walk_stat(root):
+    # os.walk + one os.stat per file
+    found = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                path = os.path.join(directory, name)
+                st = os.stat(path)
+                found.append((path, st.st_size, st.st_mtime))
+    return found
+
+def scandir_crawler(root):
+    found = []
+    for entry in crawler.scan_files(root, AUDIO_EXTENSIONS):
+        st = crawler.entry_stat(entry)
+        if st is not None:
+            found.append((entry.path, st.st_size, st.st_mtime))
+    return found
+
+PASSES = {
+    'os.walk + getsize + getmtime': legacy_getsize_getmtime,
+    'listdir + isfile + stat': legacy_listdir_isfile,
+    'os.walk + stat': walk_stat,
+    'crawler.scan_files': scandir_crawler,
+}
+
+def build_tree(root, artists, tracks):
+    for a in range(artists):
+        artist_dir = os.path.join(root, f"Artist {a:04d}")
+        os.makedirs(artist_dir)
+        for t in range(tracks):
+            open(os.path.join(artist_dir, f"Artist {a:04d} - Album - {t:02d} - Song.mp3"), 'wb').close()
+        open(os.path.join(artist_dir, 'cover.jpg'), 'wb').close()
+
+def run_strace(label, root):
+    code = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); "
+            f"import bench_crawler as b; b.PASSES[{label!r}]({root!r})")
+    result = subprocess.run(['strace', '-f', '-c', '-e', 'trace=%file,getdents64', sys.executable, '-c', code],
+                            capture_output=True, text=True)
+    for line in result.stderr.splitlines():
+        if line.strip().endswith('total'):
+            return int(line.split()[2])
+    return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--artists', type=int, default=200)
+    parser.add_argument('--tracks', type=int, default=25)
+    parser.add_argument('--strace', action='store_true', help='Also count kernel syscalls with strace -c')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_crawler_')
+    try:
+        build_tree(workdir, args.artists, args.tracks)
+        use_strace = args.strace and shutil.which('strace')
+        report = []
+        reference = None
+        for label, func in PASSES.items():
+            with Counter() as counter:
+                started = time.perf_counter()
+                found = func(workdir)
+                elapsed = time.perf_counter() - started
+            paths = sorted(path for path, _, _ in found)
+            reference = reference or paths
+            row = {'pass': label, 'files': len(found), 'seconds': round(elapsed, 4),
+                   'syscalls': sum(counter.counts.values()), 'by_call': counter.counts,
+                   'same_files': paths == reference}
+            if use_strace:
+                row['strace_total'] = run_strace(label, workdir)
+            report.append(row)
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Micro-benchmark of genre mapping: legacy per-call loop vs GenreMapper.
+
+Usage: python3 cli/benchmarks/bench_genre_mapping.py [--patterns 300] [--genres 20000] [--distinct 3000]
+
+The legacy pass replays the old map_genre() (json.loads + re.search loop on
+every call). The mapper is timed without memo (combined regex only) and with
+memo through map_many(). Every pass must return the same list.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from genre_mapping import GenreMapper
+
+BASE_PATTERNS = {
+    r'hip.?hop|rap|trap': 'Rap & Hip-Hop',
+    r'\brock\b|grunge|punk': 'Rock',
+    r'electro|house|techno|edm|dubstep': 'Electro',
+    r'jazz|swing|bebop': 'Jazz',
+    r'^pop$|k-pop|synthpop': 'Pop',
+    r'r&b|soul|funk': 'R&B / Soul',
+    r'classical|orchestra|baroque': 'Classique',
+}
+WORDS = ['indie', 'alt', 'dark', 'neo', 'deep', 'post', 'french', 'latin', 'afro', 'lo-fi', 'acid', 'nu']
+
+def legacy_map_genre(genre, mapping_json):
+    if not genre:
+        return "Unknown"
+    try:
+        patterns = json.loads(mapping_json).get('genre_patterns', {})
+    except:
+        return genre
+    genre_lower = str(genre).lower()
+    for pattern, mapped_genre in patterns.items():
+        try:
+            if re.search(pattern, genre_lower):
+                return mapped_genre
+        except re.error:
+            continue
+    return genre
+
+def build_patterns(count, rng):
+    patterns = {}
+    for i in range(count - len(BASE_PATTERNS)):
+        patterns[rf"\b{rng.choice(WORDS)}[ -]?style{i:03d}\b"] = f"Target {i % 40:02d}"
+    patterns.update(BASE_PATTERNS)  # realistic catch-all patterns come last
+    return patterns
+
+def build_genres(distinct, total, rng):
+    pool = []
+    for i in range(distinct):
+        kind = rng.random()
+        if kind < 0.3:
+            pool.append(f"{rng.choice(WORDS)} style{rng.randint(0, 400):03d}")
+        elif kind < 0.8:
+            pool.append(f"{rng.choice(WORDS).title()} {rng.choice(['Rock', 'Hip Hop', 'House', 'Jazz', 'Pop', 'Soul'])}")
+        else:
+            pool.append(f"Obscure Genre {i}")
+    return [rng.choice(pool) for _ in range(total)]
+
+def timed(label, func, genres):
+    started = time.perf_counter()
+    result = func(genres)
+    elapsed = time.perf_counter() - started
+    return result, {'pass': label, 'genres': len(genres), 'seconds': round(elapsed, 4),
+                    'us_per_genre': round(elapsed / len(genres) * 1e6, 2)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--patterns', type=int, default=300)
+    parser.add_argument('--genres', type=int, default=20000)
+    parser.add_argument('--distinct', type=int, default=3000)
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    patterns = build_patterns(args.patterns, rng)
+    mapping_json = json.dumps({'genre_patterns': patterns})
+    genres = build_genres(args.distinct, args.genres, rng)
+
+    def unmemoised(items):
+        mapper = GenreMapper(patterns)
+        return [mapper._lookup(g.lower()) or g for g in items]
+
+    runs = [
+        timed('legacy map_genre', lambda items: [legacy_map_genre(g, mapping_json) for g in items], genres),
+        timed('combined regex, no memo', unmemoised, genres),
+        timed('map_many (combined + memo)', lambda items: GenreMapper.from_json(mapping_json).map_many(items), genres),
+    ]
+    reference = runs[0][0]
+    report = []
+    for result, stats in runs:
+        stats['identical'] = result == reference
+        report.append(stats)
+    print(json.dumps({'patterns': len(patterns), 'distinct_genres': len(set(genres)), 'runs': report}, indent=2))
+
+if __name__ == '__main__':
+    main()
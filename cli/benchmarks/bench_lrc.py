@@ -0,0 +1,123 @@
+"""Compares the old has_synced_lyrics check with lrc.lyrics_kind and lrc.parse_lrc.
+
+Usage: python3 cli/benchmarks/bench_lrc.py [--docs 2000] [--lines 400] [--repeat 3]
+
+The corpus mixes large synced LRC files (ID tags, multi-stamp and word-timed
+lines), Genius-style unsynced lyrics with [Chorus] / [Verse 1: Artist]
+headers, partially synced files and plain text. For each classifier: time,
+MB/s and how many documents got the expected label. The old check only
+answers synced or not, so it is scored on that question.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lrc import KIND_PARTIAL, KIND_SYNCED, KIND_UNSYNCED, lyrics_kind, parse_lrc
+
+WORDS = ('love', 'night', 'baby', 'fire', 'heart', 'dance', 'light', 'time', 'rain', 'home', 'oh', 'yeah')
+SECTIONS = ('[Intro]', '[Chorus]', '[Pre-Chorus]', '[Bridge]', '[Outro]', '[Verse 1: {artist}]', '[Verse 2]')
+
+def legacy_has_synced_lyrics(lyrics):
+    # LyricsFetcher.has_synced_lyrics before lrc.py
+    if not lyrics: return False
+    for line in lyrics.split('\n'):
+        line = line.strip()
+        if line.startswith('[') and ']' in line:
+            content = line.split(']')[0][1:]
+            try:
+                parts = content.split(':')
+                if len(parts) >= 2: return True
+            except: continue
+    return False
+
+def lyric_line(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 9)))
+
+def stamp(ms):
+    return f"[{ms // 60000:02d}:{ms // 1000 % 60:02d}.{ms % 1000 // 10:02d}]"
+
+def make_synced(rng, lines):
+    out = ['[ar:Artist]', '[ti:Title]', '[offset:+120]']
+    ms = 0
+    for i in range(lines):
+        ms += rng.randint(1500, 4000)
+        if i % 17 == 0:
+            out.append(stamp(ms) + stamp(ms + 60000) + lyric_line(rng))
+        elif i % 11 == 0:
+            out.append(stamp(ms) + ' '.join(f"<{stamp(ms + k * 300)[1:-1]}>{word}" for k, word in enumerate(lyric_line(rng).split())))
+        else:
+            out.append(stamp(ms) + lyric_line(rng))
+    return '\r\n'.join(out) if rng.random() < 0.3 else '\n'.join(out)
+
+def make_genius(rng, lines):
+    out = []
+    for i in range(lines):
+        if i % 8 == 0:
+            if out:
+                out.append('')
+            out.append(rng.choice(SECTIONS).format(artist='Someone'))
+        out.append(lyric_line(rng))
+    return '\n'.join(out)
+
+def make_partial(rng, lines):
+    out = make_synced(rng, lines).splitlines()
+    for i in range(len(out) // 3, len(out), 9):
+        out[i] = lyric_line(rng)
+    return '\n'.join(out)
+
+def make_plain(rng, lines):
+    return '\n'.join(lyric_line(rng) for _ in range(lines))
+
+def build_corpus(count, lines, seed=1234):
+    rng = random.Random(seed)
+    makers = ((make_synced, KIND_SYNCED), (make_genius, KIND_UNSYNCED), (make_partial, KIND_PARTIAL), (make_plain, KIND_UNSYNCED))
+    corpus = []
+    for i in range(count):
+        maker, label = makers[i % len(makers)]
+        corpus.append((maker(rng, rng.randint(lines // 2, lines)), label))
+    return corpus
+
+def measure(label, classify, corpus, score, repeat):
+    size = sum(len(text.encode('utf-8')) for text, _ in corpus)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        answers = [classify(text) for text, _ in corpus]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    correct = sum(1 for answer, (_, expected) in zip(answers, corpus) if score(answer, expected))
+    return {
+        'classifier': label,
+        'docs': len(corpus),
+        'mb': round(size / 1024 / 1024, 2),
+        'seconds': round(best, 3),
+        'mb_per_s': round(size / 1024 / 1024 / best, 1) if best else None,
+        'correct': correct,
+        'accuracy': round(correct / len(corpus), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--lines', type=int, default=400, help='Maximum lines per document')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per classifier (best time is kept)')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.docs, args.lines)
+    results = [
+        measure('has_synced_lyrics (old)', legacy_has_synced_lyrics, corpus,
+                lambda answer, expected: answer == (expected == KIND_SYNCED), args.repeat),
+        measure('lrc.lyrics_kind', lyrics_kind, corpus,
+                lambda answer, expected: answer == expected, args.repeat),
+        measure('lrc.parse_lrc', parse_lrc, corpus,
+                lambda answer, expected: answer['kind'] == expected, args.repeat),
+    ]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""Runs the cli/ entry points against a synthetic library and reports comparable numbers.
+
+Usage: python3 cli/benchmarks/bench_suite.py [--files 500] [--art-kb 300] [--lyrics-lines 60]
+           [--depth 2] [--cases verify_cold,lyrics_fetch] [--latency-ms 0]
+           [--output run.json] [--compare baseline.json]
+
+Cases (each one runs the script's own main() in a fresh child process):
+
+    verify_cold     music_downloader.py --verify -r, empty tag index
+    verify_warm     the same again, every file served from the index
+    verify_full     --verify -r --no-index --full-tags (music_tag reader)
+    lyrics_fetch    lyrics_fetcher.py -r -f -u --json against stub lrclib/Genius
+                    (provider rate limits lifted unless --provider-limits)
+    lyrics_save     the same with -s, on a copy of the library
+    tag_move        tag_rename_move.py from a flat copy of the MP3s into a new library, stub Grok
+
+The child patches the storage paths (tag index, config) and the provider URLs,
+then records wall time, peak RSS (ru_maxrss) and the read/write syscall and
+byte counters of /proc/self/io (Linux). Worker processes (--workers > 1) are
+covered too: once reaped, their counters are added to the parent's
+/proc/self/io, and the largest worker's peak RSS is reported on its own as
+children_peak_rss_kb (RUSAGE_CHILDREN keeps a maximum, not a sum, so it is
+not added to peak_rss_kb). The output is one JSON document;
+--compare prints the ratio of each number to a previous run's.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CLI_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, CLI_DIR)
+
+from synthetic_library import generate_mixed_library
+from stub_servers import GENRES, stub_grok, stub_lrclib, stub_genius
+
+CASES = ('verify_cold', 'verify_warm', 'verify_full', 'lyrics_fetch', 'lyrics_save', 'tag_move')
+COMPARED = ('seconds', 'files_per_s', 'peak_rss_kb', 'children_peak_rss_kb', 'read_calls', 'write_calls', 'bytes_read', 'bytes_written')
+
+def read_proc_io():
+    counters = {}
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                key, value = line.split(':')
+                counters[key.strip()] = int(value)
+    except OSError:
+        pass
+    return counters
+
+# --- Child side ---
+
+def run_child(spec):
+    """Runs one entry point in this process and returns its measurements."""
+    import tag_index
+    tag_index.INDEX_FILE = spec['index_file']
+
+    if spec['script'] == 'music_downloader':
+        import music_downloader as module
+    elif spec['script'] == 'lyrics_fetcher':
+        import lyrics_fetcher as module
+        module.CONFIG_FILE = spec['config_file']
+        module.SOURCES['lrclib'] = spec['lrclib'] + '/api/'
+        module.SOURCES['genius'] = spec['genius'] + '/'
+    else:
+        import tag_rename_move as module
+
+    sys.argv = [spec['script'] + '.py'] + spec['argv']
+    before = read_proc_io()
+    started = time.perf_counter()
+    returncode = 0
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            module.main()
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        finally:
+            sys.stdout = stdout
+    elapsed = time.perf_counter() - started
+    # Reaps the pool workers that have exited, so their I/O is in /proc/self/io
+    multiprocessing.active_children()
+    after = read_proc_io()
+    counters = {key: after[key] - before.get(key, 0) for key in after}
+    return {
+        'seconds': round(elapsed, 3),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'children_peak_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        'read_calls': counters.get('syscr'),
+        'write_calls': counters.get('syscw'),
+        'bytes_read': counters.get('rchar'),
+        'bytes_written': counters.get('wchar'),
+        'returncode': returncode,
+    }
+
+# --- Parent side ---
+
+def case_spec(case, workdir, library, files, servers, workers):
+    spec = {
+        'index_file': os.path.join(workdir, 'tag_index.sqlite'),
+        'config_file': os.path.join(workdir, 'config.json'),
+        'lrclib': servers['lrclib'].url,
+        'genius': servers['genius'].url,
+    }
+    if case.startswith('verify'):
+        spec['script'] = 'music_downloader'
+        spec['argv'] = ['--verify', library, '--recursive', '--workers', str(workers)]
+        if case == 'verify_full':
+            spec['argv'] += ['--no-index', '--full-tags']
+        return spec
+
+    if case.startswith('lyrics'):
+        target = library
+        if case == 'lyrics_save':
+            target = os.path.join(workdir, 'lyrics_copy')
+            shutil.rmtree(target, ignore_errors=True)
+            shutil.copytree(library, target)
+        spec['script'] = 'lyrics_fetcher'
+        spec['argv'] = [target, '-r', '-f', '-u', '--json', '--no-cache', '--no-index', '--workers', str(workers)]
+        if case == 'lyrics_save':
+            spec['argv'].append('-s')
+        return spec
+
+    # tag_rename_move reads the top level of --source and only .mp3 files
+    source = os.path.join(workdir, 'move_source')
+    target = os.path.join(workdir, 'move_library')
+    for directory in (source, target):
+        shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(source)
+    for path in files:
+        if path.endswith('.mp3'):
+            shutil.copy2(path, os.path.join(source, os.path.basename(path)))
+    mapping = json.dumps({'genre_patterns': {genre.lower(): genre for genre in GENRES}})
+    spec['script'] = 'tag_rename_move'
+    spec['argv'] = ['--source', source, '--library', target, '--grok-key', 'stub',
+                    '--grok-endpoint', servers['grok'].url + '/v1/chat/completions', '--grok-model', 'stub',
+                    '--mapping', mapping, '--no-genre-store', '--workers', str(workers)]
+    return spec
+
+def count_files(spec):
+    if spec['script'] == 'tag_rename_move':
+        source = spec['argv'][spec['argv'].index('--source') + 1]
+        return len(os.listdir(source))
+    root = spec['argv'][1] if spec['script'] == 'music_downloader' else spec['argv'][0]
+    extensions = ('.mp3', '.m4a') if spec['script'] == 'lyrics_fetcher' else ('.mp3', '.flac', '.m4a', '.ogg', '.opus')
+    return sum(1 for _, _, names in os.walk(root) for name in names if name.lower().endswith(extensions))
+
+def run_case(case, spec, servers):
+    files = count_files(spec)
+    requests_before = {name: len(server.requests) for name, server in servers.items()}
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(spec)],
+                             capture_output=True, text=True)
+    try:
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        result = {'returncode': process.returncode, 'error': process.stderr.strip()[-500:]}
+    result = dict({'case': case, 'files': files}, **result)
+    if result.get('seconds'):
+        result['files_per_s'] = round(files / result['seconds'], 1)
+    result['http_requests'] = {name: len(server.requests) - requests_before[name] for name, server in servers.items()
+                               if len(server.requests) > requests_before[name]}
+    return result
+
+def compare(results, baseline):
+    """Ratio current / baseline for every shared case and number (lower is better, except files_per_s)."""
+    previous = {item['case']: item for item in baseline.get('results', [])}
+    ratios = {}
+    for item in results:
+        old = previous.get(item['case'])
+        if not old:
+            continue
+        ratios[item['case']] = {key: round(item[key] / old[key], 3) for key in COMPARED
+                                if item.get(key) and old.get(key)}
+    return ratios
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--art-kb', type=int, default=300, help='Embedded cover size per file')
+    parser.add_argument('--lyrics-lines', type=int, default=60, help='Synced lyrics lines already embedded per file')
+    parser.add_argument('--depth', type=int, default=2, help='Directory levels (0 flat, 1 Artist/, 2 Artist/Album/, ...)')
+    parser.add_argument('--kinds', default='mp3,flac,m4a,ogg,opus')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every stub HTTP response')
+    parser.add_argument('--provider-limits', action='store_true',
+                        help="Keep lyrics_fetcher's lrclib/Genius rate limits (lifted by default to time the code, not the limiter)")
+    parser.add_argument('--cases', default=','.join(CASES))
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--compare', help='Previous JSON report to compare with')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated library')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(json.loads(args.child))))
+        return
+
+    cases = [case for case in args.cases.split(',') if case]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    delay = args.latency_ms / 1000
+    try:
+        library = os.path.join(workdir, 'library')
+        started = time.perf_counter()
+        files = generate_mixed_library(library, args.files, art_bytes=args.art_kb * 1024, lyrics_lines=args.lyrics_lines,
+                                       kinds=tuple(args.kinds.split(',')), depth=args.depth)
+        generated = round(time.perf_counter() - started, 2)
+        config = {'genius_api_token': 'stub'}
+        if not args.provider_limits:
+            for provider in ('lrclib', 'genius'):
+                config[f'lyrics_{provider}_concurrency'] = args.workers
+                config[f'lyrics_{provider}_rate'] = 10000
+        with open(os.path.join(workdir, 'config.json'), 'w') as f:
+            json.dump(config, f)
+
+        results = []
+        with stub_lrclib(delay) as lrclib, stub_genius(delay) as genius, stub_grok(delay=delay) as grok:
+            servers = {'lrclib': lrclib, 'genius': genius, 'grok': grok}
+            for case in cases:
+                spec = case_spec(case, workdir, library, files, servers, args.workers)
+                results.append(run_case(case, spec, servers))
+                print(f"{case}: {results[-1].get('seconds')} s", file=sys.stderr)
+
+        report = {
+            'created_at': int(time.time()),
+            'python': sys.version.split()[0],
+            'library': {'files': len(files), 'art_kb': args.art_kb, 'lyrics_lines': args.lyrics_lines,
+                        'depth': args.depth, 'kinds': args.kinds, 'generate_seconds': generated},
+            'workers': args.workers,
+            'latency_ms': args.latency_ms,
+            'provider_limits': args.provider_limits,
+            'results': results,
+        }
+        if args.compare:
+            with open(args.compare) as f:
+                report['compare'] = compare(results, json.load(f))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+    finally:
+        if args.keep:
+            print(f"Library kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
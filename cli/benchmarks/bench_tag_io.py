@@ -0,0 +1,95 @@
+"""Compares the I/O of tag_rename_move tagging before/after single-pass ID3.
+
+Usage: python3 cli/benchmarks/bench_tag_io.py [--files 200] [--art-kb 300]
+
+The "legacy" pass replays the old EasyID3 + ID3 double parse / double save.
+The "single-pass" pass runs process_file() in --tags-only mode twice: the
+first run writes tags that changed, the second run finds nothing to change
+and must not write at all. Counters come from /proc/self/io (Linux).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutagen.easyid3 import EasyID3
+from mutagen.id3 import ID3, TDRC
+
+import tag_rename_move
+from synthetic_library import generate_mp3_library
+
+def read_proc_io():
+    counters = {}
+    with open('/proc/self/io') as f:
+        for line in f:
+            key, value = line.split(':')
+            counters[key.strip()] = int(value)
+    return counters
+
+def measure(label, func, paths):
+    before = read_proc_io()
+    started = time.perf_counter()
+    for path in paths:
+        func(path)
+    elapsed = time.perf_counter() - started
+    after = read_proc_io()
+    return {
+        'pass': label,
+        'files': len(paths),
+        'seconds': round(elapsed, 3),
+        'read_calls': after['syscr'] - before['syscr'],
+        'write_calls': after['syscw'] - before['syscw'],
+        'bytes_read': after['rchar'] - before['rchar'],
+        'bytes_written': after['wchar'] - before['wchar'],
+    }
+
+def legacy_tag_file(path):
+    # Old behaviour: two parses, EasyID3 save, then re-parse + re-save for TDRC
+    audio = EasyID3(path)
+    audio_full = ID3(path)
+    date = audio.get("originaldate", [None])[0]
+    if not date:
+        tdrc = audio_full.get('TDRC')
+        date = str(tdrc.text[0]) if tdrc and tdrc.text else "0000"
+    audio["artist"] = audio["artist"][0]
+    audio["title"] = audio.get("title", ["Untitled"])[0]
+    audio["date"] = date
+    audio["genre"] = audio.get("genre", ["Pop"])[0] or "Pop"
+    audio.save()
+    audio_full = ID3(path)
+    audio_full['TDRC'] = TDRC(encoding=3, text=date)
+    audio_full.save(path)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--art-kb', type=int, default=300, help='Embedded cover size per file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_tag_io_')
+    try:
+        legacy_dir = os.path.join(workdir, 'legacy')
+        single_dir = os.path.join(workdir, 'single')
+        legacy_paths = generate_mp3_library(legacy_dir, args.files, art_bytes=args.art_kb * 1024)
+        single_paths = generate_mp3_library(single_dir, args.files, art_bytes=args.art_kb * 1024)
+
+        tag_args = argparse.Namespace(mapping='{}', mode='mapping', tags_only=True, grok_key='',
+                                      grok_endpoint='', grok_model='', grok_prompt='')
+        run = lambda path: tag_rename_move.process_file(path, single_dir, tag_args)
+
+        results = [
+            measure('legacy', legacy_tag_file, legacy_paths),
+            measure('single-pass (first run)', run, single_paths),
+            measure('single-pass (unchanged)', run, single_paths),
+        ]
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Compares the full music_tag reader with the header-only tag probe.
+
+Usage: python3 cli/benchmarks/bench_tag_probe.py [--files 100] [--art-kb 1500] [--lyrics-lines 80]
+
+Files cycle through MP3, FLAC, M4A, Ogg Vorbis and Opus, each with a large
+embedded cover. For each reader: wall time, bytes and read calls from
+/proc/self/io (Linux) and the tracemalloc peak while reading one file.
+Both readers must return identical records.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music_downloader import read_file_tags
+from tag_probe import probe_file_tags
+from synthetic_library import generate_mixed_library
+
+def read_proc_io():
+    counters = {}
+    with open('/proc/self/io') as f:
+        for line in f:
+            key, value = line.split(':')
+            counters[key.strip()] = int(value)
+    return counters
+
+def measure(label, reader, paths):
+    before = read_proc_io()
+    started = time.perf_counter()
+    records = [reader(path) for path in paths]
+    elapsed = time.perf_counter() - started
+    after = read_proc_io()
+
+    peak = 0
+    for path in paths:
+        tracemalloc.start()
+        reader(path)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return records, {
+        'reader': label,
+        'files': len(paths),
+        'seconds': round(elapsed, 3),
+        'bytes_read': after['rchar'] - before['rchar'],
+        'read_calls': after['syscr'] - before['syscr'],
+        'peak_kb_per_file': round(peak / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--art-kb', type=int, default=1500, help='Embedded cover size per file')
+    parser.add_argument('--lyrics-lines', type=int, default=80)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_tag_probe_')
+    try:
+        paths = generate_mixed_library(workdir, args.files, art_bytes=args.art_kb * 1024, lyrics_lines=args.lyrics_lines)
+        full, full_stats = measure('music_tag (full)', read_file_tags, paths)
+        probed, probe_stats = measure('tag_probe (headers)', probe_file_tags, paths)
+        probe_stats['identical'] = probed == full
+        probe_stats['fallbacks'] = sum(1 for record in probed if record is None)
+        print(json.dumps([full_stats, probe_stats], indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Local stand-ins for the HTTP services used by the cli/ scripts.
+
+StubGrok answers OpenAI-compatible /v1/chat/completions requests: single
+album prompts get a bare genre, batched prompts (numbered "Artiste: ...,
+Album: ..." lines) get a JSON object. Genres come from genre_for(), and
+albums listed in fail_albums are left out of batch answers so the per-album
+fallback can be exercised.
+
+StubLrclib answers GET /api/get like lrclib.net, StubGenius answers
+GET /search and serves the song pages it links to. lyrics_outcome() decides
+per track whether lrclib has synced lyrics, only Genius has plain lyrics, or
+neither; every handler can add a fixed delay to mimic network latency.
+
+Usage: python3 cli/benchmarks/stub_servers.py [--albums 60] [--batch-size 25] [--fail 3]
+
+Runs tag_rename_move's AI genre lookups against StubGrok, one request per
+album and then batched, and checks the request count of each run and the
+genre given to every album; exits 1 on a mismatch (tests/test_genre_batching.py
+runs the same check under pytest).
+"""
+import os
+import re
+import sys
+import json
+import math
+import zlib
+import time
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs, quote, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GENRES = ['Pop', 'Rock', 'Hip-Hop', 'Electro', 'Jazz']
+ITEM_RE = re.compile(r'^(\d+)\. Artiste: (.*), Album: (.*)$')
+
+def genre_for(artist, album):
+    return GENRES[zlib.crc32(f"{artist}|{album}".encode()) % len(GENRES)]
+
+def lyrics_outcome(artist, title):
+    """'synced' (lrclib, 60%), 'plain' (Genius only, 20%) or 'none' (20%), stable per track."""
+    bucket = zlib.crc32(f"{artist}|{title}".encode()) % 10
+    return 'synced' if bucket < 6 else ('plain' if bucket < 8 else 'none')
+
+def synced_lyrics(title, lines=40):
+    return '\n'.join(f"[{i * 4 // 60:02d}:{i * 4 % 60:02d}.00]{title} line {i}" for i in range(lines))
+
+class StubServer:
+    """Runs a handler class on 127.0.0.1 in a background thread; usable as a context manager."""
+
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.stub = self
+        self.requests = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def record(self, path, body):
+        with self.lock:
+            self.requests.append((path, body))
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, payload, content_type='application/json'):
+        if self.delay:
+            time.sleep(self.delay)
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class LrclibHandler(StubHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.stub.record(url.path, query)
+        title, artist = query.get('track_name', ''), query.get('artist_name', '')
+        if url.path.endswith('/get') and lyrics_outcome(artist, title) == 'synced':
+            self.reply(200, {'trackName': title, 'artistName': artist, 'syncedLyrics': synced_lyrics(title)})
+        else:
+            self.reply(404, {'code': 404, 'name': 'TrackNotFound'})
+
+class GeniusHandler(StubHandler):
+    """The search query is '<title> <artist>' (see LyricsFetcher.query_genius)."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.stub.record(url.path, url.query)
+        if url.path.endswith('/search'):
+            query = parse_qs(url.query).get('q', [''])[0]
+            title, _, artist = query.rpartition(' Artist ')
+            artist = 'Artist ' + artist
+            hits = []
+            if lyrics_outcome(artist, title) == 'plain':
+                hits.append({'result': {'url': f"{self.server.stub.url}/songs/{quote(query)}"}})
+            self.reply(200, {'response': {'hits': hits}})
+        elif url.path.startswith('/songs/'):
+            name = unquote(url.path[len('/songs/'):])
+            verses = '<br>'.join(f"{name} line {i}" for i in range(30))
+            page = f'<html><body><div data-lyrics-container="true">[Verse 1]<br>{verses}</div></body></html>'
+            self.reply(200, page.encode(), 'text/html; charset=utf-8')
+        else:
+            self.reply(404, {})
+
+class GrokHandler(StubHandler):
+    fail_albums = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.stub.record(self.path, body)
+        user = next((m['content'] for m in body.get('messages', []) if m.get('role') == 'user'), '')
+
+        items = [ITEM_RE.match(line) for line in user.splitlines()]
+        if items and all(items):
+            answer = {m.group(1): genre_for(m.group(2), m.group(3)) for m in items if m.group(3) not in self.fail_albums}
+            content = json.dumps(answer)
+        else:
+            match = re.match(r'Artiste: (.*), Album: (.*)$', user)
+            content = genre_for(match.group(1), match.group(2)) if match else 'Unknown'
+
+        self.reply(200, {'choices': [{'message': {'role': 'assistant', 'content': content}}]})
+
+def stub_grok(fail_albums=(), delay=0):
+    handler = type('StubGrokHandler', (GrokHandler,), {'fail_albums': set(fail_albums), 'delay': delay})
+    return StubServer(handler)
+
+def stub_lrclib(delay=0):
+    return StubServer(type('StubLrclibHandler', (LrclibHandler,), {'delay': delay}))
+
+def stub_genius(delay=0):
+    return StubServer(type('StubGeniusHandler', (GeniusHandler,), {'delay': delay}))
+
+def check_genre_batching(album_count=60, batch_size=25, fail=3):
+    """Runs the AI genre lookups per album and batched; returns (runs, mismatches).
+
+    Expected: one request per album, then one per batch plus one per album
+    left out of a batch answer, and genre_for() for every album in both runs.
+    """
+    import tag_rename_move
+
+    albums = [(f"Artist {i // 4:03d}", f"Album {i:04d}") for i in range(album_count)]
+    failing = [album for _, album in albums[:fail]]
+    mapping = json.dumps({'genre_patterns': {g.lower(): g for g in GENRES}})
+
+    runs, mismatches = [], []
+    for size in (1, batch_size):
+        expected = album_count if size <= 1 else math.ceil(album_count / size) + len(failing)
+        with stub_grok(failing) as grok:
+            ai_args = argparse.Namespace(grok_key='stub', grok_endpoint=grok.url + '/v1/chat/completions',
+                                         grok_model='stub', grok_prompt='', mapping=mapping)
+            detected = tag_rename_move.detect_genres_for_albums(albums, ai_args, workers=4, batch_size=size)
+            requests = len(grok.requests)
+        wrong = [key for key in albums if detected.get(key) != genre_for(*key)]
+        runs.append({'batch_size': size, 'albums': len(albums), 'requests': requests,
+                     'expected_requests': expected, 'wrong': len(wrong)})
+        if requests != expected:
+            mismatches.append(f"batch size {size}: {requests} requests, expected {expected}")
+        mismatches.extend(f"batch size {size}: {artist} / {album} got {detected.get((artist, album))!r},"
+                          f" expected {genre_for(artist, album)!r}" for artist, album in wrong)
+    return runs, mismatches
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--albums', type=int, default=60)
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument('--fail', type=int, default=3, help='Albums left out of batch answers')
+    args = parser.parse_args()
+
+    runs, mismatches = check_genre_batching(args.albums, args.batch_size, args.fail)
+    print(json.dumps(runs, indent=2))
+    for mismatch in mismatches:
+        print(mismatch, file=sys.stderr)
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Synthetic music library generator for the cli/ benchmarks.
+
+MP3 files are made of silent MPEG frames with real ID3v2.4 tags written by
+mutagen, so every tool reads them exactly like real downloads. FLAC, M4A and
+Ogg files are minimal containers (no real audio) that mutagen accepts and tags.
+"""
+import os
+import struct
+import random
+
+from mutagen.id3 import ID3, TIT2, TPE1, TPE2, TALB, TCON, TDRC, TRCK, USLT, APIC
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4, MP4Cover
+from mutagen.ogg import OggPage
+from mutagen.oggvorbis import OggVorbis
+from mutagen.oggopus import OggOpus
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417 bytes per frame
+MPEG_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+GENRES = ['Pop', 'Rock', 'Hip-Hop', 'Electro', 'Jazz', 'Unknown', '']
+
+def write_silent_mp3(path, frames=200):
+    with open(path, 'wb') as f:
+        f.write(MPEG_FRAME * frames)
+
+def make_mp3(path, artist, album, title, track, genre='', date='2020', art_bytes=0, lyrics='', featuring=None, frames=200):
+    write_silent_mp3(path, frames)
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=[title]))
+    tags.add(TPE1(encoding=3, text=[', '.join([artist] + (featuring or []))]))
+    tags.add(TPE2(encoding=3, text=[artist]))
+    tags.add(TALB(encoding=3, text=[album]))
+    tags.add(TRCK(encoding=3, text=[f"{track}/12"]))
+    tags.add(TDRC(encoding=3, text=[date]))
+    if genre:
+        tags.add(TCON(encoding=3, text=[genre]))
+    if lyrics:
+        tags.add(USLT(encoding=3, lang='eng', text=lyrics))
+    if art_bytes:
+        tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=os.urandom(art_bytes)))
+    tags.save(path, v2_version=4)
+
+def generate_mp3_library(root, count, art_bytes=0, lyrics_lines=0, seed=1234):
+    """Creates count MP3 files under root and returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for i in range(count):
+        artist = f"Artist {i // 24:03d}"
+        album = f"Album {i // 12:04d}"
+        featuring = [f"Guest {rng.randint(0, 50)}"] if rng.random() < 0.2 else None
+        lyrics = '\n'.join(f"[00:{j % 60:02d}.00]Line {j}" for j in range(lyrics_lines))
+        path = os.path.join(root, f"{artist} - {album} - Song {i:05d}.mp3")
+        make_mp3(path, artist, album, f"Song {i:05d}", i % 12 + 1, genre=rng.choice(GENRES),
+                 art_bytes=art_bytes, lyrics=lyrics, featuring=featuring)
+        paths.append(path)
+    return paths
+
+# STREAMINFO: 4096-sample blocks, 44.1 kHz, stereo, 16 bits, no frames
+FLAC_STREAMINFO = struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + bytes([0x0a, 0xc4, 0x42, 0xf0]) + b'\x00' * 20
+
+def mp4_atom(name, payload):
+    return struct.pack('>I', 8 + len(payload)) + name + payload
+
+def ogg_pages(packets_per_page, serial=1):
+    data = b''
+    for sequence, (packets, position) in enumerate(packets_per_page):
+        page = OggPage()
+        page.packets = packets
+        page.serial = serial
+        page.sequence = sequence
+        page.position = position
+        page.first = sequence == 0
+        data += page.write()
+    return data
+
+def write_empty_container(path, kind):
+    if kind == 'flac':
+        data = b'fLaC' + bytes([0x80]) + struct.pack('>I', len(FLAC_STREAMINFO))[1:] + FLAC_STREAMINFO + b'\xff\xf8' + b'\x00' * 64
+    elif kind == 'm4a':
+        mvhd = mp4_atom(b'mvhd', b'\x00' * 4 + struct.pack('>IIII', 0, 0, 1000, 0) + b'\x00' * 80)
+        data = mp4_atom(b'ftyp', b'M4A \x00\x00\x00\x00M4A mp42isom') + mp4_atom(b'moov', mvhd) + mp4_atom(b'mdat', b'\x00' * 4096)
+    elif kind == 'ogg':
+        ident = b'\x01vorbis' + struct.pack('<IBIiii', 0, 2, 44100, 0, 128000, 0) + bytes([0xb8, 1])
+        comments = b'\x03vorbis' + struct.pack('<I', 0) + struct.pack('<I', 0) + b'\x01'
+        setup = b'\x05vorbis' + b'\x00' * 32
+        data = ogg_pages([([ident], 0), ([comments, setup], 0), ([b'\x00' * 4096], 44100)])
+    elif kind == 'opus':
+        ident = b'OpusHead' + struct.pack('<BBHIhB', 1, 2, 312, 48000, 0, 0)
+        comments = b'OpusTags' + struct.pack('<I', 0) + struct.pack('<I', 0)
+        data = ogg_pages([([ident], 0), ([comments], 0), ([b'\x00' * 4096], 48000)])
+    else:
+        raise ValueError(kind)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def make_tagged(path, kind, artist, album, title, genre='', art_bytes=0, lyrics='', featuring=None):
+    """Creates a FLAC/M4A/Ogg Vorbis/Opus file with the same fields make_mp3 writes."""
+    write_empty_container(path, kind)
+    artists = [artist] + (featuring or [])
+    if kind == 'm4a':
+        audio = MP4(path)
+        audio['\xa9ART'] = artists
+        audio['\xa9alb'] = [album]
+        audio['\xa9nam'] = [title]
+        if genre:
+            audio['\xa9gen'] = [genre]
+        if lyrics:
+            audio['\xa9lyr'] = [lyrics]
+        if art_bytes:
+            audio['covr'] = [MP4Cover(os.urandom(art_bytes), imageformat=MP4Cover.FORMAT_JPEG)]
+        audio.save()
+        return
+
+    audio = {'flac': FLAC, 'ogg': OggVorbis, 'opus': OggOpus}[kind](path)
+    audio['artist'] = artists
+    audio['album'] = album
+    audio['title'] = title
+    if genre:
+        audio['genre'] = genre
+    if lyrics:
+        audio['lyrics'] = lyrics
+    if art_bytes:
+        picture = Picture()
+        picture.type = 3
+        picture.mime = 'image/jpeg'
+        picture.data = os.urandom(art_bytes)
+        if kind == 'flac':
+            audio.add_picture(picture)
+        else:
+            import base64
+            audio['metadata_block_picture'] = [base64.b64encode(picture.write()).decode('ascii')]
+    audio.save()
+
+def library_dir(root, artist, album, depth):
+    """root (depth 0), root/Artist (1), root/Artist/Album (2), then 'Disc N' levels below."""
+    parts = [artist, album][:depth] + [f"Disc {level}" for level in range(1, depth - 1)]
+    return os.path.join(root, *parts)
+
+def generate_mixed_library(root, count, art_bytes=0, lyrics_lines=0, seed=1234, kinds=('mp3', 'flac', 'm4a', 'ogg', 'opus'), depth=0):
+    """Like generate_mp3_library, cycling through the given container kinds, depth directory levels deep."""
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        artist = f"Artist {i // 24:03d}"
+        album = f"Album {i // 12:04d}"
+        featuring = [f"Guest {rng.randint(0, 50)}"] if rng.random() < 0.2 else None
+        lyrics = '\n'.join(f"[00:{j % 60:02d}.00]Line {j}" for j in range(lyrics_lines))
+        genre = rng.choice(GENRES)
+        directory = library_dir(root, artist, album, depth)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{artist} - {album} - Song {i:05d}.{kind}")
+        if kind == 'mp3':
+            make_mp3(path, artist, album, f"Song {i:05d}", i % 12 + 1, genre=genre,
+                     art_bytes=art_bytes, lyrics=lyrics, featuring=featuring)
+        else:
+            make_tagged(path, kind, artist, album, f"Song {i:05d}", genre=genre,
+                        art_bytes=art_bytes, lyrics=lyrics, featuring=featuring)
+        paths.append(path)
+    return paths
@@ -0,0 +1,76 @@
+import os
+
+# Directories NAS and desktop systems drop into shared folders, and the work dir of
+# `music_downloader.py --batch` (downloads in progress); they never hold library tracks
+IGNORED_DIRS = frozenset({'@eaDir', '#recycle', '#snapshot', '.AppleDouble', '.Trashes', '$RECYCLE.BIN', 'lost+found', '.zotify_jobs'})
+
+# Symlink policies
+SYMLINKS_SKIP = 'skip'    # ignore every symlink
+SYMLINKS_FILES = 'files'  # follow links to files, do not descend into linked dirs (os.walk default)
+SYMLINKS_ALL = 'all'      # follow everything, each real directory is visited once
+
+def scan_files(root, extensions=None, max_depth=None, symlinks=SYMLINKS_FILES, ignore_dirs=IGNORED_DIRS, modified_since=None):
+    """Lazily yields os.DirEntry objects for the files below root.
+
+    Built on os.scandir so file/dir checks come from the directory listing and
+    entry.stat() costs at most one cached syscall per file (none on Windows).
+    extensions filters on the lowercased name suffix, max_depth limits the
+    recursion (0 = only root itself, None = unlimited), ignore_dirs prunes
+    directories by name. Unreadable directories are skipped, like os.walk.
+    With modified_since (epoch seconds), the files of a directory whose own
+    mtime is older are not yielded (its subdirectories are still visited):
+    creating, renaming or deleting a file updates its directory's mtime, so
+    only files rewritten in place can be missed.
+    Order matches os.walk top-down: the files of a directory, then its subdirectories.
+    """
+    follow = symlinks == SYMLINKS_ALL
+    visited = set()
+    if follow:
+        try:
+            st = os.stat(root)
+            visited.add((st.st_dev, st.st_ino))
+        except OSError:
+            return
+
+    stack = [(root, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        subdirs = []
+        list_files = True
+        if modified_since is not None:
+            try:
+                list_files = os.stat(directory).st_mtime >= modified_since
+            except OSError:
+                continue
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        is_link = entry.is_symlink()
+                        if is_link and symlinks == SYMLINKS_SKIP:
+                            continue
+                        if entry.is_dir(follow_symlinks=follow):
+                            if entry.name in ignore_dirs or (max_depth is not None and depth >= max_depth):
+                                continue
+                            if follow:
+                                st = entry.stat()
+                                if (st.st_dev, st.st_ino) in visited:
+                                    continue
+                                visited.add((st.st_dev, st.st_ino))
+                            subdirs.append(entry.path)
+                        elif list_files and entry.is_file(follow_symlinks=symlinks != SYMLINKS_SKIP):
+                            if extensions is None or entry.name.lower().endswith(extensions):
+                                yield entry
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        # Reversed so the stack pops subdirectories in listing order
+        stack.extend((path, depth + 1) for path in reversed(subdirs))
+
+def entry_stat(entry):
+    """entry.stat() (following links), or None if the file vanished or is a broken link."""
+    try:
+        return entry.stat()
+    except OSError:
+        return None
@@ -0,0 +1,219 @@
+"""Runs several zotify downloads at once for `music_downloader.py --batch`.
+
+Each URL gets its own job directory below the work dir:
+
+    <work_dir>/<id>/tmp/          zotify --temp-download-dir and TMPDIR of the child
+    <work_dir>/<id>/zotify.log    stdout + stderr of the child
+    <work_dir>/<id>/progress.json status file (see zotify_progress)
+
+zotify keeps the real root path, so its skip-existing checks (the file itself
+and the album's .song_ids) see the library and tracks already there are not
+downloaded again. Tracks are written to the job's temp dir first and renamed
+into the library once complete (same disk), so an interrupted job never
+leaves partial files behind; zotify appends to the library's .song_ids itself.
+
+A child is the wrapper itself run for one URL, started in its own process
+group, so cancelling a job (timeout, SIGTERM/SIGINT of the batch) kills the
+wrapper and zotify together.
+
+The manifest (JSON, replaced atomically after every job) lists per job: id,
+url, status (pending|running|success|failed|timeout|canceled), returncode,
+log, progress file, track counts, downloaded files and timings.
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from zotify_progress import write_status
+
+KILL_GRACE = 5
+IS_WINDOWS = os.name == 'nt'
+
+def job_id_for(url, index):
+    tail = re.sub(r'[^A-Za-z0-9]+', '_', url.rstrip('/').rsplit('/', 1)[-1].split('?')[0])[:40]
+    return f"{index:03d}_{tail}" if tail else f"{index:03d}"
+
+def parse_jobs(data):
+    """Accepts ["url", ...] or [{"url": ..., "id": ...}, ...]; returns job dicts with unique ids."""
+    jobs = []
+    seen = set()
+    for index, item in enumerate(data or []):
+        if isinstance(item, str):
+            item = {'url': item}
+        if not isinstance(item, dict) or not item.get('url'):
+            continue
+        job_id = re.sub(r'[^A-Za-z0-9_.-]+', '_', str(item.get('id') or job_id_for(item['url'], index)))
+        if job_id in seen:
+            job_id = f"{job_id}_{index}"
+        seen.add(job_id)
+        jobs.append({'id': job_id, 'url': item['url'], 'status': 'pending'})
+    return jobs
+
+def replace_option(args, name, value):
+    args = list(args)
+    if name in args and args.index(name) + 1 < len(args):
+        args[args.index(name) + 1] = value
+    else:
+        args.extend([name, value])
+    return args
+
+def kill_group(process, grace=KILL_GRACE):
+    """Terminates the child and everything it started, then kills what is left after grace seconds."""
+    if process.poll() is not None:
+        return
+    try:
+        if IS_WINDOWS:
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)], capture_output=True)
+            return
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+class BatchRunner:
+    """Runs jobs on at most max_parallel children and keeps the manifest current."""
+
+    def __init__(self, jobs, zotify_args, root_path, work_dir, max_parallel=3, timeout=None,
+                 manifest_path=None, wrapper=None):
+        self.jobs = jobs
+        self.zotify_args = list(zotify_args)
+        self.root_path = root_path
+        self.work_dir = work_dir
+        self.max_parallel = max(1, max_parallel)
+        self.timeout = timeout
+        self.manifest_path = manifest_path or os.path.join(work_dir, 'manifest.json')
+        self.wrapper = wrapper or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'music_downloader.py')
+        self.lock = threading.Lock()
+        self.running = {}
+        self.canceled = threading.Event()
+        self.started_at = time.time()
+
+    def command_for(self, job, tmp_dir, progress_file):
+        args = replace_option(self.zotify_args, '--root-path', self.root_path)
+        args = replace_option(args, '--temp-download-dir', tmp_dir)
+        return [sys.executable, self.wrapper, job['url']] + args + ['--progress-file', progress_file]
+
+    def run_job(self, job):
+        if self.canceled.is_set():
+            job['status'] = 'canceled'
+            return job
+        job_dir = os.path.join(self.work_dir, job['id'])
+        tmp_dir = os.path.join(job_dir, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        job['log'] = os.path.join(job_dir, 'zotify.log')
+        job['progress_file'] = os.path.join(job_dir, 'progress.json')
+
+        env = dict(os.environ, TMPDIR=tmp_dir, TEMP=tmp_dir, TMP=tmp_dir, PYTHONUNBUFFERED='1')
+        popen_args = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} if IS_WINDOWS else {'start_new_session': True}
+        job['started_at'] = time.time()
+        with open(job['log'], 'ab') as log:
+            with self.lock:
+                if self.canceled.is_set():
+                    job['status'] = 'canceled'
+                    return job
+                process = subprocess.Popen(self.command_for(job, tmp_dir, job['progress_file']),
+                                           stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                           env=env, **popen_args)
+                self.running[job['id']] = process
+                job['status'] = 'running'
+                job['pid'] = process.pid
+            self.write_manifest()
+            try:
+                job['returncode'] = process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                kill_group(process)
+                job['returncode'] = process.wait()
+                job['status'] = 'timeout'
+            finally:
+                with self.lock:
+                    self.running.pop(job['id'], None)
+
+        if job['status'] == 'running':
+            if self.canceled.is_set():
+                job['status'] = 'canceled'
+            else:
+                job['status'] = 'success' if job['returncode'] == 0 else 'failed'
+        job['finished_at'] = time.time()
+        job['seconds'] = round(job['finished_at'] - job['started_at'], 1)
+
+        # Whatever is left in the temp dir is an unfinished download
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        try:
+            with open(job['progress_file']) as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            progress = {}
+        job['tracks'] = progress.get('tracks')
+        job['files'] = progress.get('files', [])
+        self.write_manifest()
+        return job
+
+    def cancel(self):
+        """Stops the pending jobs and kills the running ones (whole process groups)."""
+        self.canceled.set()
+        with self.lock:
+            processes = list(self.running.values())
+        for process in processes:
+            kill_group(process)
+
+    def manifest(self):
+        # Shallow copies: job threads replace values but never mutate them in place
+        jobs = [dict(job) for job in self.jobs]
+        counts = {}
+        for job in jobs:
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {
+            'started_at': self.started_at,
+            'updated_at': time.time(),
+            'root_path': self.root_path,
+            'max_parallel': self.max_parallel,
+            'summary': counts,
+            'jobs': jobs,
+        }
+
+    def write_manifest(self):
+        with self.lock:
+            write_status(self.manifest_path, self.manifest())
+
+    def run(self):
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.write_manifest()
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            pending = {executor.submit(self.run_job, job) for job in self.jobs}
+            # Short waits so SIGTERM/SIGINT handlers run promptly in the main thread
+            while pending:
+                _, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+        for job in self.jobs:
+            if job['status'] == 'pending':
+                job['status'] = 'canceled'
+        self.write_manifest()
+        return self.manifest()
+
+def run_batch(jobs, zotify_args, root_path, work_dir, max_parallel=3, timeout=None, manifest_path=None):
+    """Runs the jobs with SIGTERM/SIGINT wired to cancellation; returns the final manifest."""
+    runner = BatchRunner(jobs, zotify_args, root_path, work_dir, max_parallel=max_parallel,
+                         timeout=timeout, manifest_path=manifest_path)
+
+    def on_signal(signum, frame):
+        runner.cancel()
+
+    previous = {sig: signal.signal(sig, on_signal) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        return runner.run()
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
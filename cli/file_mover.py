@@ -0,0 +1,156 @@
+import os
+import time
+import errno
+
+CHUNK_SIZE = 8 * 1024 * 1024
+TEMP_SUFFIX = '.part'
+
+# errnos meaning "this copy primitive does not work for this pair of files", not "the copy failed"
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+def same_device(src, dst_dir):
+    try:
+        return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+def _copy_kernel(src_fd, dst_fd, size, method):
+    """Copies size bytes with copy_file_range/sendfile; returns the bytes copied before it gave up."""
+    copied = 0
+    while copied < size:
+        count = min(CHUNK_SIZE, size - copied)
+        if method == 'copy_file_range':
+            n = os.copy_file_range(src_fd, dst_fd, count)
+        else:
+            n = os.sendfile(dst_fd, src_fd, None, count)
+        if n == 0:
+            break
+        copied += n
+    return copied
+
+def _copy_chunks(src_fd, dst_fd):
+    copied = 0
+    buf = bytearray(CHUNK_SIZE)
+    view = memoryview(buf)
+    with open(src_fd, 'rb', buffering=0, closefd=False) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            written = 0
+            while written < n:
+                written += os.write(dst_fd, view[written:n])
+            copied += n
+    return copied
+
+def stream_copy(src_fd, dst_fd, size):
+    """Copies src_fd into dst_fd from their current offsets; returns the method that did the work."""
+    for method in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, method):
+            continue
+        try:
+            copied = _copy_kernel(src_fd, dst_fd, size, method)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            # Nothing is copied when the primitive is refused, but rewind in case it was mid-way
+            os.lseek(src_fd, 0, os.SEEK_SET)
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+            os.ftruncate(dst_fd, 0)
+            continue
+        if copied == 0 and size > 0:
+            # Some filesystems (FUSE, older CIFS) answer 0 instead of an error
+            continue
+        if copied < size:
+            # File shrank while being copied: finish (or notice) with plain reads
+            _copy_chunks(src_fd, dst_fd)
+        return method
+    _copy_chunks(src_fd, dst_fd)
+    return 'read_write'
+
+def fsync_dir(path):
+    # Persists the rename itself; not supported everywhere (CIFS, Windows), hence best effort
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def copy_atomic(src, dst, preserve_times=True):
+    """Streams src into a temp file next to dst, fsyncs it and renames it over dst.
+
+    dst is either untouched or complete, never half-written. Only data and
+    (best effort) times are carried over: no chmod/chown/xattrs, which CIFS and
+    exFAT mounts reject with EPERM. Returns (method, bytes copied).
+    """
+    st = os.stat(src)
+    dst_dir = os.path.dirname(dst) or '.'
+    tmp = os.path.join(dst_dir, f".{os.path.basename(dst)}.{os.getpid()}{TEMP_SUFFIX}")
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            method = stream_copy(src_fd, dst_fd, st.st_size)
+            copied = os.fstat(dst_fd).st_size
+            os.fsync(dst_fd)
+        finally:
+            os.close(dst_fd)
+        if copied != st.st_size:
+            raise OSError(errno.EIO, f"Short copy: {copied} of {st.st_size} bytes", dst)
+        if preserve_times:
+            try:
+                os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            except OSError:
+                pass
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    finally:
+        os.close(src_fd)
+    fsync_dir(dst_dir)
+    return method, copied
+
+def move_file(src, dst):
+    """Moves src to dst (overwriting it) and reports how.
+
+    Same device: one atomic rename. Across devices (e.g. music_root_path to a
+    CIFS/exFAT music_library_path): copy_atomic() then the source is removed.
+    Returns {'method', 'bytes', 'seconds', 'mb_per_s', 'cross_device'}; when the
+    copy succeeded but the source could not be deleted, 'source_error' is set.
+    """
+    started = time.perf_counter()
+    size = os.path.getsize(src)
+    stats = {'method': 'rename', 'bytes': size, 'cross_device': False}
+
+    renamed = False
+    if same_device(src, os.path.dirname(dst) or '.'):
+        try:
+            os.replace(src, dst)
+            renamed = True
+        except OSError as e:
+            # Same st_dev but still EXDEV: bind mounts, overlayfs layers
+            if e.errno != errno.EXDEV:
+                raise
+
+    if not renamed:
+        stats['cross_device'] = True
+        stats['method'], stats['bytes'] = copy_atomic(src, dst)
+        try:
+            os.remove(src)
+        except OSError as e:
+            stats['source_error'] = str(e)
+
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 4)
+    # A rename moves no data: a throughput would only measure the syscall
+    stats['mb_per_s'] = round(stats['bytes'] / 1048576 / elapsed, 1) if stats['cross_device'] and elapsed > 0 else None
+    return stats
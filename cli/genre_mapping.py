@@ -0,0 +1,89 @@
+import re
+import json
+import threading
+from functools import lru_cache
+
+# Patterns using backreferences cannot be merged: group numbers shift in the combined regex
+BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=')
+MAX_MEMO = 50000
+
+class GenreMapper:
+    """Compiled form of the genre_patterns mapping ({regex: target genre}).
+
+    Semantics are those of the historical map_genre(): the genre is lowercased,
+    patterns are tried in mapping order with re.search and the first one that
+    matches wins; invalid patterns are ignored; unmatched genres are returned
+    unchanged. All patterns are merged into one regex made of anchored
+    lookaheads, so a single C-level match replaces the Python loop, and results
+    are memoised per raw genre string.
+    """
+
+    def __init__(self, patterns):
+        self.rules = []
+        for pattern, target in patterns.items():
+            try:
+                self.rules.append((re.compile(pattern), target))
+            except re.error:
+                continue
+        self.targets = list(dict.fromkeys(str(target) for _, target in self.rules if target))
+        self.combined = self._combine()
+        self.memo = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_json(cls, mapping_json):
+        """Builds a mapper from the config JSON. Raises ValueError if it cannot be read."""
+        try:
+            patterns = json.loads(mapping_json or '{}').get('genre_patterns', {})
+            return cls(dict(patterns))
+        except (AttributeError, TypeError) as e:
+            raise ValueError(f"Invalid genre mapping: {e}")
+
+    def _combine(self):
+        if not self.rules or any(BACKREF_RE.search(rx.pattern) for rx, _ in self.rules):
+            return None
+        # ^(?:(?=[\s\S]*?(?:p0))(?P<_g0>)|(?=[\s\S]*?(?:p1))(?P<_g1>)|...)
+        # Each branch looks for its pattern anywhere in the string; the alternation
+        # is tried left to right, which keeps first-pattern-wins.
+        branches = [f"(?=[\\s\\S]*?(?:{rx.pattern}))(?P<_g{i}>)" for i, (rx, _) in enumerate(self.rules)]
+        try:
+            return re.compile('^(?:' + '|'.join(branches) + ')')
+        except (re.error, RecursionError, OverflowError):
+            return None
+
+    def _lookup(self, genre_lower):
+        if self.combined is not None:
+            match = self.combined.match(genre_lower)
+            return self.rules[int(match.lastgroup[2:])][1] if match else None
+        for rx, target in self.rules:
+            if rx.search(genre_lower):
+                return target
+        return None
+
+    def map(self, genre):
+        if not genre:
+            return "Unknown"
+        try:
+            return self.memo[genre]
+        except (KeyError, TypeError):
+            pass
+
+        target = self._lookup(str(genre).lower())
+        result = genre if target is None else target
+        try:
+            with self.lock:
+                if len(self.memo) >= MAX_MEMO:
+                    self.memo.clear()
+                self.memo[genre] = result
+        except TypeError:
+            pass
+        return result
+
+    def map_many(self, genres):
+        """Maps an iterable of genres, returning a list in the same order."""
+        return [self.map(genre) for genre in genres]
+
+@lru_cache(maxsize=8)
+def get_mapper(mapping_json):
+    """Returns the GenreMapper for a mapping JSON string, built once per distinct mapping."""
+    return GenreMapper.from_json(mapping_json)
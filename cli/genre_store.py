@@ -0,0 +1,330 @@
+"""Persistent (artist, album) -> genre store used by tag_rename_move.
+
+Usage: python3 cli/genre_store.py [LIBRARY] [--every SECONDS]
+
+Seeds the store from the genres already tagged in an organised library
+(LIBRARY defaults to music_library_path from the config). Seeding is done
+once per library and commits after every artist, so an interrupted run
+resumes where it stopped. With --every it runs in the background
+(supervisord program `genre-seed`) and seeds a newly configured library
+within SECONDS; the library move never does it itself.
+"""
+import os
+import re
+import sys
+import json
+import time
+import signal
+import sqlite3
+import threading
+
+from mutagen.id3 import ID3
+
+from tag_index import normalize_text
+
+# var/storage/ is 1 level up from cli/
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_FILE = os.path.join(os.path.dirname(SCRIPT_DIR), 'var', 'storage', 'genre_store.sqlite')
+CONFIG_FILE = os.path.join(os.path.dirname(SCRIPT_DIR), 'var', 'storage', 'config.json')
+
+DEFAULT_MAX_ENTRIES = 20000
+# Writes (answers and the last_used of lookups) are committed every COMMIT_EVERY
+# statements or COMMIT_INTERVAL seconds; the size cap is enforced every EVICT_EVERY puts
+COMMIT_EVERY = 200
+COMMIT_INTERVAL = 2.0
+EVICT_EVERY = 500
+UNKNOWN_GENRES = ('', 'unknown', 'none')
+
+class GenreStore:
+    """Persistent (artist, album) -> genre store replacing the per-process genre cache.
+
+    Keys are normalised (case and whitespace insensitive). Besides exact album
+    lookups, get_artist() offers an artist-level fallback built from the albums
+    already known for that artist. The table is capped at max_entries rows,
+    evicting the least recently used albums first (when the store opens and
+    every EVICT_EVERY puts). Lookups only update last_used in memory until the
+    next batched commit. Best effort like the lyrics cache: a database error
+    is reported once, lookups then miss and answers are not stored. Use
+    ':memory:' for a session-only store.
+    """
+
+    def __init__(self, db_path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path or STORE_FILE
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.writable = True
+        self.pending = 0
+        self.first_pending = 0.0
+        self.puts = 0
+        # (artist, album) -> last_used of the lookups not written yet
+        self.touched = {}
+
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS albums ('
+            ' artist TEXT NOT NULL,'
+            ' album TEXT NOT NULL,'
+            ' genre TEXT NOT NULL,'
+            ' source TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (artist, album)'
+            ')'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS albums_last_used ON albums (last_used)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.commit()
+        with self.lock:
+            self._evict()
+            self._commit()
+
+    def get_album(self, artist, album):
+        key = (normalize_text(artist), normalize_text(album))
+        with self.lock:
+            try:
+                row = self.conn.execute('SELECT genre FROM albums WHERE artist = ? AND album = ?', key).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None:
+                return None
+            if self.writable:
+                self.touched[key] = time.time()
+                self._written()
+            return row[0]
+
+    def get_artist(self, artist, min_albums=2):
+        """Returns the artist's genre when at least min_albums known albums all agree on it."""
+        with self.lock:
+            try:
+                rows = self.conn.execute(
+                    'SELECT genre, COUNT(*) FROM albums WHERE artist = ? GROUP BY genre', (normalize_text(artist),)
+                ).fetchall()
+            except sqlite3.Error:
+                return None
+        if len(rows) == 1 and rows[0][1] >= min_albums:
+            return rows[0][0]
+        return None
+
+    def put(self, artist, album, genre, source='ai', overwrite=True):
+        if not genre or str(genre).lower() in UNKNOWN_GENRES:
+            return
+        now = time.time()
+        verb = 'INSERT OR REPLACE' if overwrite else 'INSERT OR IGNORE'
+        key = (normalize_text(artist), normalize_text(album))
+        with self.lock:
+            if not self._write(
+                f'{verb} INTO albums (artist, album, genre, source, updated_at, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                key + (genre, source, now, now)
+            ):
+                return
+            self.touched.pop(key, None)
+            self.puts += 1
+            if self.puts % EVICT_EVERY == 0:
+                self._evict()
+
+    # The methods below run under self.lock
+
+    def _write(self, sql, params=()):
+        """Runs one write statement; False (and no more writes) if the database refused it."""
+        if not self.writable:
+            return False
+        try:
+            self.conn.execute(sql, params)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return False
+        self._written()
+        return True
+
+    def _written(self):
+        if not self.pending:
+            self.first_pending = time.monotonic()
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY or time.monotonic() - self.first_pending >= COMMIT_INTERVAL:
+            self._commit()
+
+    def _commit(self):
+        if not self.writable:
+            return
+        touched, self.touched = self.touched, {}
+        try:
+            if touched:
+                self.conn.executemany(
+                    'UPDATE albums SET last_used = ? WHERE artist = ? AND album = ?',
+                    [(used,) + key for key, used in touched.items()]
+                )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+        self.pending = 0
+
+    def _disable(self, error):
+        print(f"Genre store not updated ({error}), continuing without it.", file=sys.stderr)
+        self.writable = False
+        self.pending = 0
+        self.touched = {}
+        try:
+            self.conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self):
+        # Pending last_used updates first, so the least recently used rows go
+        self._commit()
+        try:
+            excess = self.conn.execute('SELECT COUNT(*) FROM albums').fetchone()[0] - self.max_entries
+        except sqlite3.Error:
+            return
+        if excess > 0:
+            self._write(
+                'DELETE FROM albums WHERE rowid IN (SELECT rowid FROM albums ORDER BY last_used ASC LIMIT ?)',
+                (excess,)
+            )
+
+    def get_meta(self, key):
+        with self.lock:
+            try:
+                row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error:
+                return None
+        return row[0] if row else None
+
+    def is_seeded(self, library_path):
+        return self.get_meta('seeded:' + os.path.abspath(library_path)) is not None
+
+    def seed_from_library(self, library_path):
+        """Imports genres already present in an organised library (Artist/Artist - Album - NN - Title.ext).
+
+        Only one file per album is read: the album is taken from the file name
+        when it follows the library naming scheme, from the tags otherwise.
+        Existing entries (e.g. AI answers) are kept. Artists are read in name
+        order and committed one by one with the last one done, so a new call
+        after an interruption skips them. Returns the number of albums added.
+        """
+        library_path = os.path.abspath(library_path)
+        progress_key = 'seed_progress:' + library_path
+        done_up_to = self.get_meta(progress_key) or ''
+        added = 0
+        artists = sorted(entry.name for entry in os.scandir(library_path) if entry.is_dir(follow_symlinks=False))
+        for artist in artists:
+            if artist <= done_up_to:
+                continue
+            albums = self._library_albums(os.path.join(library_path, artist), artist)
+            now = time.time()
+            with self.lock:
+                for album, genre in albums.items():
+                    cursor = self.conn.execute(
+                        'INSERT OR IGNORE INTO albums (artist, album, genre, source, updated_at, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                        (normalize_text(artist), normalize_text(album), genre, 'library', now, now)
+                    )
+                    added += cursor.rowcount
+                self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (progress_key, artist))
+                self.conn.commit()
+
+        with self.lock:
+            self._evict()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                ('seeded:' + library_path, str(time.time()))
+            )
+            self.conn.execute('DELETE FROM meta WHERE key = ?', (progress_key,))
+            self.conn.commit()
+        return added
+
+    def _library_albums(self, artist_path, artist):
+        """album -> genre for one artist folder, reading one MP3 per album."""
+        albums = {}
+        prefix = artist + ' - '
+        try:
+            entries = sorted(os.scandir(artist_path), key=lambda entry: entry.name)
+        except OSError:
+            return albums
+        for entry in entries:
+            if not entry.name.lower().endswith('.mp3') or not entry.is_file(follow_symlinks=False):
+                continue
+            album = None
+            if entry.name.startswith(prefix):
+                match = re.match(r'(.+?) - \d{2,} - ', entry.name[len(prefix):])
+                album = match.group(1) if match else None
+            if album is not None and album in albums:
+                continue
+            try:
+                tags = ID3(entry.path)
+            except Exception:
+                continue
+            genre_frame = tags.get('TCON')
+            genre = genre_frame.genres[0] if genre_frame and genre_frame.genres else ''
+            if album is None:
+                album_frame = tags.get('TALB')
+                album = str(album_frame.text[0]) if album_frame and album_frame.text else ''
+            if album not in albums and genre and genre.lower() not in UNKNOWN_GENRES:
+                albums[album] = genre
+        return albums
+
+    def close(self):
+        with self.lock:
+            self._commit()
+            self.conn.close()
+
+def open_genre_store(db_path=None, max_entries=DEFAULT_MAX_ENTRIES):
+    """Opens the persistent store, falling back to a session-only store if storage is unavailable."""
+    try:
+        return GenreStore(db_path, max_entries=max_entries)
+    except (sqlite3.Error, OSError):
+        return GenreStore(':memory:', max_entries=max_entries)
+
+def load_config():
+    try:
+        with open(CONFIG_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def seed_library(library_path):
+    """Seeds the persistent store from library_path unless already done; returns a status dict."""
+    store = open_genre_store()
+    try:
+        if store.is_seeded(library_path):
+            return {'library': library_path, 'seeded': True, 'added': 0}
+        return {'library': library_path, 'seeded': True, 'added': store.seed_from_library(library_path)}
+    finally:
+        store.close()
+
+def keep_seeded(library_path, every):
+    """Background mode: seeds the configured library (once per library), checking every `every` seconds."""
+    while True:
+        path = library_path or load_config().get('music_library_path', '')
+        if path and os.path.isdir(path):
+            try:
+                print(json.dumps(dict(seed_library(path), time=time.time())), file=sys.stderr, flush=True)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Genre store seeding failed: {e}", file=sys.stderr, flush=True)
+        time.sleep(every)
+
+def main():
+    argv = sys.argv[1:]
+    every = None
+    if '--every' in argv:
+        try:
+            every = int(argv[argv.index('--every') + 1])
+        except (IndexError, ValueError):
+            pass
+    positional = [arg for i, arg in enumerate(argv) if not arg.startswith('--') and (i == 0 or argv[i - 1] != '--every')]
+
+    if every:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        keep_seeded(positional[0] if positional else None, every)
+        return
+
+    path = positional[0] if positional else load_config().get('music_library_path', '')
+    if not path or not os.path.isdir(path):
+        print(json.dumps({'error': 'Usage: genre_store.py [LIBRARY] [--every SECONDS]'}))
+        sys.exit(1)
+    print(json.dumps(seed_library(path)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import time
+import random
+import threading
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Timeouts (connect, read) per host; anything else uses DEFAULT_TIMEOUT
+DEFAULT_TIMEOUT = (5, 15)
+HOST_TIMEOUTS = {
+    'lrclib.net': (5, 10),
+    'api.genius.com': (5, 10),
+    'genius.com': (5, 10),
+    'api.x.ai': (5, 15),
+}
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class HttpClient:
+    """Shared, pooled HTTP session for the cli/ scripts.
+
+    - one keep-alive connection pool per host (pool_size connections each)
+    - exponential backoff with full jitter on connection errors, 429 and 5xx,
+      honouring Retry-After when the server sends one
+    - per-host default timeouts
+    - per-host latency and error counters (see stats())
+    Safe to share between threads.
+    """
+
+    def __init__(self, pool_size=10, max_retries=3, backoff_base=0.5, backoff_max=30.0, host_timeouts=None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.host_timeouts = dict(HOST_TIMEOUTS)
+        self.host_timeouts.update(host_timeouts or {})
+
+        self.session = requests.Session()
+        # Retries are handled here (with stats and jitter), not by urllib3
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, limiter=None, **kwargs):
+        """Same as requests.request, with pooling, retries and stats.
+
+        limiter is an optional context manager (e.g. a provider rate limiter)
+        entered around each attempt only, so every retry is charged to it and
+        the backoff sleeps do not hold it.
+        Returns the last response once retries are exhausted (the caller decides
+        what a 429/5xx means), or raises the last connection error.
+        """
+        host = urlsplit(url).hostname or ''
+        kwargs.setdefault('timeout', self.host_timeouts.get(host, DEFAULT_TIMEOUT))
+
+        attempt = 0
+        while True:
+            try:
+                with limiter or nullcontext():
+                    started = time.monotonic()
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, time.monotonic() - started, error=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                retryable = response.status_code in RETRY_STATUSES
+                self._record(host, time.monotonic() - started, error=f"HTTP {response.status_code}" if retryable else None)
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+
+            attempt += 1
+            with self._lock:
+                self._stats[host]['retries'] += 1
+            time.sleep(min(delay, self.backoff_max))
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform between 0 and base * 2^attempt
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _record(self, host, elapsed, error=None):
+        with self._lock:
+            entry = self._stats.setdefault(host, {
+                'requests': 0, 'errors': 0, 'retries': 0, 'total_time': 0.0, 'max_time': 0.0, 'errors_by_type': {}
+            })
+            entry['requests'] += 1
+            entry['total_time'] += elapsed
+            entry['max_time'] = max(entry['max_time'], elapsed)
+            if error:
+                entry['errors'] += 1
+                entry['errors_by_type'][error] = entry['errors_by_type'].get(error, 0) + 1
+
+    def stats(self):
+        """Per-host counters: requests, errors, retries, average and max latency (seconds)."""
+        with self._lock:
+            result = {}
+            for host, entry in self._stats.items():
+                result[host] = {
+                    'requests': entry['requests'],
+                    'errors': entry['errors'],
+                    'retries': entry['retries'],
+                    'avg_time': round(entry['total_time'] / entry['requests'], 4) if entry['requests'] else 0.0,
+                    'max_time': round(entry['max_time'], 4),
+                    'errors_by_type': dict(entry['errors_by_type'])
+                }
+            return result
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client(config=None):
+    """Returns the process-wide HttpClient, created on first use from the config."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            config = config or {}
+            _client = HttpClient(
+                pool_size=int(config.get('http_pool_size', 10)),
+                max_retries=int(config.get('http_max_retries', 3)),
+                backoff_base=float(config.get('http_backoff_base', 0.5))
+            )
+        return _client
@@ -0,0 +1,42 @@
+"""EasyID3-style access to the few ID3 text frames the scripts read and write.
+
+Works on an already loaded mutagen ID3 object, so a file is parsed once and
+EasyID3's per-key lookups are avoided. Kept apart from tag_rename_move so
+other scripts can use it without importing the mover and its stores.
+"""
+from mutagen.id3 import Frames
+
+# EasyID3 key -> ID3 frame
+FRAME_IDS = {
+    "title": "TIT2",
+    "artist": "TPE1",
+    "album": "TALB",
+    "albumartist": "TPE2",
+    "genre": "TCON",
+    "date": "TDRC",
+    "originaldate": "TDOR",
+    "tracknumber": "TRCK",
+}
+
+def read_tag(tags, key, default=None):
+    """EasyID3-style first value of a key, read from an already loaded ID3 object."""
+    frame = tags.get(FRAME_IDS[key])
+    if frame is None or not frame.text:
+        return default
+    if key == "genre":
+        genres = frame.genres
+        return genres[0] if genres else default
+    return str(frame.text[0])
+
+def frame_text(tags, key):
+    """Text values of a key's frame as strings, or None when the frame is missing."""
+    frame = tags.get(FRAME_IDS[key])
+    return None if frame is None else [str(t) for t in frame.text]
+
+def write_tag(tags, key, value):
+    """Sets a text frame in memory, only if its value differs. Returns True when it changed."""
+    frame_id = FRAME_IDS[key]
+    if frame_text(tags, key) == [value]:
+        return False
+    tags.setall(frame_id, [Frames[frame_id](encoding=3, text=[value])])
+    return True
@@ -0,0 +1,147 @@
+"""Opt-in timing of the cli/ scripts: phases, per-file costs, slow files and cProfile.
+
+Enabled with --instrument, which the web UI adds when "cli_instrumentation"
+is set in the config. Code times a block with
+
+    with timings.phase('parse', file_path):
+        ...
+
+Each phase gets a count, total, max and error count; when a path is given
+the time is also added to that file, and files whose total reaches the
+slow-file threshold (--slow-ms, config cli_slow_file_ms, default 1000) are
+listed, slowest first, and logged to stderr. Errors that the scripts swallow
+can be recorded with error(). --profile PATH dumps cProfile stats (readable
+with pstats / snakeviz) for the main thread and adds the top functions to the
+summary. summary() is what the scripts put under "instrumentation" in their
+JSON output. A disabled Instrumentation costs one attribute check per block.
+"""
+import sys
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_SLOW_MS = 1000
+MAX_SLOW_FILES = 50
+MAX_ERRORS = 20
+PROFILE_TOP = 25
+
+class Instrumentation:
+    def __init__(self, enabled=True, slow_ms=DEFAULT_SLOW_MS, profile_path=None):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.profile_path = profile_path if enabled else None
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.files = {}
+        self.errors = []
+        self.started = time.perf_counter()
+        self.profiler = None
+        if self.profile_path:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def phase(self, name, path=None):
+        """Context manager timing one block of the given phase (optionally for one file)."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name, path)
+
+    @contextmanager
+    def _timed(self, name, path):
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.add(name, time.perf_counter() - started, path, failed)
+
+    def add(self, name, seconds, path=None, failed=False):
+        """Records a duration measured elsewhere (e.g. in a worker process)."""
+        if not self.enabled:
+            return
+        with self.lock:
+            stats = self.phases.get(name)
+            if stats is None:
+                stats = self.phases[name] = {'count': 0, 'seconds': 0.0, 'max': 0.0, 'errors': 0}
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['errors'] += failed
+            if path is not None:
+                per_file = self.files.setdefault(path, {})
+                per_file[name] = per_file.get(name, 0.0) + seconds
+
+    def error(self, name, path, message):
+        """Counts an error that the caller handles itself (the first MAX_ERRORS are kept)."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.phases.setdefault(name, {'count': 0, 'seconds': 0.0, 'max': 0.0, 'errors': 0})['errors'] += 1
+            if len(self.errors) < MAX_ERRORS:
+                self.errors.append({'phase': name, 'path': path, 'message': str(message)})
+
+    def slow_files(self):
+        threshold = self.slow_ms / 1000
+        slow = []
+        for path, phases in self.files.items():
+            total = sum(phases.values())
+            if total >= threshold:
+                slow.append({'path': path, 'ms': round(total * 1000, 1),
+                             'phases': {name: round(seconds * 1000, 1) for name, seconds in phases.items()}})
+        slow.sort(key=lambda item: item['ms'], reverse=True)
+        return slow[:MAX_SLOW_FILES]
+
+    def stop_profile(self):
+        """Stops cProfile, writes the stats file and returns the top functions by cumulative time."""
+        if not self.profiler:
+            return None
+        import pstats
+        self.profiler.disable()
+        self.profiler.dump_stats(self.profile_path)
+        stats = pstats.Stats(self.profiler)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+        self.profiler = None
+        return [{'function': f"{filename}:{line}({name})", 'calls': calls, 'own_ms': round(own * 1000, 1),
+                 'cumulative_ms': round(cumulative * 1000, 1)}
+                for (filename, line, name), (_, calls, own, cumulative, _) in top]
+
+    def summary(self):
+        """JSON-friendly report; also logs the slow files to stderr. None when disabled."""
+        if not self.enabled:
+            return None
+        profile_top = self.stop_profile()
+        with self.lock:
+            phases = {
+                name: {'count': stats['count'], 'total_ms': round(stats['seconds'] * 1000, 1),
+                       'avg_ms': round(stats['seconds'] * 1000 / stats['count'], 2) if stats['count'] else 0,
+                       'max_ms': round(stats['max'] * 1000, 1), 'errors': stats['errors']}
+                for name, stats in sorted(self.phases.items(), key=lambda item: item[1]['seconds'], reverse=True)
+            }
+            slow = self.slow_files()
+            report = {
+                'wall_ms': round((time.perf_counter() - self.started) * 1000, 1),
+                'phases': phases,
+                'files': len(self.files),
+                'slow_ms': self.slow_ms,
+                'slow_files': slow,
+                'errors': list(self.errors),
+            }
+        for item in slow:
+            print(f"Slow file ({item['ms']} ms): {item['path']} {item['phases']}", file=sys.stderr)
+        if profile_top is not None:
+            report['profile'] = {'path': self.profile_path, 'top': profile_top}
+        return report
+
+NULL_INSTRUMENTATION = Instrumentation(enabled=False)
+
+def from_options(enabled=False, slow_ms=None, profile_path=None, config=None):
+    """Builds the instrumentation of a run from command line options (slow threshold defaults to the config)."""
+    if not (enabled or profile_path):
+        return NULL_INSTRUMENTATION
+    if slow_ms is None:
+        slow_ms = float((config or {}).get('cli_slow_file_ms', DEFAULT_SLOW_MS))
+    return Instrumentation(slow_ms=slow_ms, profile_path=profile_path)
@@ -0,0 +1,353 @@
+"""Keeps the tag index of the music library current from filesystem events.
+
+Usage: python3 cli/library_watcher.py [ROOT] [--poll] [--interval 5] [--stable 2] [--quiet]
+
+ROOT defaults to music_root_path from the config. On start the library is
+synced once (same crawl as --verify --recursive), then only changed files are
+re-parsed: inotify when available, a periodic stat scan otherwise. A file is
+parsed once it has been stable (same size and mtime) for --stable seconds, so
+files still being written by zotify are not indexed half-way.
+
+Every change is appended as one JSON line to var/storage/library_events.ndjson
+(and printed on stdout):
+    {"seq": 12, "time": ..., "event": "added|updated|deleted|error", "path": ..., "record": {...}}
+While the watcher runs it refreshes a heartbeat in the index, which lets
+`music_downloader.py --verify DIR --index-only` answer from the index without
+crawling.
+"""
+import os
+import sys
+import json
+import time
+import errno
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+
+from tag_index import STORAGE_DIR, open_tag_index
+from crawler import IGNORED_DIRS, scan_files, entry_stat
+from music_downloader import AUDIO_EXTENSIONS, load_config, safe_read_file_tags, build_record, iter_verify_directory
+
+EVENTS_FILE = os.path.join(STORAGE_DIR, 'library_events.ndjson')
+EVENTS_MAX_BYTES = 5 * 1024 * 1024
+HEARTBEAT_INTERVAL = 5
+
+# inotify(7) masks
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')
+
+def is_audio(path):
+    return path.lower().endswith(AUDIO_EXTENSIONS)
+
+class InotifyBackend:
+    """Recursive inotify watch on a directory tree (Linux only, through libc)."""
+
+    def __init__(self, root):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.root = root
+        self.dirs = {}
+        self.add_tree(root)
+
+    def add_tree(self, top):
+        """Watches top and its subdirectories; returns the audio files found below it."""
+        found = []
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [name for name in dirs if name not in IGNORED_DIRS]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, 'inotify watch limit reached (fs.inotify.max_user_watches)')
+                continue
+            self.dirs[wd] = root
+            found.extend(os.path.join(root, name) for name in files if is_audio(name))
+        return found
+
+    def poll(self, timeout):
+        """Waits up to timeout seconds; returns (changed, deleted, resync) path lists."""
+        changed, deleted, resync = [], [], False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed, deleted, resync
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return changed, deleted, resync
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                resync = True
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.dirs[wd]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue
+            path = os.path.join(directory, name) if name else directory
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.extend(self.add_tree(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    deleted.append(path)
+            elif is_audio(name):
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    deleted.append(path)
+                else:
+                    changed.append(path)
+        return changed, deleted, resync
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingBackend:
+    """Fallback: compares (size, mtime) snapshots of the tree every interval seconds."""
+
+    def __init__(self, root, interval=5.0):
+        self.root = root
+        self.interval = interval
+        self.snapshot = self.scan()
+        self.next_scan = time.monotonic() + interval
+
+    def scan(self):
+        snapshot = {}
+        for entry in scan_files(self.root, AUDIO_EXTENSIONS):
+            st = entry_stat(entry)
+            if st is not None:
+                snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout):
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return [], [], False
+        time.sleep(max(0.0, wait))
+        self.next_scan = time.monotonic() + self.interval
+
+        current = self.scan()
+        changed = [path for path, sig in current.items() if self.snapshot.get(path) != sig]
+        deleted = [path for path in self.snapshot if path not in current]
+        self.snapshot = current
+        return changed, deleted, False
+
+    def close(self):
+        pass
+
+class EventLog:
+    """Append-only NDJSON change log, rotated to .1 when it grows past max_bytes."""
+
+    def __init__(self, path=EVENTS_FILE, max_bytes=EVENTS_MAX_BYTES, echo=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.echo = echo
+        self.seq = self.last_seq()
+
+    def last_seq(self):
+        # Keep numbering across restarts so consumers can resume from the last seq they saw
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(max(0, os.path.getsize(self.path) - 4096))
+                lines = f.read().splitlines()
+            return int(json.loads(lines[-1])['seq']) if lines else 0
+        except (OSError, ValueError, KeyError, IndexError):
+            return 0
+
+    def emit(self, event, path, record=None):
+        self.seq += 1
+        line = json.dumps({'seq': self.seq, 'time': time.time(), 'event': event, 'path': path, 'record': record})
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+        except OSError:
+            pass
+        if self.echo:
+            print(line, flush=True)
+
+class LibraryWatcher:
+    """Debounces backend changes and applies them to the tag index."""
+
+    def __init__(self, root, index, backend, events, stable_seconds=2.0):
+        self.root = root
+        self.index = index
+        self.backend = backend
+        self.events = events
+        self.stable_seconds = stable_seconds
+        # path -> (time of the last change seen, (size, mtime_ns) at that time)
+        self.pending = {}
+        self.last_heartbeat = 0.0
+
+    def full_sync(self):
+        """Brings the index up to date with a full crawl (start-up and inotify overflow).
+
+        The crawl writes through the watcher's own connection, which commits in
+        small batches, and the heartbeat keeps being refreshed meanwhile so
+        --index-only readers do not fall back to crawling during a long sync.
+        """
+        for _ in iter_verify_directory(self.root, recursive=True, index=self.index):
+            self.heartbeat()
+        self.heartbeat(force=True)
+
+    def heartbeat(self, force=False):
+        now = time.time()
+        if force or now - self.last_heartbeat >= HEARTBEAT_INTERVAL:
+            # A failed write (e.g. lock timeout) turns writes off; a long-lived watcher tries again
+            self.index.writable = True
+            self.index.set_meta('watcher:' + self.root, now)
+            self.index.commit()
+            self.last_heartbeat = now
+
+    def signature(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def mark(self, paths):
+        now = time.monotonic()
+        for path in paths:
+            self.pending[path] = (now, self.signature(path))
+
+    def flush_stable(self):
+        """Indexes the pending files that did not change for stable_seconds."""
+        now = time.monotonic()
+        dirty = False
+        for path, (seen, sig) in list(self.pending.items()):
+            if now - seen < self.stable_seconds:
+                continue
+            current = self.signature(path)
+            if current != sig:
+                # Still being written (or gone meanwhile): wait for another quiet period
+                self.pending[path] = (now, current)
+                continue
+            del self.pending[path]
+            if current is None:
+                self.forget(path)
+            else:
+                self.refresh(path, current)
+            dirty = True
+            # Commits what was indexed so far every few seconds during a large batch
+            self.heartbeat()
+        if dirty:
+            self.index.commit()
+
+    def refresh(self, path, sig):
+        size, mtime_ns = sig
+        if self.index.lookup(path, size, mtime_ns) is not None:
+            return
+        known = self.index.contains(path)
+        tags = safe_read_file_tags(path)
+        if 'error' in tags:
+            self.index.store(path, size, mtime_ns, None)
+            self.events.emit('error', path, {'error': tags['error']})
+            return
+        self.index.store(path, size, mtime_ns, tags)
+        record = build_record(self.root, os.path.basename(path), path, size, mtime_ns / 1e9, tags)
+        self.events.emit('updated' if known else 'added', path, record)
+
+    def forget(self, path):
+        self.index.remove(path)
+        self.events.emit('deleted', path)
+
+    def run(self):
+        self.full_sync()
+        while True:
+            timeout = self.stable_seconds / 2 if self.pending else HEARTBEAT_INTERVAL
+            changed, deleted, resync = self.backend.poll(timeout)
+            if resync:
+                self.pending.clear()
+                self.full_sync()
+            self.mark(changed)
+            for path in deleted:
+                self.pending.pop(path, None)
+                if is_audio(path):
+                    self.forget(path)
+                else:
+                    # A whole directory left the library
+                    self.pending = {p: v for p, v in self.pending.items() if not p.startswith(os.path.join(path, ''))}
+                    self.index.remove(path)
+                    self.events.emit('deleted', path)
+            if deleted:
+                self.index.commit()
+            self.flush_stable()
+            self.heartbeat()
+
+def open_backend(root, force_poll=False, interval=5.0):
+    if not force_poll:
+        try:
+            return InotifyBackend(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling every {interval}s", file=sys.stderr)
+    return PollingBackend(root, interval=interval)
+
+def get_float_arg(argv, name, default):
+    if name in argv:
+        try:
+            return float(argv[argv.index(name) + 1])
+        except (IndexError, ValueError):
+            pass
+    return default
+
+def main():
+    argv = sys.argv[1:]
+    positional = [arg for i, arg in enumerate(argv) if not arg.startswith('--') and (i == 0 or argv[i - 1] not in ('--interval', '--stable'))]
+    interval = get_float_arg(argv, '--interval', 5.0)
+    stable = get_float_arg(argv, '--stable', 2.0)
+
+    # Wait for a configured, mounted library instead of exiting (supervisord would loop)
+    while True:
+        root = positional[0] if positional else load_config().get('music_root_path', '')
+        if root and os.path.isdir(root):
+            break
+        time.sleep(30)
+    root = os.path.abspath(root)
+
+    index = open_tag_index()
+    if index is None:
+        print("Tag index unavailable, nothing to keep up to date.", file=sys.stderr)
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    backend = open_backend(root, force_poll='--poll' in argv, interval=interval)
+    watcher = LibraryWatcher(root, index, backend, EventLog(echo='--quiet' not in argv), stable_seconds=stable)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.close()
+        index.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import re
+
+# Lyrics kinds, as stored in tag records ('lyrics_kind')
+KIND_NONE = 'none'
+KIND_UNSYNCED = 'unsynced'
+KIND_PARTIAL = 'partial'    # some lines timed, others not
+KIND_SYNCED = 'synced'
+
+# [mm:ss], [mm:ss.xx], [mm:ss.xxx], [mm:ss:xx]; several may prefix one line
+STAMP = r'\[\d{1,3}:[0-5]?\d(?:[.:]\d{1,3})?\]'
+STAMP_RE = re.compile(r'\[(\d{1,3}):([0-5]?\d)(?:[.:](\d{1,3}))?\]')
+TIMED_LINE_RE = re.compile(r'^[ \t]*((?:' + STAMP + r'[ \t]*)+)([^\r\n]*)', re.M)
+# Standard LRC ID tags: [ar:...], [ti:...], [offset:+250], ...
+ID_TAG_RE = re.compile(r'^[ \t]*\[(ar|ti|al|au|by|re|ve|la|id|tool|length|offset|#)[ \t]*:([^\]\r\n]*)\][ \t]*\r?$', re.M | re.I)
+# A bracketed line not starting with a digit: Genius section headers ([Chorus], [Verse 1: Artist]) and ID tags
+BRACKET_LINE = r'\[[^\]\d\r\n][^\]\r\n]*\][ \t]*\r?$'
+# Lyric line without a timestamp; section headers, ID tags and blank lines do not count
+UNTIMED_LINE_RE = re.compile(r'^[ \t]*(?!' + STAMP + r')(?!' + BRACKET_LINE + r')(\S[^\r\n]*)', re.M)
+# Enhanced LRC word timings: <mm:ss.xx>
+WORD_STAMP_RE = re.compile(r'<\d{1,3}:\d{1,2}(?:[.:]\d{1,3})?>[ \t]*')
+
+def stamp_ms(minutes, seconds, fraction):
+    ms = int(fraction.ljust(3, '0')[:3]) if fraction else 0
+    return (int(minutes) * 60 + int(seconds)) * 1000 + ms
+
+def lyrics_kind(text, truncated=False):
+    """Classifies lyrics as none / unsynced / partial / synced without splitting the text.
+
+    Only real timing tags count: [Chorus], [Verse 1: Artist] or [ar:Artist]
+    lines do not make lyrics synced. With truncated (text cut after a fixed
+    number of bytes), the possibly cut last line is ignored.
+    """
+    if not text or text.strip().lower() in ('', 'none'):
+        return KIND_NONE
+    if truncated:
+        cut = text.rfind('\n')
+        text = text[:cut] if cut >= 0 else ''
+    # Two searches that stop at their first match; only fully synced text is scanned to the end
+    if not TIMED_LINE_RE.search(text):
+        return KIND_UNSYNCED
+    return KIND_PARTIAL if UNTIMED_LINE_RE.search(text) else KIND_SYNCED
+
+def parse_lrc(text):
+    """Parses LRC text.
+
+    Returns {'lines': [(ms, text), ...] sorted by time with [offset:] applied,
+    'tags': {'ar': ..., 'offset': ...}, 'untimed': [lines without timestamps],
+    'kind': lyrics_kind()}. A line with several stamps appears once per stamp;
+    enhanced LRC word timings are dropped from the text.
+    """
+    tags = {match.group(1).lower(): match.group(2).strip() for match in ID_TAG_RE.finditer(text or '')}
+    try:
+        offset = int(tags.get('offset', '0').strip() or 0)
+    except ValueError:
+        offset = 0
+
+    lines = []
+    for match in TIMED_LINE_RE.finditer(text or ''):
+        lyric = WORD_STAMP_RE.sub('', match.group(2)).strip()
+        for stamp in STAMP_RE.finditer(match.group(1)):
+            # A positive offset shows the lyrics earlier
+            lines.append((max(0, stamp_ms(*stamp.groups()) - offset), lyric))
+    lines.sort(key=lambda item: item[0])
+
+    untimed = [match.group(1).strip() for match in UNTIMED_LINE_RE.finditer(text or '')]
+
+    return {'lines': lines, 'tags': tags, 'untimed': untimed, 'kind': lyrics_kind(text)}
+
+def to_lrc(lines, tags=None):
+    """Formats [(ms, text), ...] back to LRC text ([mm:ss.xx] stamps)."""
+    out = [f"[{key}:{value}]" for key, value in (tags or {}).items() if key != 'offset']
+    for ms, text in lines:
+        minutes, rest = divmod(ms, 60000)
+        out.append(f"[{minutes:02d}:{rest // 1000:02d}.{(rest % 1000) // 10:02d}]{text}")
+    return '\n'.join(out)
@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+
+from tag_index import normalize_text
+
+# var/storage/ is 1 level up from cli/
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(os.path.dirname(SCRIPT_DIR), 'var', 'storage', 'lyrics_cache.sqlite')
+
+DAY = 86400
+DEFAULT_HIT_TTL = 90 * DAY
+DEFAULT_MISS_TTL = 7 * DAY
+DEFAULT_MAX_ENTRIES = 50000
+# Writes (answers and the last_used of hits) are committed every COMMIT_EVERY
+# statements or COMMIT_INTERVAL seconds; the size cap is enforced every EVICT_EVERY puts
+COMMIT_EVERY = 200
+COMMIT_INTERVAL = 2.0
+EVICT_EVERY = 500
+
+class LyricsCache:
+    """Persistent lookup cache for lyrics providers, keyed by provider + normalised (artist, title).
+
+    Both hits and misses are stored, with their own TTL, so tracks that were
+    not found are not queried again on every run. The table is capped at
+    max_entries rows; the least recently used rows are evicted first (when
+    the cache opens and every EVICT_EVERY puts). Hits only update last_used in
+    memory until the next batched commit. The cache is best effort: a
+    database error is reported once, lookups then miss and answers are not
+    stored. Safe to share between the fetcher threads.
+    """
+
+    def __init__(self, db_path=None, hit_ttl=DEFAULT_HIT_TTL, miss_ttl=DEFAULT_MISS_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path or CACHE_FILE
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'stores': 0}
+        self.writable = True
+        self.pending = 0
+        self.first_pending = 0.0
+        self.puts = 0
+        # (provider, artist, title) -> last_used of the hits not written yet
+        self.touched = {}
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS lyrics ('
+            ' provider TEXT NOT NULL,'
+            ' artist TEXT NOT NULL,'
+            ' title TEXT NOT NULL,'
+            ' lyrics TEXT,'
+            ' synced INTEGER NOT NULL DEFAULT 0,'
+            ' fetched_at REAL NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (provider, artist, title)'
+            ')'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS lyrics_last_used ON lyrics (last_used)')
+        self.conn.commit()
+        with self.lock:
+            self._evict()
+            self._commit()
+
+    def get(self, provider, artist, title):
+        """Returns (lyrics, synced) for a fresh entry (lyrics is None for a cached miss), or None."""
+        key = (provider, normalize_text(artist), normalize_text(title))
+        now = time.time()
+        with self.lock:
+            try:
+                row = self.conn.execute(
+                    'SELECT lyrics, synced, fetched_at FROM lyrics WHERE provider = ? AND artist = ? AND title = ?', key
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            lyrics, synced, fetched_at = row
+            ttl = self.hit_ttl if lyrics else self.miss_ttl
+            if now - fetched_at > ttl:
+                self.stats['misses'] += 1
+                return None
+
+            if self.writable:
+                self.touched[key] = now
+                self._written()
+            self.stats['hits' if lyrics else 'negative_hits'] += 1
+            return lyrics, bool(synced)
+
+    def put(self, provider, artist, title, lyrics, synced=False):
+        """Stores a provider answer. Pass lyrics=None to remember that nothing was found."""
+        key = (provider, normalize_text(artist), normalize_text(title))
+        now = time.time()
+        with self.lock:
+            if not self._write(
+                'INSERT OR REPLACE INTO lyrics (provider, artist, title, lyrics, synced, fetched_at, last_used)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                key + (lyrics or None, 1 if synced else 0, now, now)
+            ):
+                return
+            self.touched.pop(key, None)
+            self.stats['stores'] += 1
+            self.puts += 1
+            if self.puts % EVICT_EVERY == 0:
+                self._evict()
+
+    # The methods below run under self.lock
+
+    def _write(self, sql, params=(), many=False):
+        """Runs one write statement; False (and no more writes) if the database refused it."""
+        if not self.writable:
+            return False
+        try:
+            if many:
+                self.conn.executemany(sql, params)
+            else:
+                self.conn.execute(sql, params)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return False
+        self._written()
+        return True
+
+    def _written(self):
+        if not self.pending:
+            self.first_pending = time.monotonic()
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY or time.monotonic() - self.first_pending >= COMMIT_INTERVAL:
+            self._commit()
+
+    def _commit(self):
+        if not self.writable:
+            return
+        touched, self.touched = self.touched, {}
+        try:
+            if touched:
+                self.conn.executemany(
+                    'UPDATE lyrics SET last_used = ? WHERE provider = ? AND artist = ? AND title = ?',
+                    [(used,) + key for key, used in touched.items()]
+                )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+        self.pending = 0
+
+    def _disable(self, error):
+        print(f"Lyrics cache not updated ({error}), continuing without it.", file=sys.stderr)
+        self.writable = False
+        self.pending = 0
+        self.touched = {}
+        try:
+            self.conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self):
+        # Pending last_used updates first, so the least recently used rows go
+        self._commit()
+        try:
+            count = self.conn.execute('SELECT COUNT(*) FROM lyrics').fetchone()[0]
+        except sqlite3.Error:
+            return
+        excess = count - self.max_entries
+        if excess > 0:
+            self._write(
+                'DELETE FROM lyrics WHERE rowid IN (SELECT rowid FROM lyrics ORDER BY last_used ASC LIMIT ?)',
+                (excess,)
+            )
+
+    def close(self):
+        with self.lock:
+            self._commit()
+            self.conn.close()
+
+def open_lyrics_cache(config=None, db_path=None):
+    """Opens the cache with TTLs/size from the config, or returns None if storage is unavailable."""
+    config = config or {}
+    try:
+        return LyricsCache(
+            db_path=db_path,
+            hit_ttl=float(config.get('lyrics_cache_hit_ttl_days', DEFAULT_HIT_TTL / DAY)) * DAY,
+            miss_ttl=float(config.get('lyrics_cache_miss_ttl_days', DEFAULT_MISS_TTL / DAY)) * DAY,
+            max_entries=int(config.get('lyrics_cache_max_entries', DEFAULT_MAX_ENTRIES))
+        )
+    except (sqlite3.Error, OSError, ValueError):
+        return None
@@ -3,17 +3,25 @@
 import os
 import argparse
 import json
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import USLT, ID3
+from mutagen.id3 import USLT, SYLT, ID3
 from mutagen.mp4 import MP4, MP4FreeForm
-import requests
 from tqdm import tqdm
 import colorama
 from colorama import Fore, Style
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 from bs4 import BeautifulSoup  # Ajout pour parser les pages Genius
+from lyrics_cache import open_lyrics_cache
+from http_client import get_client
+from crawler import scan_files, entry_stat
+from tag_index import open_tag_index
+from lrc import KIND_NONE, KIND_SYNCED, lyrics_kind, parse_lrc
+from id3_tags import read_tag
+from instrumentation import NULL_INSTRUMENTATION, from_options
 
 colorama.init()
 
@@ -29,13 +37,89 @@ SOURCES = {
     'spotify': 'https://api.spotify.com/v1/'
 }
 
+# Limites par fournisseur: (requêtes simultanées, requêtes/seconde)
+DEFAULT_PROVIDER_LIMITS = {
+    'lrclib': (4, 5.0),
+    'genius': (2, 2.0)
+}
+
+# Objets de tags gardés au plus entre process_directory et save_lyrics (les autres sont relus)
+MAX_LOADED_TAGS = 64
+
+class ProviderLimiter:
+    """Caps concurrent requests to one provider and spaces them with a token bucket."""
+
+    def __init__(self, max_concurrent, rate, burst=None):
+        self.semaphore = threading.BoundedSemaphore(max(1, int(max_concurrent)))
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(max_concurrent)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire_token(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        try:
+            self.acquire_token()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+        return False
+
 class LyricsFetcher:
-    def __init__(self, config_file=None, force_dl_all=False, force_dl_unsync=False, add_unsync=False):
+    def __init__(self, config_file=None, force_dl_all=False, force_dl_unsync=False, add_unsync=False, workers=None, use_cache=True, use_index=True,
+                 write_workers=None, write_sylt=None, write_lrc=None, timings=None):
         self.config = self.load_config()
         self.results = {}
         self.force_dl_all = force_dl_all
         self.force_dl_unsync = force_dl_unsync
         self.add_unsync = add_unsync
+        self.workers = max(1, int(workers or self.config.get('lyrics_workers', 4) or 1))
+        self.use_index = use_index
+        # Chronométrage optionnel (--instrument), sans effet par défaut
+        self.timings = timings or NULL_INSTRUMENTATION
+        self.write_workers = max(1, int(write_workers or self.config.get('lyrics_write_workers', 4) or 1))
+        # Écritures simultanées quand les paroles sont enregistrées au fil de l'eau
+        self.write_slots = threading.BoundedSemaphore(self.write_workers)
+        self.write_sylt = self.config.get('lyrics_write_sylt', False) if write_sylt is None else write_sylt
+        self.write_lrc = self.config.get('lyrics_write_lrc', False) if write_lrc is None else write_lrc
+        # Tags chargés par process_file pour les fichiers à écrire (chemin -> (objet, taille, mtime_ns)),
+        # bornés par MAX_LOADED_TAGS
+        self.loaded = {}
+        # Enregistrements de l'index des tags pour les fichiers inchangés (chemin -> tags)
+        self.known = {}
+
+        # Un limiteur par fournisseur, partagé par tous les threads
+        self.limiters = {}
+        for provider, (concurrency, rate) in DEFAULT_PROVIDER_LIMITS.items():
+            self.limiters[provider] = ProviderLimiter(
+                self.config.get(f'lyrics_{provider}_concurrency', concurrency),
+                self.config.get(f'lyrics_{provider}_rate', rate)
+            )
+
+        # Session HTTP partagée (keep-alive, retries, stats par hôte)
+        self.http = get_client(self.config)
+
+        # Cache persistant des réponses lrclib/Genius (succès et échecs)
+        self.cache = open_lyrics_cache(self.config) if use_cache else None
         
         # Initialisation de Spotify avec spotipy
         spotify_cid = self.config.get("spotify_client_id", "")
@@ -60,168 +144,330 @@ class LyricsFetcher:
                 pass
         return {}
 
-    def fetch_synced_lyrics(self, title, artist):
+    def cached_lookup(self, provider, title, artist, query):
+        """Runs a provider query through the persistent cache.
+
+        Only definitive answers (lyrics or "not found") are cached; network and
+        server errors raise in query() and are neither cached nor reported.
+        """
+        if self.cache:
+            cached = self.cache.get(provider, artist, title)
+            if cached is not None:
+                return cached
         try:
-            params = {
-                'track_name': title,
-                'artist_name': artist
-            }
-            token = self.config.get("lrclib_token")
-            headers = {'Authorization': f'Bearer {token}'} if token else {}
-            response = requests.get(f"{SOURCES['lrclib']}get", params=params, headers=headers, timeout=10)
-            data = response.json()
-            if data.get('syncedLyrics'):
-                return data['syncedLyrics'], True
+            lyrics, is_synced = query(title, artist)
         except Exception as e:
-            pass # Silently fail for fetchers
+            self.timings.error(f"fetch_{provider}", f"{artist} - {title}", e)
+            return None, False # Silently fail for fetchers
+        if self.cache:
+            self.cache.put(provider, artist, title, lyrics, is_synced)
+        return lyrics, is_synced
 
-        return None, False
+    def fetch_synced_lyrics(self, title, artist):
+        return self.cached_lookup('lrclib', title, artist, self.query_lrclib)
 
     def fetch_unsynced_lyrics(self, title, artist):
-        try:
-            token = self.config.get("genius_api_token")
-            if not token:
-                return None, False
-                
-            headers = {'Authorization': f'Bearer {token}'}
-            params = {'q': f'{title} {artist}'}
-            response = requests.get(f"{SOURCES['genius']}search", headers=headers, params=params, timeout=10)
-            data = response.json()
-            if data.get('response', {}).get('hits'):
-                song_url = data['response']['hits'][0]['result']['url']
-                page_response = requests.get(song_url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-                if page_response.status_code == 200:
-                    soup = BeautifulSoup(page_response.text, 'html.parser')
-                    lyrics_containers = soup.find_all('div', {'data-lyrics-container': 'true'})
-                    if lyrics_containers:
-                        lyrics = ''
-                        for container in lyrics_containers:
-                            for br in container.find_all('br'):
-                                br.replace_with('\n')
-                            lyrics += container.get_text(separator='\n') + '\n'
-                        
-                        lyrics_lines = []
-                        for line in lyrics.split('\n'):
-                            line = line.strip()
-                            if line:
-                                if line.startswith('['):
-                                    lyrics_lines.append('')
-                                lyrics_lines.append(line)
-                        return '\n'.join(lyrics_lines), False
-        except Exception as e:
-            pass
+        if not self.config.get("genius_api_token"):
+            return None, False
+        return self.cached_lookup('genius', title, artist, self.query_genius)
 
+    def query_lrclib(self, title, artist):
+        params = {
+            'track_name': title,
+            'artist_name': artist
+        }
+        token = self.config.get("lrclib_token")
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.http.get(f"{SOURCES['lrclib']}get", params=params, headers=headers, limiter=self.limiters['lrclib'])
+        # 404 = piste inconnue (réponse définitive), le reste est une erreur temporaire
+        if response.status_code not in (200, 404):
+            raise RuntimeError(f"lrclib HTTP {response.status_code}")
+        data = response.json()
+        if data.get('syncedLyrics'):
+            return data['syncedLyrics'], True
         return None, False
 
-    def has_synced_lyrics(self, lyrics):
-        if not lyrics: return False
+    def query_genius(self, title, artist):
+        token = self.config.get("genius_api_token")
+        headers = {'Authorization': f'Bearer {token}'}
+        params = {'q': f'{title} {artist}'}
+        response = self.http.get(f"{SOURCES['genius']}search", headers=headers, params=params, limiter=self.limiters['genius'])
+        if response.status_code != 200:
+            raise RuntimeError(f"Genius HTTP {response.status_code}")
+        data = response.json()
+        if not data.get('response', {}).get('hits'):
+            return None, False
+
+        song_url = data['response']['hits'][0]['result']['url']
+        page_response = self.http.get(song_url, headers={'User-Agent': 'Mozilla/5.0'}, limiter=self.limiters['genius'])
+        if page_response.status_code != 200:
+            raise RuntimeError(f"Genius page HTTP {page_response.status_code}")
+
+        soup = BeautifulSoup(page_response.text, 'html.parser')
+        lyrics_containers = soup.find_all('div', {'data-lyrics-container': 'true'})
+        if not lyrics_containers:
+            return None, False
+
+        lyrics = ''
+        for container in lyrics_containers:
+            for br in container.find_all('br'):
+                br.replace_with('\n')
+            lyrics += container.get_text(separator='\n') + '\n'
+        
+        lyrics_lines = []
         for line in lyrics.split('\n'):
             line = line.strip()
-            if line.startswith('[') and ']' in line:
-                content = line.split(']')[0][1:]
-                try:
-                    parts = content.split(':')
-                    if len(parts) >= 2: return True
-                except: continue
-        return False
+            if line:
+                if line.startswith('['):
+                    lyrics_lines.append('')
+                lyrics_lines.append(line)
+        return '\n'.join(lyrics_lines), False
 
-    def get_genre(self, file_path):
-        try:
-            audio = EasyID3(file_path)
-            return audio.get('genre', [''])[0].lower()
-        except: return ''
+    def load_tags(self, file_path):
+        """Charge les tags une seule fois : (objet mutagen, infos, paroles existantes).
+
+        L'objet est gardé pour l'étape d'écriture, qui n'a donc pas à rouvrir le fichier.
+        """
+        if file_path.lower().endswith('.m4a'):
+            tags = MP4(file_path)
+            first = lambda key, default: str(tags.get(key, [default])[0])
+            info = {
+                'title': first('\xa9nam', 'Untitled'),
+                'artist': first('\xa9ART', 'Unknown'),
+                'album': first('\xa9alb', 'Unknown'),
+                'genre': first('\xa9gen', ''),
+            }
+            existing = tags.get('\xa9lyr', [None])[0]
+        else:
+            tags = ID3(file_path)
+            info = {
+                'title': read_tag(tags, 'title', 'Untitled'),
+                'artist': read_tag(tags, 'artist', 'Unknown'),
+                'album': read_tag(tags, 'album', 'Unknown'),
+                'genre': read_tag(tags, 'genre', ''),
+            }
+            lyrics_tags = tags.getall('USLT')
+            existing = lyrics_tags[0].text if lyrics_tags else None
+        return tags, info, existing
 
     def process_file(self, file_path):
         try:
-            audio = EasyID3(file_path)
-            title = audio.get('title', ['Untitled'])[0]
-            artist = audio.get('artist', ['Unknown'])[0]
-            album = audio.get('album', ['Unknown'])[0]
-            
+            # Fichier inchangé déjà indexé : les décisions de saut se prennent sans l'ouvrir
+            record = self.known.get(file_path)
+            if record:
+                report_data = {
+                    'artist': record.get('artist') or 'Unknown',
+                    'album': record.get('album') or 'Unknown',
+                    'title': record.get('song_name') or 'Untitled',
+                    'file': os.path.basename(file_path)
+                }
+                genre = (record.get('genre') or '').lower()
+                if 'instrumental' in genre or 'ambiance' in genre:
+                    return {**report_data, 'status': 'skipped', 'reason': 'instrumental/ambiance'}
+                kind = record['lyrics_kind']
+                if kind != KIND_NONE and not self.force_dl_all:
+                    if not (self.force_dl_unsync and kind != KIND_SYNCED):
+                        return {**report_data, 'status': 'skipped', 'reason': 'already present'}
+
+            with self.timings.phase('parse', file_path):
+                st = os.stat(file_path)
+                tags, info, existing_lyrics = self.load_tags(file_path)
+            title, artist = info['title'], info['artist']
+
             report_data = {
                 'artist': artist,
-                'album': album,
+                'album': info['album'],
                 'title': title,
                 'file': os.path.basename(file_path)
             }
 
-            genre = self.get_genre(file_path)
+            genre = info['genre'].lower()
             if 'instrumental' in genre or 'ambiance' in genre:
                 return {**report_data, 'status': 'skipped', 'reason': 'instrumental/ambiance'}
-            
-            existing_lyrics = None
-            is_existing_synced = False
-            if file_path.lower().endswith('.mp3'):
-                try:
-                    audio_full = ID3(file_path)
-                    lyrics_tags = audio_full.getall('USLT')
-                    if lyrics_tags:
-                        existing_lyrics = lyrics_tags[0].text
-                        is_existing_synced = self.has_synced_lyrics(existing_lyrics)
-                except: pass
-            elif file_path.lower().endswith('.m4a'):
-                try:
-                    audio_full = MP4(file_path)
-                    if audio_full.get('\xa9lyr', []):
-                        existing_lyrics = audio_full['\xa9lyr'][0]
-                        is_existing_synced = self.has_synced_lyrics(existing_lyrics)
-                except: pass
 
+            is_existing_synced = bool(existing_lyrics) and lyrics_kind(existing_lyrics) == KIND_SYNCED
             if existing_lyrics:
                 if not self.force_dl_all:
                     if not (self.force_dl_unsync and not is_existing_synced):
                         return {**report_data, 'status': 'skipped', 'reason': 'already present'}
 
-            lyrics, is_synced = self.fetch_synced_lyrics(title, artist)
+            with self.timings.phase('fetch_lrclib', file_path):
+                lyrics, is_synced = self.fetch_synced_lyrics(title, artist)
             if not lyrics and self.add_unsync:
-                lyrics, is_synced = self.fetch_unsynced_lyrics(title, artist)
+                with self.timings.phase('fetch_genius', file_path):
+                    lyrics, is_synced = self.fetch_unsynced_lyrics(title, artist)
 
             if lyrics:
+                # Gardé pour l'écriture, avec la taille et la date vues au chargement
+                if len(self.loaded) < MAX_LOADED_TAGS:
+                    self.loaded[file_path] = (tags, st.st_size, st.st_mtime_ns)
                 return {**report_data, 'status': 'found', 'lyrics': lyrics, 'synced': is_synced}
             return {**report_data, 'status': 'not_found'}
         except Exception as e:
+            self.timings.error('process', file_path, e)
             return {'file': os.path.basename(file_path), 'status': 'error', 'message': str(e)}
 
-    def process_directory(self, path, recursive=False):
+    def process_and_save(self, file_path):
+        """process_file puis, si des paroles sont trouvées, leur écriture immédiate (au plus write_workers à la fois)."""
+        result = self.process_file(file_path)
+        if result.get('status') == 'found':
+            with self.write_slots:
+                self.save_result(file_path, result)
+        return result
+
+    def process_directory(self, path, recursive=False, save=False):
+        """Traite les fichiers ; avec save, les paroles trouvées sont écrites au fil de l'eau.
+
+        Chaque objet de tags n'est alors gardé que le temps de son fichier.
+        """
         files = []
-        if os.path.isfile(path):
-            if path.lower().endswith(('.mp3', '.m4a')):
-                files.append(path)
-        elif os.path.isdir(path):
-            if recursive:
-                for root, _, filenames in os.walk(path):
-                    for filename in filenames:
-                        if filename.lower().endswith(('.mp3', '.m4a')):
-                            files.append(os.path.join(root, filename))
-            else:
-                for filename in os.listdir(path):
-                    file_path = os.path.join(path, filename)
-                    if os.path.isfile(file_path) and filename.lower().endswith(('.mp3', '.m4a')):
-                        files.append(file_path)
+        stats = {}
+        with self.timings.phase('crawl'):
+            if os.path.isfile(path):
+                if path.lower().endswith(('.mp3', '.m4a')):
+                    files.append(path)
+                    stats[path] = os.stat(path)
+            elif os.path.isdir(path):
+                for entry in scan_files(path, ('.mp3', '.m4a'), max_depth=None if recursive else 0):
+                    files.append(entry.path)
+                    stats[entry.path] = entry_stat(entry)
+        with self.timings.phase('index'):
+            self.load_known(stats)
         
+        process = self.process_and_save if save else self.process_file
         # Ensure tqdm writes to stderr to avoid polluting stdout (JSON)
-        for file_path in tqdm(files, desc="Fetching lyrics", disable=len(files) < 2, file=sys.stderr):
-            result = self.process_file(file_path)
-            self.results[file_path] = result
+        if self.workers <= 1 or len(files) < 2:
+            for file_path in tqdm(files, desc="Fetching lyrics", disable=len(files) < 2, file=sys.stderr):
+                result = process(file_path)
+                self.results[file_path] = result
+            return
+
+        # Concurrent mode: providers are protected by their own limiters,
+        # results are stored back in file order so the output matches serial mode
+        done = {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(files))) as executor:
+            futures = {executor.submit(process, file_path): file_path for file_path in files}
+            for future in tqdm(as_completed(futures), total=len(files), desc="Fetching lyrics", file=sys.stderr):
+                done[futures[future]] = future.result()
+        for file_path in files:
+            self.results[file_path] = done[file_path]
+
+    def load_known(self, stats):
+        """Loads the tag index records of unchanged files (main thread: the index is not thread-safe)."""
+        self.known = {}
+        if not self.use_index or not stats:
+            return
+        index = open_tag_index()
+        if index is None:
+            return
+        try:
+            for file_path, st in stats.items():
+                record = index.lookup(file_path, st.st_size, st.st_mtime_ns) if st else None
+                # Records written before lyrics_kind existed still need the file
+                if record and record.get('lyrics_kind'):
+                    self.known[file_path] = record
+        finally:
+            index.close()
+
+    def close(self):
+        self.loaded.clear()
+        if self.cache:
+            self.cache.close()
+            self.cache = None
+
+    def reload_if_changed(self, file_path):
+        """Objet de tags chargé par process_file, rechargé si le fichier a changé depuis."""
+        tags, size, mtime_ns = self.loaded.pop(file_path, (None, None, None))
+        st = os.stat(file_path)
+        if tags is None or st.st_size != size or st.st_mtime_ns != mtime_ns:
+            tags = MP4(file_path) if file_path.lower().endswith('.m4a') else ID3(file_path)
+        return tags
+
+    def write_file(self, file_path, result):
+        """Écrit les paroles d'un fichier en une seule sauvegarde ; renvoie 'saved' ou 'unchanged'."""
+        lyrics = result['lyrics']
+        tags = self.reload_if_changed(file_path)
+        changed = False
+        if file_path.lower().endswith('.m4a'):
+            if tags.get('\xa9lyr') != [lyrics]:
+                tags['\xa9lyr'] = [lyrics]
+                changed = True
+        else:
+            current = tags.get('USLT::eng')
+            if current is None or current.text != lyrics:
+                tags.add(USLT(encoding=3, lang='eng', text=lyrics))
+                changed = True
+            if self.write_sylt and result.get('synced'):
+                # SYLT : horodatage en millisecondes (format 2), type 1 = paroles
+                lines = [(text, ms) for ms, text in parse_lrc(lyrics)['lines']]
+                current = tags.get('SYLT::eng')
+                if lines and (current is None or current.text != lines):
+                    tags.add(SYLT(encoding=3, lang='eng', format=2, type=1, desc='', text=lines))
+                    changed = True
+        if changed:
+            tags.save()
+
+        if self.write_lrc and result.get('synced'):
+            changed = write_sidecar(os.path.splitext(file_path)[0] + '.lrc', lyrics) or changed
+        return 'saved' if changed else 'unchanged'
+
+    def save_result(self, file_path, result):
+        """Écrit un résultat 'found' et note l'issue dans result['write']."""
+        try:
+            with self.timings.phase('save', file_path):
+                result['write'] = self.write_file(file_path, result)
+        except Exception as e:
+            result['write'] = 'error'
+            self.timings.error('save', file_path, e)
+            print(f"Error saving {file_path}: {e}", file=sys.stderr)
+        return result['write']
 
     def save_lyrics(self):
-        saved_count = 0
-        for file_path, result in self.results.items():
-            if isinstance(result, dict) and result.get('status') == 'found':
-                try:
-                    if file_path.lower().endswith('.mp3'):
-                        audio = ID3(file_path)
-                        audio.add(USLT(encoding=3, lang='eng', text=result['lyrics']))
-                        audio.save()
-                        saved_count += 1
-                    elif file_path.lower().endswith('.m4a'):
-                        audio = MP4(file_path)
-                        audio['\xa9lyr'] = [result['lyrics']]
-                        audio.save()
-                        saved_count += 1
-                except Exception as e:
-                    print(f"Error saving {file_path}: {e}", file=sys.stderr)
-        return saved_count
+        """Étape d'écriture : un pool borné (lyrics_write_workers), chaque fichier écrit au plus une fois.
+
+        Les fichiers déjà écrits par process_directory(save=True) sont comptés sans être réécrits.
+        """
+        found = [(file_path, result) for file_path, result in self.results.items()
+                 if isinstance(result, dict) and result.get('status') == 'found']
+        to_save = [item for item in found if 'write' not in item[1]]
+
+        with ThreadPoolExecutor(max_workers=min(self.write_workers, max(1, len(to_save)))) as executor:
+            for _ in tqdm(executor.map(lambda item: self.save_result(*item), to_save), total=len(to_save),
+                          desc="Saving lyrics", disable=len(to_save) < 2, file=sys.stderr):
+                pass
+        self.loaded.clear()
+        return sum(1 for _, result in found if result.get('write') == 'saved')
+
+def write_sidecar(path, lyrics):
+    """Écrit le fichier .lrc à côté du morceau (remplacement atomique) ; False s'il est déjà identique."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            if f.read() == lyrics:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(lyrics)
+    os.replace(tmp, path)
+    return True
+
+def build_json_summary(results):
+    """Simple JSON-friendly summary for PHP (shared by --json and the tag daemon)."""
+    summary = []
+    for path, res in results.items():
+        if isinstance(res, dict):
+            summary.append({
+                'file': res.get('file'),
+                'artist': res.get('artist'),
+                'album': res.get('album'),
+                'title': res.get('title'),
+                'status': res.get('status'),
+                'type': 'synced' if res.get('synced') else ('unsynced' if res.get('status') == 'found' else 'none'),
+                'reason': res.get('reason'),
+                'write': res.get('write')
+            })
+    return summary
 
 def main():
     parser = argparse.ArgumentParser(description='Lyrics fetcher and tagger')
@@ -232,29 +478,32 @@ def main():
     parser.add_argument('--force-dl-unsync', '-n', action='store_true', help='Force lyrics download only if existing are unsynced')
     parser.add_argument('--add-unsync', '-u', action='store_true', help='Fetch unsynced from Genius if synced not found')
     parser.add_argument('--json', '-j', action='store_true', help='Output results as JSON')
+    parser.add_argument('--workers', '-w', type=int, default=None, help='Number of files processed concurrently (1 = serial)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the persistent lyrics lookup cache')
+    parser.add_argument('--no-index', action='store_true', help='Always read the files instead of trusting the tag index')
+    parser.add_argument('--write-workers', type=int, default=None, help='Number of files written concurrently when saving')
+    parser.add_argument('--sylt', action='store_true', default=None, help='Also write synced lyrics as a SYLT frame (mp3)')
+    parser.add_argument('--lrc', action='store_true', default=None, help='Also write synced lyrics to an .lrc file next to the track')
+    parser.add_argument('--instrument', action='store_true', help='Time each phase and file (JSON output becomes {"results", "instrumentation"})')
+    parser.add_argument('--slow-ms', type=float, default=None, help='Files taking at least this long are listed as slow (with --instrument)')
+    parser.add_argument('--profile', default=None, help='Write cProfile stats to this file (implies --instrument)')
+    parser.add_argument('--http-stats', action='store_true', help='Print per-host HTTP latency/error counters to stderr')
     args = parser.parse_args()
 
-    fetcher = LyricsFetcher(force_dl_all=args.force_dl_all, force_dl_unsync=args.force_dl_unsync, add_unsync=args.add_unsync)
-    fetcher.process_directory(args.directory, args.recursive)
+    fetcher = LyricsFetcher(force_dl_all=args.force_dl_all, force_dl_unsync=args.force_dl_unsync, add_unsync=args.add_unsync, workers=args.workers, use_cache=not args.no_cache, use_index=not args.no_index,
+                            write_workers=args.write_workers, write_sylt=args.sylt, write_lrc=args.lrc)
+    fetcher.timings = from_options(args.instrument, args.slow_ms, args.profile, fetcher.config)
+    fetcher.process_directory(args.directory, args.recursive, save=args.force_save)
+    fetcher.close()
 
-    if args.force_save:
-        fetcher.save_lyrics()
+    if args.http_stats:
+        print(json.dumps({'http': fetcher.http.stats()}), file=sys.stderr)
 
+    instrumentation = fetcher.timings.summary()
     if args.json:
         # Simple JSON output for PHP
-        summary = []
-        for path, res in fetcher.results.items():
-            if isinstance(res, dict):
-                summary.append({
-                    'file': res.get('file'),
-                    'artist': res.get('artist'),
-                    'album': res.get('album'),
-                    'title': res.get('title'),
-                    'status': res.get('status'),
-                    'type': 'synced' if res.get('synced') else ('unsynced' if res.get('status') == 'found' else 'none'),
-                    'reason': res.get('reason')
-                })
-        print(json.dumps(summary))
+        summary = build_json_summary(fetcher.results)
+        print(json.dumps(summary if instrumentation is None else {'results': summary, 'instrumentation': instrumentation}))
     else:
         # Human report
         print("\n=== Lyrics Fetching Report ===")
@@ -275,6 +524,8 @@ def main():
                     color = Fore.RED
                     msg = res.get('message', 'Error')
                 print(f"{color}{res.get('file')}: {msg}{Style.RESET_ALL}")
+        if instrumentation is not None:
+            print(json.dumps({'instrumentation': instrumentation}, indent=2))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,26 @@
 import sys
 import os
 import json
+import re
+import time
+import codecs
 import subprocess
+import threading
+import weakref
+from functools import partial
+from itertools import islice
+
+from tag_index import open_tag_index, match_key, normalize_text
+from crawler import scan_files, entry_stat
+from tag_probe import probe_file_tags
+from lrc import KIND_NONE, lyrics_kind
+from zotify_progress import BAR_RE, ProgressTracker, StatusWriter
+from download_batch import parse_jobs, run_batch
+from instrumentation import NULL_INSTRUMENTATION, from_options
+
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.m4a', '.opus', '.ogg', '.wav')
+# Files crawled, then parsed, at a time by --verify
+VERIFY_CHUNK = 256
 
 def load_config():
     # Adjust path if needed, assuming cli/ matches project root/cli/
@@ -14,48 +33,737 @@ def load_config():
             return json.load(f)
     return {}
 
-def verify_directory(directory, recursive=False):
+def read_file_tags(file_path):
+    """Extracts the fields used by the music files table from a single audio file."""
     import music_tag
-    results = []
+    f = music_tag.load_file(file_path)
+
+    # Check for lyrics within ID3 tags
+    lyrics = str(f['lyrics']).strip()
+    has_lyrics = len(lyrics) > 0 and lyrics.lower() != 'none'
+
+    # Normalize artist delimiters
+    artist = str(f['artist'])
+    artist = artist.replace(' / ', ', ').replace(' /', ', ').replace('/ ', ', ').replace('/', ', ')
+    artist = artist.replace('; ', ', ').replace(';', ', ')
+
+    return {
+        'artist': artist,
+        'album': str(f['album']),
+        'song_name': str(f['title']),
+        'genre': str(f['genre']),
+        'lyrics': has_lyrics,
+        'lyrics_kind': lyrics_kind(lyrics) if has_lyrics else KIND_NONE
+    }
+
+def safe_read_file_tags(file_path, probe=True):
+    """Same as read_file_tags but never raises, so one bad file cannot break a worker batch.
+
+    With probe, the header-only reader of tag_probe is tried first (no cover
+    art or full lyrics loaded); files it does not handle go through music_tag.
+    """
+    try:
+        tags = probe_file_tags(file_path) if probe else None
+        return tags if tags is not None else read_file_tags(file_path)
+    except Exception as e:
+        return {'error': str(e)}
+
+def timed_read_file_tags(file_path, probe=True):
+    """safe_read_file_tags plus its duration, measured where the parsing runs (possibly a worker process)."""
+    started = time.perf_counter()
+    tags = safe_read_file_tags(file_path, probe)
+    return tags, time.perf_counter() - started
+
+def iter_parse_files(file_paths, workers=1, probe=True, timings=NULL_INSTRUMENTATION, pool=None):
+    """Parses tags for the given files and yields the records in the same order.
+
+    With workers > 1 the parsing is spread over a process pool (tag parsing is
+    CPU-bound): pool if given (see open_parse_pool), else one for this call.
+    If the pool dies (e.g. a worker is killed), the files that did not get a
+    result are parsed serially in this process. With timings enabled, each
+    file's parse time is measured where it runs and recorded here.
+    """
+    if not timings.enabled:
+        yield from _map_files(safe_read_file_tags, file_paths, workers, probe, pool)
+        return
+    for file_path, (tags, seconds) in zip(file_paths, _map_files(timed_read_file_tags, file_paths, workers, probe, pool)):
+        timings.add('parse', seconds, file_path, 'error' in tags)
+        yield tags
+
+# multiprocessing start method of the parse pools (None = the platform default).
+# The threaded daemon uses one that does not fork it: a fork taken while another
+# thread holds a lock (sqlite, _lock_for, logging) can deadlock the workers.
+POOL_START_METHOD = None
+
+def open_parse_pool(workers):
+    """Process pool shared by several iter_parse_files calls, or None for serial parsing."""
+    if workers <= 1:
+        return None
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    context = multiprocessing.get_context(POOL_START_METHOD) if POOL_START_METHOD else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def close_parse_pool(pool):
+    # Queued files are dropped, only those already being parsed are waited for
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _map_files(reader, file_paths, workers, probe, pool=None):
+    if workers <= 1 or len(file_paths) < 2:
+        for file_path in file_paths:
+            yield reader(file_path, probe)
+        return
+
+    from concurrent.futures.process import BrokenProcessPool
+
+    own_pool = pool is None
+    if own_pool:
+        workers = min(workers, len(file_paths))
+        pool = open_parse_pool(workers)
+    chunksize = max(1, len(file_paths) // (workers * 4))
+    done = 0
+    try:
+        for result in pool.map(partial(reader, probe=probe), file_paths, chunksize=chunksize):
+            done += 1
+            yield result
+    except BrokenProcessPool:
+        pass
+    finally:
+        if own_pool:
+            close_parse_pool(pool)
+
+    for file_path in file_paths[done:]:
+        yield reader(file_path, probe)
+
+def iter_verify_directory(directory, recursive=False, use_index=True, workers=1, stats=None, index_only=False, probe=True,
+                          timings=NULL_INSTRUMENTATION, index=None):
+    """Yields one record per readable audio file, as soon as it is available.
+
+    The crawl and the parsing are interleaved in chunks of VERIFY_CHUNK files,
+    so the first records come out before the crawl ends, and closing the
+    generator early stops both (queued parse jobs are cancelled).
+    Records come out in crawl order, whatever the worker count. If stats is a
+    dict it is filled with counters for the summary line of --ndjson.
+    With index_only, a directory kept current by library_watcher.py is answered
+    from the tag index without crawling (a regular crawl is done otherwise).
+    index is an already open TagIndex to use (and leave open) instead of
+    opening one.
+    """
+    if stats is None:
+        stats = {}
+    stats.update({'total': 0, 'indexed': 0, 'parsed': 0, 'errors': 0})
     if not os.path.isdir(directory):
-        return results
+        return
 
-    audio_extensions = ('.mp3', '.flac', '.m4a', '.opus', '.ogg', '.wav')
-    
-    walker = os.walk(directory) if recursive else [(directory, [], os.listdir(directory))]
-    
-    for root, _, files_in_dir in walker:
-        for filename in files_in_dir:
-            if filename.lower().endswith(audio_extensions):
-                file_path = os.path.join(root, filename)
-                try:
-                    f = music_tag.load_file(file_path)
-                    
-                    # Check for lyrics within ID3 tags
-                    lyrics = str(f['lyrics']).strip()
-                    has_lyrics = len(lyrics) > 0 and lyrics.lower() != 'none'
-
-                    # Normalize artist delimiters
-                    artist = str(f['artist'])
-                    artist = artist.replace(' / ', ', ').replace(' /', ', ').replace('/ ', ', ').replace('/', ', ')
-                    artist = artist.replace('; ', ', ').replace(';', ', ')
-
-                    results.append({
-                        'artist': artist,
-                        'album': str(f['album']),
-                        'song_name': str(f['title']),
-                        'filename': filename,
-                        'rel_path': os.path.relpath(file_path, directory),
-                        'full_path': file_path,
-                        'size': os.path.getsize(file_path),
-                        'mtime': os.path.getmtime(file_path),
-                        'genre': str(f['genre']),
-                        'lyrics': has_lyrics
-                    })
-                except Exception as e:
+    # Unchanged files (same size + mtime) are served from the on-disk index
+    own_index = index is None
+    if own_index:
+        index = open_tag_index() if use_index else None
+
+    try:
+        if index_only and index and index.is_watched(directory):
+            stats['watched'] = True
+            yield from iter_index_records(directory, index, recursive, stats)
+            return
+
+        # Crawl a chunk, then parse what the index does not know, keeping crawl order
+        crawl = iter_crawl_entries(directory, recursive)
+        seen = set() if index and recursive else None
+        pool = open_parse_pool(workers)
+        try:
+            while True:
+                with timings.phase('crawl'):
+                    chunk = list(islice(crawl, VERIFY_CHUNK))
+                if not chunk:
+                    break
+                if seen is not None:
+                    seen.update(entry[1] for entry in chunk)
+                yield from iter_file_records(directory, chunk, index, workers, stats, probe, timings, pool=pool)
+        finally:
+            close_parse_pool(pool)
+
+        # Only a complete crawl can tell which rows are stale
+        if seen is not None:
+            with timings.phase('index_prune'):
+                index.prune(directory, seen)
+    finally:
+        if index and own_index:
+            index.close()
+
+def iter_crawl_entries(directory, recursive=False):
+    """Lazily yields (filename, path, stat) for the audio files below directory."""
+    for entry in scan_files(directory, AUDIO_EXTENSIONS, max_depth=None if recursive else 0):
+        st = entry_stat(entry)
+        if st is not None:
+            yield entry.name, entry.path, st
+
+def iter_index_records(directory, index, recursive, stats):
+    """Verify records straight from the tag index, sorted by path."""
+    for file_path, size, mtime_ns, tags in sorted(index.iter_records(directory)):
+        if not recursive and os.path.dirname(file_path) != directory.rstrip(os.sep):
+            continue
+        stats['indexed'] += 1
+        stats['total'] += 1
+        yield build_record(directory, os.path.basename(file_path), file_path, size, mtime_ns / 1e9, tags)
+
+def iter_file_records(directory, entries, index=None, workers=1, stats=None, probe=True, timings=NULL_INSTRUMENTATION,
+                      pool=None):
+    """Turns crawled (filename, path, stat) entries into verify records, in the same order.
+
+    Unchanged files are served from the tag index; the others are parsed
+    (possibly in parallel) and stored back. Unreadable files are skipped.
+    """
+    if stats is None:
+        stats = {}
+    for key in ('total', 'indexed', 'parsed', 'errors'):
+        stats.setdefault(key, 0)
+
+    resolved = []
+    to_parse = []
+    with timings.phase('index_lookup'):
+        for filename, file_path, st in entries:
+            tags = index.lookup(file_path, st.st_size, st.st_mtime_ns) if index else None
+            resolved.append((filename, file_path, st, tags))
+            if tags is None:
+                to_parse.append(file_path)
+
+    parsed = iter_parse_files(to_parse, workers=workers, probe=probe, timings=timings, pool=pool)
+    for filename, file_path, st, tags in resolved:
+        if tags is None:
+            tags = next(parsed)
+            stats['parsed'] += 1
+            if index:
+                with timings.phase('index_store', file_path):
+                    index.store(file_path, st.st_size, st.st_mtime_ns, None if 'error' in tags else tags)
+        else:
+            stats['indexed'] += 1
+
+        if 'error' in tags:
+            stats['errors'] += 1
+            continue
+
+        stats['total'] += 1
+        yield build_record(directory, filename, file_path, st.st_size, st.st_mtime, tags)
+
+def build_record(directory, filename, file_path, size, mtime, tags):
+    return {
+        'artist': tags['artist'],
+        'album': tags['album'],
+        'song_name': tags['song_name'],
+        'filename': filename,
+        'rel_path': os.path.relpath(file_path, directory),
+        'full_path': file_path,
+        'size': size,
+        'mtime': mtime,
+        'genre': tags['genre'],
+        'lyrics': tags['lyrics'],
+        'lyrics_kind': tags.get('lyrics_kind')
+    }
+
+def verify_directory(directory, recursive=False, use_index=True, workers=1, index_only=False, probe=True,
+                     timings=NULL_INSTRUMENTATION):
+    return list(iter_verify_directory(directory, recursive=recursive, use_index=use_index, workers=workers,
+                                      index_only=index_only, probe=probe, timings=timings))
+
+def crawl_recent(directory, since=None, subdirs=None):
+    """Crawls directory (or only the given subdirectories) for audio files modified at or after since.
+
+    Directories not modified since then are only listed for their
+    subdirectories: a download creates its files, which updates the mtime of
+    the directory they land in, so their own files are not stat'ed.
+    """
+    roots = [os.path.join(directory, subdir) for subdir in subdirs] if subdirs else [directory]
+    entries = []
+    for base in roots:
+        for entry in scan_files(base, AUDIO_EXTENSIONS, modified_since=since):
+            st = entry_stat(entry)
+            if st is not None and (since is None or st.st_mtime >= since):
+                entries.append((entry.name, entry.path, st))
+    return entries
+
+# Files read at most by the fallback scan of match_tracks
+MATCH_FALLBACK_MAX_FILES = 2000
+
+def _folder_key(name):
+    # zotify replaces characters that are not allowed in file names, so compare letters and digits only
+    return re.sub(r'\W+', '', normalize_text(name))
+
+def fallback_dirs(directory, tracks):
+    """Top-level folders of directory named after the artist or the album of one of the tracks."""
+    wanted = set()
+    for track in tracks:
+        artist, album, _ = match_key(track.get('artist'), track.get('album'), track.get('song_name'))
+        wanted.update((_folder_key(artist), _folder_key(album)))
+    wanted.discard('')
+    try:
+        with os.scandir(directory) as it:
+            return sorted(entry.path for entry in it if entry.is_dir() and _folder_key(entry.name) in wanted)
+    except OSError:
+        return []
+
+def match_tracks(directory, expected, since=None, subdirs=None, use_index=True, workers=1, timings=NULL_INSTRUMENTATION):
+    """Matches expected tracks ({artist, album, song_name}) against the files of a download.
+
+    Only files modified since `since` (epoch seconds) and/or under `subdirs` are
+    read, so the cost follows the size of the download, not of the library.
+    Expected tracks still missing after that scan are looked up among the
+    unchanged files of the tag index (e.g. skipped because already downloaded).
+    The mtime pruning misses files rewritten in place, and it is unreliable on
+    CIFS. Tracks still missing after both steps are therefore looked for in a
+    full scan of the top-level folders named after their artist or album. That
+    scan reads at most MATCH_FALLBACK_MAX_FILES files.
+    Returns {'matched': [...], 'missing': [...], 'extra': [...], 'stats': {...}}:
+    matched and extra are verify records, missing are the expected entries.
+    """
+    stats = {'expected': len(expected), 'scanned': 0, 'from_index': 0, 'fallback_scanned': 0, 'from_fallback': 0}
+    index = open_tag_index() if use_index else None
+    try:
+        found = {}
+        if os.path.isdir(directory):
+            with timings.phase('crawl'):
+                entries = crawl_recent(directory, since=since, subdirs=subdirs)
+            stats['scanned'] = len(entries)
+            for record in iter_file_records(directory, entries, index, workers, stats, timings=timings):
+                found.setdefault(match_key(record['artist'], record['album'], record['song_name']), []).append(record)
+
+        matched, missing = [], []
+        for track in expected:
+            candidates = found.get(match_key(track.get('artist'), track.get('album'), track.get('song_name')))
+            if candidates:
+                matched.append(candidates.pop(0))
+            else:
+                missing.append(track)
+        extra = [record for records in found.values() for record in records]
+
+        if missing and index:
+            wanted = {}
+            for track in missing:
+                wanted.setdefault(match_key(track.get('artist'), track.get('album'), track.get('song_name')), []).append(track)
+            recovered = []
+            with timings.phase('index_recover'):
+                for file_path, size, mtime_ns, tags in index.find_by_keys(directory, list(wanted)):
+                    key = match_key(tags.get('artist'), tags.get('album'), tags.get('song_name'))
+                    if not wanted.get(key):
+                        continue
+                    try:
+                        st = os.stat(file_path)
+                    except OSError:
+                        continue
+                    if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                        continue
+                    recovered.append(wanted[key].pop(0))
+                    matched.append(build_record(directory, os.path.basename(file_path), file_path, size, st.st_mtime, tags))
+            stats['from_index'] = len(recovered)
+            recovered_ids = {id(track) for track in recovered}
+            missing = [track for track in missing if id(track) not in recovered_ids]
+
+        if missing and os.path.isdir(directory):
+            known = {record['full_path'] for record in matched + extra}
+            entries = []
+            with timings.phase('fallback_crawl'):
+                for base in fallback_dirs(directory, missing):
+                    for entry in scan_files(base, AUDIO_EXTENSIONS):
+                        st = entry.path not in known and entry_stat(entry)
+                        if st:
+                            entries.append((entry.name, entry.path, st))
+                        if len(entries) >= MATCH_FALLBACK_MAX_FILES:
+                            break
+                    if len(entries) >= MATCH_FALLBACK_MAX_FILES:
+                        break
+            stats['fallback_scanned'] = len(entries)
+            wanted = {}
+            for track in missing:
+                wanted.setdefault(match_key(track.get('artist'), track.get('album'), track.get('song_name')), []).append(track)
+            recovered = []
+            for record in iter_file_records(directory, entries, index, workers, stats, timings=timings):
+                key = match_key(record['artist'], record['album'], record['song_name'])
+                if wanted.get(key):
+                    recovered.append(wanted[key].pop(0))
+                    matched.append(record)
+            stats['from_fallback'] = len(recovered)
+            recovered_ids = {id(track) for track in recovered}
+            missing = [track for track in missing if id(track) not in recovered_ids]
+    finally:
+        if index:
+            index.close()
+
+    stats['matched'] = len(matched)
+    stats['missing'] = len(missing)
+    return {'matched': matched, 'missing': missing, 'extra': extra, 'stats': stats}
+
+def print_ndjson(records, stats, timings=NULL_INSTRUMENTATION, flush_every=100, flush_interval=1.0):
+    """Writes one JSON object per line, flushing regularly, then a final summary line."""
+    started = time.monotonic()
+    last_flush = started
+    count = 0
+    try:
+        for record in records:
+            sys.stdout.write(json.dumps(record) + '\n')
+            count += 1
+            now = time.monotonic()
+            if count % flush_every == 0 or now - last_flush >= flush_interval:
+                sys.stdout.flush()
+                last_flush = now
+
+        summary = dict(stats)
+        summary['elapsed'] = round(time.monotonic() - started, 3)
+        last = {'summary': summary}
+        instrumentation = timings.summary()
+        if instrumentation is not None:
+            last['instrumentation'] = instrumentation
+        sys.stdout.write(json.dumps(last) + '\n')
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader stopped early: stop parsing and keep what was indexed so far
+        if hasattr(records, 'close'):
+            records.close()
+        sys.stdout = open(os.devnull, 'w')
+
+def parse_workers(value, default=1):
+    """Worker count from a flag or config value. 0 means one worker per CPU core, invalid values give default."""
+    try:
+        workers = int(value)
+    except (TypeError, ValueError):
+        return default
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def get_workers_arg(argv, default=1):
+    """Reads --workers N from argv (see parse_workers)."""
+    if '--workers' in argv:
+        i = argv.index('--workers')
+        return parse_workers(argv[i + 1] if i + 1 < len(argv) else None, default)
+    return default
+
+def config_workers(config):
+    return parse_workers(config.get('music_verify_workers', 1))
+
+def get_timings_arg(argv, config):
+    """Instrumentation from --instrument [--slow-ms N] [--profile PATH] in argv (disabled without them)."""
+    slow_ms = None
+    if '--slow-ms' in argv:
+        try:
+            slow_ms = float(argv[argv.index('--slow-ms') + 1])
+        except (IndexError, ValueError):
+            pass
+    profile = argv[argv.index('--profile') + 1] if '--profile' in argv[:-1] else None
+    return from_options('--instrument' in argv, slow_ms, profile, config)
+
+def pop_option(args, name, default=None):
+    """Removes `name value` from an argument list and returns value."""
+    if name in args:
+        i = args.index(name)
+        value = args[i + 1] if i + 1 < len(args) else default
+        del args[i:i + 2]
+        return value
+    return default
+
+def set_option(args, name, value):
+    if name in args and args.index(name) + 1 < len(args):
+        args[args.index(name) + 1] = value
+    else:
+        args.extend([name, value])
+
+def run_with_progress(command, progress_file, total_tracks=None, show_bars=False):
+    """Runs zotify with its output piped through a ProgressTracker; returns the exit code.
+
+    Output is echoed line by line as before, except the tqdm bars (unless
+    show_bars), which only feed the status file.
+    """
+    root_path = command[command.index('--root-path') + 1] if '--root-path' in command[:-1] else ''
+    tracker = ProgressTracker(root_path=root_path, total_tracks=total_tracks)
+    writer = StatusWriter(progress_file, tracker)
+    writer.update(force=True)
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               env=dict(os.environ, PYTHONUNBUFFERED='1'))
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    fd = process.stdout.fileno()
+    pending = ''
+    while True:
+        chunk = os.read(fd, 65536)
+        text = decoder.decode(chunk, final=not chunk)
+        if show_bars and text:
+            sys.stdout.write(text)
+        # tqdm redraws its bar with \r, every other message ends with \n
+        lines = re.split(r'\r\n|\r|\n', pending + text)
+        pending = lines.pop() if chunk else ''
+        if not chunk and pending:
+            lines.append(pending)
+        events = []
+        for line in lines:
+            if not show_bars and line.strip() and not BAR_RE.match(line.strip()):
+                sys.stdout.write(line + '\n')
+            events.extend(tracker.feed(line))
+        sys.stdout.flush()
+        writer.update(force=bool(events))
+        if not chunk:
+            break
+
+    returncode = process.wait()
+    writer.finish(returncode)
+    return returncode
+
+def get_file_tags(file_path):
+    """Comprehensive tag extraction for the tag editor (--tags)."""
+    import music_tag
+    if not os.path.exists(file_path):
+        return {'error': 'File not found'}
+    try:
+        f = music_tag.load_file(file_path)
+        return {
+            'title': str(f['title']),
+            'artist': str(f['artist']),
+            'album': str(f['album']),
+            'year': str(f['year']),
+            'genre': str(f['genre']),
+            'tracknumber': str(f['tracknumber']),
+            'totaltracks': str(f['totaltracks']),
+            'comment': str(f['comment']),
+            'lyrics': str(f['lyrics']),
+            'composer': str(f['composer']),
+            'discnumber': str(f['discnumber'])
+        }
+    except Exception as e:
+        return {'error': str(e)}
+
+def update_file_tags(file_path, tags):
+    """Writes the given {tag_name: value} pairs to a file with a single save (--update-tags)."""
+    import music_tag
+    if not os.path.exists(file_path):
+        return {'error': 'File not found'}
+    try:
+        f = music_tag.load_file(file_path)
+        updated = False
+        for tag_name, tag_value in tags.items():
+            f[tag_name] = tag_value
+            updated = True
+
+        if updated:
+            f.save()
+            return {'success': True, 'message': 'Tags updated successfully'}
+        return {'success': False, 'message': 'No tags provided to update'}
+    except Exception as e:
+        return {'error': str(e)}
+
+def bulk_update_tags(edits, workers=4):
+    """Applies a list of {path, tags} edits, one load and one save per file (--bulk-update-tags).
+
+    Edits of the same file are merged (later values win). Files are written on
+    a bounded thread pool; a failing file is reported in its result and does
+    not stop the others. Returns {'results': [...], 'summary': {...}} with the
+    results in the order files first appear in edits.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    merged = {}
+    results = {}
+    for i, edit in enumerate(edits):
+        if not isinstance(edit, dict) or not edit.get('path') or not isinstance(edit.get('tags'), dict):
+            results[f"#{i}"] = {'path': edit.get('path') if isinstance(edit, dict) else None, 'error': 'Invalid edit, expected {path, tags}'}
+            continue
+        merged.setdefault(edit['path'], {}).update(edit['tags'])
+        results.setdefault(edit['path'], None)
+
+    def apply(item):
+        path, tags = item
+        with _lock_for(path):
+            return path, update_file_tags(path, tags)
+
+    if merged:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(merged)))) as executor:
+            for path, result in executor.map(apply, merged.items()):
+                results[path] = dict(result, path=path)
+
+    ordered = list(results.values())
+    failed = sum(1 for result in ordered if 'error' in result or not result.get('success'))
+    return {'results': ordered, 'summary': {'files': len(ordered), 'updated': len(ordered) - failed, 'failed': failed}}
+
+def fetch_lyrics(path, recursive=False, force_save=False, force_dl_all=False, force_dl_unsync=False, add_unsync=False,
+                 instrument=False, slow_ms=None):
+    """Runs the lyrics fetcher and returns the same summary as lyrics_fetcher.py --json."""
+    from lyrics_fetcher import LyricsFetcher, build_json_summary
+    fetcher = LyricsFetcher(force_dl_all=force_dl_all, force_dl_unsync=force_dl_unsync, add_unsync=add_unsync)
+    fetcher.timings = from_options(instrument, slow_ms, config=fetcher.config)
+    try:
+        fetcher.process_directory(path, recursive, save=force_save)
+    finally:
+        fetcher.close()
+    summary = build_json_summary(fetcher.results)
+    instrumentation = fetcher.timings.summary()
+    return summary if instrumentation is None else {'results': summary, 'instrumentation': instrumentation}
+
+# --- Tag daemon (--serve) ---
+# Line-delimited JSON-RPC 2.0 over a Unix socket. The PHP side talks to it
+# directly and falls back to spawning this script when the socket is missing.
+
+SOCKET_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'var', 'storage', 'music_tags.sock')
+
+class _PathLock:
+    # threading.Lock cannot be weakly referenced, this wrapper can
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.lock.release()
+
+# Entries disappear once no request holds or waits for them, so the map stays small in a long-lived daemon
+_file_locks = weakref.WeakValueDictionary()
+_file_locks_guard = threading.Lock()
+
+def _lock_for(path):
+    # Serialize writes to the same file coming from concurrent requests
+    with _file_locks_guard:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = _PathLock()
+        return lock
+
+class InvalidParams(ValueError):
+    """Raised by an RPC method whose params have the wrong shape (JSON-RPC -32602)."""
+
+def _rpc_update_tags(params):
+    path = params['path']
+    with _lock_for(path):
+        return update_file_tags(path, params.get('tags') or {})
+
+def _rpc_bulk_update_tags(params):
+    edits = params['edits']
+    if not isinstance(edits, list) or not all(isinstance(edit, dict) for edit in edits):
+        raise InvalidParams('edits must be a list of objects')
+    return bulk_update_tags(edits, workers=parse_workers(params.get('workers', 4), 4))
+
+def _rpc_verify(params):
+    workers = parse_workers(params['workers']) if 'workers' in params else config_workers(load_config())
+    return verify_directory(
+        params['directory'],
+        recursive=bool(params.get('recursive', False)),
+        use_index=bool(params.get('use_index', True)),
+        workers=workers,
+        index_only=bool(params.get('index_only', False)),
+        probe=not params.get('full_tags', False)
+    )
+
+def _rpc_match(params):
+    workers = parse_workers(params['workers']) if 'workers' in params else config_workers(load_config())
+    return match_tracks(
+        params['directory'],
+        params.get('expected') or [],
+        since=params.get('since'),
+        subdirs=params.get('subdirs') or None,
+        use_index=bool(params.get('use_index', True)),
+        workers=workers
+    )
+
+def _rpc_lyrics(params):
+    return fetch_lyrics(
+        params['path'],
+        recursive=bool(params.get('recursive', False)),
+        force_save=bool(params.get('force_save', False)),
+        force_dl_all=bool(params.get('force_dl_all', False)),
+        force_dl_unsync=bool(params.get('force_dl_unsync', False)),
+        add_unsync=bool(params.get('add_unsync', False)),
+        instrument=bool(params.get('instrument', False)),
+        slow_ms=params.get('slow_ms')
+    )
+
+# method -> (handler, required params)
+RPC_METHODS = {
+    'ping': (lambda params: {'pong': True, 'pid': os.getpid()}, ()),
+    'tags': (lambda params: get_file_tags(params['path']), ('path',)),
+    'update-tags': (_rpc_update_tags, ('path',)),
+    'bulk-update-tags': (_rpc_bulk_update_tags, ('edits',)),
+    'verify': (_rpc_verify, ('directory',)),
+    'match': (_rpc_match, ('directory',)),
+    'lyrics': (_rpc_lyrics, ('path',)),
+}
+
+def handle_rpc_request(request):
+    """Dispatches one JSON-RPC request dict and returns the response dict."""
+    request_id = request.get('id') if isinstance(request, dict) else None
+    if not isinstance(request, dict) or request.get('method') not in RPC_METHODS:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32601, 'message': 'Method not found'}}
+
+    handler, required = RPC_METHODS[request['method']]
+    params = request.get('params') or {}
+    if not isinstance(params, dict):
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32602, 'message': 'Params must be an object'}}
+    missing = [name for name in required if name not in params]
+    if missing:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32602, 'message': f"Missing parameter: {', '.join(missing)}"}}
+    try:
+        result = handler(params)
+    except InvalidParams as e:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32602, 'message': str(e)}}
+    except KeyError as e:
+        # Parameters were checked above: this is a bug in the method, not a bad request
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32603, 'message': f"Internal error: KeyError {e}"}}
+    except Exception as e:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32000, 'message': str(e)}}
+    return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+def serve(socket_path=None):
+    import signal
+    import socket
+    import socketserver
+    import multiprocessing
+
+    global POOL_START_METHOD
+    socket_path = socket_path or SOCKET_FILE
+
+    # Requests run on threads: parse pools must not fork this process (see POOL_START_METHOD)
+    POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+    # Warm state: pay the import cost once, not per request
+    import music_tag  # noqa: F401
+
+    class RpcHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                line = line.strip()
+                if not line:
                     continue
-    
-    return results
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}}
+                else:
+                    response = handle_rpc_request(request)
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+    class RpcServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    # Refuse to start twice, but clean up a stale socket left by a crash
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            print(f"Tag daemon already listening on {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        except OSError:
+            os.unlink(socket_path)
+        finally:
+            probe.close()
+
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    server = RpcServer(socket_path, RpcHandler)
+    os.chmod(socket_path, 0o660)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print(f"Tag daemon listening on {socket_path}", file=sys.stderr)
+    sys.stderr.flush()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
 
 def main():
     config = load_config()
@@ -64,77 +772,120 @@ def main():
     # Check for verification mode
     if len(sys.argv) > 2 and sys.argv[1] == '--verify':
         is_recursive = '--recursive' in sys.argv or '-r' in sys.argv
-        results = verify_directory(sys.argv[2], recursive=is_recursive)
-        print(json.dumps(results))
+        use_index = '--no-index' not in sys.argv
+        index_only = '--index-only' in sys.argv
+        probe = '--full-tags' not in sys.argv
+        workers = get_workers_arg(sys.argv, default=config_workers(config))
+        timings = get_timings_arg(sys.argv, config)
+        if '--ndjson' in sys.argv:
+            # Streaming mode: one record per line, then {"summary": {...}}
+            stats = {}
+            records = iter_verify_directory(sys.argv[2], recursive=is_recursive, use_index=use_index, workers=workers, stats=stats, index_only=index_only, probe=probe, timings=timings)
+            print_ndjson(records, stats, timings)
+            return
+        results = verify_directory(sys.argv[2], recursive=is_recursive, use_index=use_index, workers=workers, index_only=index_only, probe=probe, timings=timings)
+        instrumentation = timings.summary()
+        print(json.dumps(results if instrumentation is None else {'results': results, 'instrumentation': instrumentation}))
+        return
+
+    # Check for download match mode: expected tracks (JSON list) on stdin
+    # Format: --match root [--since EPOCH] [--subdir DIR]... [--no-index] [--workers N] [--instrument]
+    if len(sys.argv) > 2 and sys.argv[1] == '--match':
+        since = None
+        subdirs = []
+        for i, arg in enumerate(sys.argv):
+            if arg == '--since':
+                try:
+                    since = float(sys.argv[i + 1])
+                except (IndexError, ValueError):
+                    print(json.dumps({'error': 'Usage: --match ROOT [--since EPOCH_SECONDS] [--subdir DIR]...'}))
+                    sys.exit(1)
+            elif arg == '--subdir' and i + 1 < len(sys.argv):
+                subdirs.append(sys.argv[i + 1])
+        expected = json.loads(sys.stdin.read() or '[]')
+        workers = get_workers_arg(sys.argv, default=config_workers(config))
+        timings = get_timings_arg(sys.argv, config)
+        result = match_tracks(sys.argv[2], expected, since=since, subdirs=subdirs or None,
+                              use_index='--no-index' not in sys.argv, workers=workers, timings=timings)
+        instrumentation = timings.summary()
+        if instrumentation is not None:
+            result['instrumentation'] = instrumentation
+        print(json.dumps(result))
+        return
+
+    # Persistent tag daemon mode
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve(sys.argv[2] if len(sys.argv) > 2 else None)
         return
 
     # Check for tag update mode
     if len(sys.argv) > 2 and sys.argv[1] == '--update-tags':
-        import music_tag
-        file_path = sys.argv[2]
-        if not os.path.exists(file_path):
-            print(json.dumps({'error': 'File not found'}))
-            return
-        
-        try:
-            # Parse tags to update from command line
-            # Format: --update-tags path --genre "Pop" --title "Song" ...
-            f = music_tag.load_file(file_path)
-            updated = False
-            
-            i = 3
-            while i < len(sys.argv):
-                arg = sys.argv[i]
-                if arg.startswith('--') and i + 1 < len(sys.argv):
-                    tag_name = arg[2:]
-                    tag_value = sys.argv[i+1]
-                    f[tag_name] = tag_value
-                    updated = True
-                    i += 2
-                else:
-                    i += 1
-            
-            if updated:
-                f.save()
-                print(json.dumps({'success': True, 'message': 'Tags updated successfully'}))
+        # Parse tags to update from command line
+        # Format: --update-tags path --genre "Pop" --title "Song" ...
+        tags = {}
+        i = 3
+        while i < len(sys.argv):
+            arg = sys.argv[i]
+            if arg.startswith('--') and i + 1 < len(sys.argv):
+                tags[arg[2:]] = sys.argv[i+1]
+                i += 2
             else:
-                print(json.dumps({'success': False, 'message': 'No tags provided to update'}))
-                
-        except Exception as e:
-            print(json.dumps({'error': str(e)}))
+                i += 1
+        print(json.dumps(update_file_tags(sys.argv[2], tags)))
+        return
+
+    # Check for bulk tag update mode: JSON list of {"path": ..., "tags": {...}} on stdin
+    if len(sys.argv) > 1 and sys.argv[1] == '--bulk-update-tags':
+        try:
+            edits = json.loads(sys.stdin.read() or '[]')
+        except ValueError as e:
+            print(json.dumps({'error': f'Invalid JSON on stdin: {e}'}))
+            sys.exit(1)
+        if not isinstance(edits, list):
+            print(json.dumps({'error': 'Expected a JSON list of {path, tags} edits'}))
+            sys.exit(1)
+        print(json.dumps(bulk_update_tags(edits, workers=get_workers_arg(sys.argv, default=4))))
         return
 
     # Check for single file tags mode
     if len(sys.argv) > 2 and sys.argv[1] == '--tags':
-        import music_tag
-        file_path = sys.argv[2]
-        if not os.path.exists(file_path):
-            print(json.dumps({'error': 'File not found'}))
-            return
-        try:
-            f = music_tag.load_file(file_path)
-            # Comprehensive tag extraction
-            tags = {
-                'title': str(f['title']),
-                'artist': str(f['artist']),
-                'album': str(f['album']),
-                'year': str(f['year']),
-                'genre': str(f['genre']),
-                'tracknumber': str(f['tracknumber']),
-                'totaltracks': str(f['totaltracks']),
-                'comment': str(f['comment']),
-                'lyrics': str(f['lyrics']),
-                'composer': str(f['composer']),
-                'discnumber': str(f['discnumber'])
-            }
-            print(json.dumps(tags))
-        except Exception as e:
-            print(json.dumps({'error': str(e)}))
+        print(json.dumps(get_file_tags(sys.argv[2])))
         return
 
+    # Batch mode: URLs as JSON on stdin, several zotify processes at once
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        args = sys.argv[2:]
+        max_parallel = int(pop_option(args, '--jobs', config.get('music_parallel_downloads', 3)) or 3)
+        timeout = pop_option(args, '--timeout')
+        manifest_path = pop_option(args, '--manifest')
+        work_dir = pop_option(args, '--work-dir')
+        root_path = args[args.index('--root-path') + 1] if '--root-path' in args[:-1] else config.get('music_root_path', '')
+        if not root_path:
+            print(json.dumps({"error": "No --root-path given and music_root_path is not configured"}))
+            sys.exit(1)
+        try:
+            jobs = parse_jobs(json.load(sys.stdin))
+        except ValueError as e:
+            print(json.dumps({"error": f"Invalid JSON on stdin: {e}"}))
+            sys.exit(1)
+        work_dir = work_dir or os.path.join(root_path, '.zotify_jobs', time.strftime('%Y%m%d-%H%M%S'))
+        manifest = run_batch(jobs, args, root_path, work_dir, max_parallel=max_parallel,
+                             timeout=float(timeout) if timeout else None, manifest_path=manifest_path)
+        print(json.dumps(manifest))
+        sys.exit(0 if all(job['status'] == 'success' for job in manifest['jobs']) else 1)
+
     # Arguments passed from PHP (excluding the script name itself)
     args = sys.argv[1:]
-    
+
+    # Wrapper-only options: machine-readable progress instead of scraping the log
+    progress_file = pop_option(args, '--progress-file')
+    progress_total = pop_option(args, '--progress-total')
+    show_bars = True
+    if progress_file:
+        show_bars = (pop_option(args, '--print-download-progress', 'False') or '').lower() == 'true'
+        set_option(args, '--print-download-progress', 'True')
+        set_option(args, '--print-downloads', 'True')
+
     # Final command
     command = [music_binary] + args
     
@@ -144,6 +895,9 @@ def main():
     sys.stdout.flush()
 
     try:
+        if progress_file:
+            total = int(progress_total) if progress_total and progress_total.isdigit() else None
+            sys.exit(run_with_progress(command, progress_file, total_tracks=total, show_bars=show_bars))
         # Use Popen without redirection to allow direct inheritance of stdout/stderr.
         # This ensures real-time output without Python-level buffering issues.
         process = subprocess.Popen(command)
@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import unicodedata
+
+# var/storage/ is 1 level up from cli/
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORAGE_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'var', 'storage')
+INDEX_FILE = os.path.join(STORAGE_DIR, 'tag_index.sqlite')
+
+# A watcher refreshes its heartbeat every few seconds; older than this it is considered gone
+WATCH_HEARTBEAT_MAX_AGE = 30
+# Writes are committed in small batches so other processes never wait long for the write lock
+COMMIT_EVERY = 200
+COMMIT_INTERVAL = 2.0
+
+# Parenthesised "(feat. X)" / "[with X]" or a trailing "- feat. X" on titles
+FEAT_RE = re.compile(r'\s*[\(\[]\s*(?:feat\.?|ft\.?|featuring|with)\s[^\)\]]*[\)\]]|\s+-?\s*(?:feat\.?|ft\.?|featuring)\s.*$', re.IGNORECASE)
+# Anything after the main artist: "A, B", "A; B", "A / B", "A & B", "A feat. B"
+ARTIST_SPLIT_RE = re.compile(r'\s*(?:,|;|/|&|\bfeat\.?\s|\bft\.?\s|\bfeaturing\s)\s*', re.IGNORECASE)
+
+def normalize_text(text):
+    """Case, accents-composition and whitespace insensitive form of a name (shared by every store key)."""
+    text = unicodedata.normalize('NFKC', str(text or '')).casefold()
+    return re.sub(r'\s+', ' ', text).strip()
+
+def match_key(artist, album, title):
+    """Normalised (main artist, album, title) key shared by expected tracks and files."""
+    main_artist = next((part for part in ARTIST_SPLIT_RE.split(str(artist or '')) if part.strip()), '')
+    return (normalize_text(main_artist), normalize_text(album), normalize_text(FEAT_RE.sub('', str(title or ''))))
+
+def record_key(record):
+    """match_key of a parsed record, as stored in the match_key column."""
+    return '\x1f'.join(match_key(record.get('artist'), record.get('album'), record.get('song_name')))
+
+class TagIndex:
+    """Persistent cache of parsed tags, keyed by file path and validated by size + mtime.
+
+    A row is only served back when the file on disk still has the exact same
+    size and mtime (nanoseconds) as when it was parsed, so any rewrite of the
+    file (new download, tag edit, lyrics save) invalidates it automatically.
+    Files that could not be parsed are stored too, so they are not retried
+    until they change.
+
+    The index is a cache: a write that fails (database locked past the busy
+    timeout, read-only storage) is logged and turns further writes off for
+    this connection instead of failing the caller, which keeps working as
+    with --no-index.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or INDEX_FILE
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # The music files page and the worker may verify at the same time
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tags ('
+            ' path TEXT PRIMARY KEY,'
+            ' size INTEGER NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' data TEXT,'
+            ' match_key TEXT'
+            ')'
+        )
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.commit()
+        try:
+            self._add_match_keys()
+        except sqlite3.Error:
+            pass
+        self.writable = True
+        self.pending = 0
+        self.first_pending = 0.0
+
+    def _add_match_keys(self):
+        # Indexes created before the match_key column: add it and key the existing rows once
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(tags)')}
+        if 'match_key' not in columns:
+            try:
+                self.conn.execute('ALTER TABLE tags ADD COLUMN match_key TEXT')
+            except sqlite3.OperationalError:
+                pass  # added meanwhile by another process
+            while True:
+                rows = self.conn.execute(
+                    'SELECT path, data FROM tags WHERE match_key IS NULL AND data IS NOT NULL LIMIT ?', (COMMIT_EVERY,)
+                ).fetchall()
+                if not rows:
+                    break
+                self.conn.executemany('UPDATE tags SET match_key = ? WHERE path = ?',
+                                      [(record_key(json.loads(data)), path) for path, data in rows])
+                self.conn.commit()
+        self.conn.execute('CREATE INDEX IF NOT EXISTS tags_match_key ON tags (match_key)')
+        self.conn.commit()
+
+    def lookup(self, path, size, mtime_ns):
+        """Returns the cached record for an unchanged file, or None if it must be (re)parsed."""
+        try:
+            row = self.conn.execute(
+                'SELECT size, mtime_ns, data FROM tags WHERE path = ?', (path,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        return json.loads(row[2]) if row[2] else {'error': 'unreadable'}
+
+    def contains(self, path):
+        try:
+            return self.conn.execute('SELECT 1 FROM tags WHERE path = ?', (path,)).fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+    def _write(self, sql, params=(), many=False):
+        """Runs one write statement; False (and no more writes) if the database refused it."""
+        if not self.writable:
+            return False
+        try:
+            if many:
+                self.conn.executemany(sql, params)
+            else:
+                self.conn.execute(sql, params)
+        except sqlite3.Error as e:
+            self._disable(e)
+            return False
+        if not self.pending:
+            self.first_pending = time.monotonic()
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY or time.monotonic() - self.first_pending >= COMMIT_INTERVAL:
+            self.commit()
+        return self.writable
+
+    def _disable(self, error):
+        print(f"Tag index not updated ({error}), continuing without it.", file=sys.stderr)
+        self.writable = False
+        self.pending = 0
+        try:
+            self.conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def store(self, path, size, mtime_ns, record):
+        """Saves the parsed record of a file. Pass None for files that failed to parse."""
+        data = json.dumps(record) if record is not None else None
+        key = record_key(record) if record is not None else None
+        return self._write(
+            'INSERT OR REPLACE INTO tags (path, size, mtime_ns, data, match_key) VALUES (?, ?, ?, ?, ?)',
+            (path, size, mtime_ns, data, key)
+        )
+
+    def prune(self, root, seen_paths):
+        """Removes rows below root that were not seen during the last full crawl."""
+        prefix = os.path.join(root, '')
+        try:
+            rows = self.conn.execute(
+                'SELECT path FROM tags WHERE substr(path, 1, ?) = ?', (len(prefix), prefix)
+            ).fetchall()
+        except sqlite3.Error:
+            return 0
+        stale = [(path,) for (path,) in rows if path not in seen_paths]
+        if stale and not self._write('DELETE FROM tags WHERE path = ?', stale, many=True):
+            return 0
+        return len(stale)
+
+    def remove(self, path):
+        """Forgets a file and, if path is a directory, everything below it."""
+        prefix = os.path.join(path, '')
+        self._write('DELETE FROM tags WHERE path = ? OR substr(path, 1, ?) = ?', (path, len(prefix), prefix))
+
+    def set_meta(self, key, value):
+        self._write('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def get_meta(self, key):
+        try:
+            row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def is_watched(self, directory, max_age=WATCH_HEARTBEAT_MAX_AGE):
+        """True if a library watcher keeps directory (or one of its parents) up to date right now."""
+        path = os.path.abspath(directory)
+        while True:
+            beat = self.get_meta('watcher:' + path)
+            if beat is not None and time.time() - float(beat) <= max_age:
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+    def iter_records(self, root):
+        """Yields (path, size, mtime_ns, record) for every parsed file known below root."""
+        prefix = os.path.join(root, '')
+        rows = self.conn.execute(
+            'SELECT path, size, mtime_ns, data FROM tags WHERE substr(path, 1, ?) = ? AND data IS NOT NULL',
+            (len(prefix), prefix)
+        )
+        for path, size, mtime_ns, data in rows:
+            yield path, size, mtime_ns, json.loads(data)
+
+    def find_by_keys(self, root, keys):
+        """Yields (path, size, mtime_ns, record) for the parsed files below root having one of the match_key tuples.
+
+        One indexed lookup per key, so the cost follows the number of keys, not the library size.
+        """
+        prefix = os.path.join(root, '')
+        for key in keys:
+            try:
+                rows = self.conn.execute(
+                    'SELECT path, size, mtime_ns, data FROM tags WHERE match_key = ? AND substr(path, 1, ?) = ?',
+                    ('\x1f'.join(key), len(prefix), prefix)
+                ).fetchall()
+            except sqlite3.Error:
+                return
+            for path, size, mtime_ns, data in rows:
+                yield path, size, mtime_ns, json.loads(data)
+
+    def commit(self):
+        if not self.pending:
+            return
+        try:
+            self.conn.commit()
+            self.pending = 0
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def close(self):
+        try:
+            self.commit()
+        finally:
+            self.conn.close()
+
+def open_tag_index(db_path=None):
+    """Opens the tag index, or returns None if the storage is not writable (index is best effort)."""
+    try:
+        return TagIndex(db_path)
+    except (sqlite3.Error, OSError):
+        return None
@@ -0,0 +1,379 @@
+"""Header-only tag probe for the listing views (music files table, --verify).
+
+Reads only the frames/atoms/comments behind artist, album, title, genre and
+the presence of lyrics, seeking over everything else (cover art, the bulk of
+the lyrics text, audio data). Supported: MP3 (ID3v2.2-2.4), M4A/MP4 (ilst),
+FLAC and Ogg Vorbis/Opus (Vorbis comments).
+
+probe_file_tags() returns raw values joined the same way music_tag does
+(', ' between multiple values), or None whenever the file uses something the
+probe does not handle exactly like mutagen (ID3 unsynchronisation or
+compression, ID3v1 fallback fields, numeric genres, unknown containers...):
+callers then use the full reader.
+"""
+import re
+import struct
+
+from lrc import lyrics_kind
+
+WANTED = ('artist', 'album', 'title', 'genre')
+# Bytes of lyrics text read to decide whether there are lyrics at all
+LYRICS_PEEK = 4096
+
+ID3_FRAMES = {
+    b'TPE1': 'artist', b'TALB': 'album', b'TIT2': 'title', b'TCON': 'genre', b'USLT': 'lyrics',
+    b'TP1': 'artist', b'TAL': 'album', b'TT2': 'title', b'TCO': 'genre', b'ULT': 'lyrics',
+}
+MP4_ITEMS = {
+    b'\xa9ART': 'artist', b'\xa9alb': 'album', b'\xa9nam': 'title', b'\xa9gen': 'genre', b'\xa9lyr': 'lyrics',
+}
+VORBIS_KEYS = {b'artist': 'artist', b'album': 'album', b'title': 'title', b'genre': 'genre', b'lyrics': 'lyrics'}
+
+ID3_ENCODINGS = {0: ('latin-1', b'\x00'), 1: ('utf-16', b'\x00\x00'), 2: ('utf-16-be', b'\x00\x00'), 3: ('utf-8', b'\x00')}
+FRAME_ID_RE = re.compile(rb'^[A-Z0-9]{3,4}$')
+# mutagen rewrites "(17)" / "17" style genres to names, leave those to it
+NUMERIC_GENRE_RE = re.compile(r'^\(|^\d+$')
+
+class Unsupported(Exception):
+    pass
+
+def probe_file_tags(file_path):
+    """Returns {'artist', 'album', 'song_name', 'genre', 'lyrics', 'lyrics_kind'} like read_file_tags, or None."""
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(12)
+            f.seek(0)
+            if head[:3] == b'ID3':
+                values = probe_id3(f)
+            elif head[4:8] == b'ftyp':
+                values = probe_mp4(f)
+            elif head[:4] == b'fLaC':
+                values = probe_flac(f)
+            elif head[:4] == b'OggS':
+                # Comment packets (and pictures stored in them) span many small pages:
+                # unbuffered reads fetch only the page headers while skipping
+                with open(file_path, 'rb', buffering=0) as raw:
+                    values = probe_ogg(raw)
+            else:
+                return None
+    except (Unsupported, OSError, struct.error, UnicodeDecodeError, ValueError):
+        return None
+
+    lyrics = ', '.join(values.get('lyrics', [])).strip()
+    artist = ', '.join(values.get('artist', []))
+    artist = artist.replace(' / ', ', ').replace(' /', ', ').replace('/ ', ', ').replace('/', ', ')
+    artist = artist.replace('; ', ', ').replace(';', ', ')
+    return {
+        'artist': artist,
+        'album': ', '.join(values.get('album', [])),
+        'song_name': ', '.join(values.get('title', [])),
+        'genre': ', '.join(values.get('genre', [])),
+        'lyrics': len(lyrics) > 0 and lyrics.lower() != 'none',
+        'lyrics_kind': lyrics_kind(lyrics, truncated=values.get('lyrics_truncated', False))
+    }
+
+# --- ID3v2 ---
+
+def syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def decode_id3_text(data):
+    if not data:
+        return []
+    encoding, terminator = ID3_ENCODINGS.get(data[0], (None, None))
+    if encoding is None:
+        raise Unsupported('text encoding')
+    # Values are split on (aligned) terminators before decoding: each UTF-16 value has its own BOM
+    raw = data[1:]
+    step = len(terminator)
+    parts, start, pos = [], 0, raw.find(terminator)
+    while pos >= 0:
+        if (pos - start) % step == 0:
+            parts.append(raw[start:pos])
+            start = pos + step
+            pos = raw.find(terminator, start)
+        else:
+            pos = raw.find(terminator, pos + 1)
+    if start < len(raw):
+        parts.append(raw[start:])
+    return [part.decode(encoding) for part in parts]
+
+def decode_id3_lyrics(data):
+    # USLT: encoding, language (3), description (terminated), text
+    encoding, terminator = ID3_ENCODINGS.get(data[0], (None, None)) if data else (None, None)
+    if encoding is None:
+        raise Unsupported('lyrics encoding')
+    raw = data[4:]
+    step = len(terminator)
+    end = 0
+    while True:
+        end = raw.find(terminator, end)
+        if end < 0:
+            return ''
+        if end % step == 0:
+            break
+        end += 1
+    return raw[end + step:].decode(encoding, 'ignore').rstrip('\x00')
+
+def probe_id3(f):
+    header = f.read(10)
+    major, flags = header[3], header[5]
+    if major not in (2, 3, 4):
+        raise Unsupported('ID3 version')
+    if flags & 0x80 and major < 4:
+        # Tag-wide unsynchronisation changes frame sizes
+        raise Unsupported('unsynchronised tag')
+    tag_end = 10 + syncsafe(header[6:10])
+
+    if flags & 0x40 and major >= 3:
+        ext = f.read(4)
+        ext_size = syncsafe(ext) - 4 if major == 4 else struct.unpack('>I', ext)[0]
+        f.seek(ext_size, 1)
+
+    header_size = 6 if major == 2 else 10
+    values = {}
+    while f.tell() + header_size <= tag_end:
+        frame = f.read(header_size)
+        frame_id = frame[:3] if major == 2 else frame[:4]
+        if frame_id.strip(b'\x00') == b'':
+            break  # padding
+        if not FRAME_ID_RE.match(frame_id):
+            raise Unsupported('bad frame id')
+        if major == 2:
+            size = struct.unpack('>I', b'\x00' + frame[3:6])[0]
+            frame_flags = 0
+        elif major == 3:
+            size = struct.unpack('>I', frame[4:8])[0]
+            frame_flags = frame[9] & 0xc0  # compression, encryption
+        else:
+            size = syncsafe(frame[4:8])
+            frame_flags = frame[9] & 0x0f  # compression, encryption, unsync, data length
+        if f.tell() + size > tag_end:
+            raise Unsupported('frame overflows tag')
+
+        key = ID3_FRAMES.get(frame_id)
+        if key is None:
+            f.seek(size, 1)
+            continue
+        if frame_flags:
+            raise Unsupported('frame flags')
+        if key == 'lyrics':
+            data = f.read(min(size, LYRICS_PEEK))
+            if size > len(data):
+                f.seek(size - len(data), 1)
+                values['lyrics_truncated'] = True
+            values.setdefault(key, []).append(decode_id3_lyrics(data))
+        else:
+            values.setdefault(key, []).extend(decode_id3_text(f.read(size)))
+
+    if any(NUMERIC_GENRE_RE.match(genre) for genre in values.get('genre', [])):
+        raise Unsupported('numeric genre')
+
+    # The audio must follow (mutagen refuses files without an MPEG frame)
+    f.seek(tag_end)
+    sync = f.read(2)
+    if len(sync) < 2 or sync[0] != 0xff or sync[1] & 0xe0 != 0xe0:
+        raise Unsupported('no MPEG frame after the tag')
+
+    # mutagen fills missing fields from an ID3v1 tag
+    if any(key not in values for key in WANTED + ('lyrics',)):
+        f.seek(0, 2)
+        if f.tell() >= 128:
+            f.seek(-128, 2)
+            if f.read(3) == b'TAG':
+                raise Unsupported('ID3v1 tag')
+    return values
+
+# --- MP4 ---
+
+def iter_atoms(f, end):
+    """Yields (name, payload_start, payload_end) for the atoms between f.tell() and end."""
+    pos = f.tell()
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, name = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise Unsupported('bad atom size')
+        yield name, pos + header, pos + size
+        pos += size
+
+def find_atom(f, start, end, name):
+    f.seek(start)
+    for atom, payload, atom_end in iter_atoms(f, end):
+        if atom == name:
+            return payload, atom_end
+    return None
+
+def probe_mp4(f):
+    f.seek(0, 2)
+    file_end = f.tell()
+    moov = find_atom(f, 0, file_end, b'moov')
+    if moov is None:
+        raise Unsupported('no moov')
+    values = {}
+    udta = find_atom(f, moov[0], moov[1], b'udta')
+    meta = find_atom(f, udta[0], udta[1], b'meta') if udta else None
+    # meta is a full box: 4 bytes of version/flags before its children
+    ilst = find_atom(f, meta[0] + 4, meta[1], b'ilst') if meta else None
+    if ilst is None:
+        return values
+
+    f.seek(ilst[0])
+    items = list(iter_atoms(f, ilst[1]))
+    names = {name for name, _, _ in items}
+    if b'gnre' in names and b'\xa9gen' not in names:
+        raise Unsupported('numeric genre')
+    for name, start, end in items:
+        key = MP4_ITEMS.get(name)
+        if key is None:
+            continue
+        f.seek(start)
+        for atom, payload, atom_end in list(iter_atoms(f, end)):
+            if atom != b'data':
+                continue
+            f.seek(payload)
+            kind = struct.unpack('>I', f.read(4))[0] & 0xffffff
+            f.seek(4, 1)  # locale
+            length = atom_end - payload - 8
+            data = f.read(min(length, LYRICS_PEEK) if key == 'lyrics' else length)
+            if key == 'lyrics' and length > LYRICS_PEEK:
+                values['lyrics_truncated'] = True
+            if kind == 1:
+                text = data.decode('utf-8', 'replace' if key != 'lyrics' else 'ignore')
+            elif kind == 2:
+                text = data.decode('utf-16-be', 'ignore')
+            else:
+                raise Unsupported('non-text item')
+            values.setdefault(key, []).append(text)
+    return values
+
+# --- Vorbis comments (FLAC, Ogg) ---
+
+def parse_vorbis_comments(read, skip):
+    """Reads a Vorbis comment block through read(n)/skip(n), skipping unwanted values."""
+    vendor_length = struct.unpack('<I', read(4))[0]
+    skip(vendor_length)
+    count = struct.unpack('<I', read(4))[0]
+    values = {}
+    for _ in range(count):
+        length = struct.unpack('<I', read(4))[0]
+        head = read(min(length, 32))
+        key, sep, rest = head.partition(b'=')
+        field = VORBIS_KEYS.get(key.lower()) if sep else None
+        if field is None:
+            skip(length - len(head))
+            continue
+        remaining = length - len(head)
+        if field == 'lyrics':
+            peek = min(remaining, LYRICS_PEEK)
+            value = rest + read(peek)
+            skip(remaining - peek)
+            if remaining > peek:
+                values['lyrics_truncated'] = True
+            values.setdefault(field, []).append(value.decode('utf-8', 'ignore'))
+        else:
+            values.setdefault(field, []).append((rest + read(remaining)).decode('utf-8', 'replace'))
+    return values
+
+def probe_flac(f):
+    f.seek(4)
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            raise Unsupported('truncated metadata')
+        last, kind = header[0] & 0x80, header[0] & 0x7f
+        length = struct.unpack('>I', b'\x00' + header[1:])[0]
+        if kind == 4:
+            end = f.tell() + length
+
+            def read(n):
+                if f.tell() + n > end:
+                    raise Unsupported('comment overflows block')
+                return f.read(n)
+            return parse_vorbis_comments(read, lambda n: f.seek(n, 1))
+        f.seek(length, 1)  # STREAMINFO, PICTURE, PADDING...
+        if last:
+            return {}
+
+class OggPacketReader:
+    """Sequential reader over the packets of the first logical stream of an Ogg file."""
+
+    def __init__(self, f):
+        self.f = f
+        self.serial = None
+        self.lacing = []
+        self.left = 0           # bytes left in the current segment
+        self.continued = False  # the current segment is 255 bytes: the packet goes on
+
+    def next_page(self):
+        while True:
+            header = self.f.read(27)
+            if len(header) < 27 or header[:4] != b'OggS':
+                raise Unsupported('bad Ogg page')
+            serial = struct.unpack('<I', header[14:18])[0]
+            lacing = list(self.f.read(header[26]))
+            if self.serial is None:
+                self.serial = serial
+            if serial == self.serial:
+                self.lacing = lacing
+                return
+            self.f.seek(sum(lacing), 1)
+
+    def next_segment(self):
+        if not self.lacing:
+            self.next_page()
+        size = self.lacing.pop(0)
+        self.left = size
+        self.continued = size == 255
+
+    def skip_packet(self):
+        """Skips what is left of the current packet."""
+        while True:
+            self.f.seek(self.left, 1)
+            self.left = 0
+            if not self.continued:
+                return
+            self.next_segment()
+
+    def start_packet(self):
+        self.next_segment()
+
+    def take(self, n, keep=True):
+        chunks = []
+        while n > 0:
+            if self.left == 0:
+                if not self.continued:
+                    raise Unsupported('packet too short')
+                self.next_segment()
+                continue
+            step = min(n, self.left)
+            if keep:
+                chunks.append(self.f.read(step))
+            else:
+                self.f.seek(step, 1)
+            self.left -= step
+            n -= step
+        return b''.join(chunks)
+
+def probe_ogg(f):
+    packets = OggPacketReader(f)
+    packets.start_packet()
+    ident = packets.take(8)
+    if ident.startswith(b'\x01vorbis'):
+        magic = b'\x03vorbis'
+    elif ident == b'OpusHead':
+        magic = b'OpusTags'
+    else:
+        raise Unsupported('Ogg codec')
+    packets.skip_packet()
+
+    packets.start_packet()
+    if packets.take(len(magic)) != magic:
+        raise Unsupported('missing comment header')
+    return parse_vorbis_comments(packets.take, lambda n: packets.take(n, keep=False))
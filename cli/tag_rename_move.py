@@ -1,23 +1,47 @@
 import os
+import sys
 import argparse
 import json
 import re
-import shutil
-import requests
-import mutagen.easyid3
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, TDRC
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from mutagen.id3 import ID3
 
-# In-memory cache for genre detection during the current session
-GENRE_CACHE = {}
+from http_client import get_client
+from genre_store import GenreStore, open_genre_store
+from genre_mapping import get_mapper
+from crawler import scan_files
+from file_mover import move_file
+from audio_fingerprint import open_fingerprint_index, index_directory, safe_audio_digest
+from instrumentation import NULL_INSTRUMENTATION, from_options
+from tag_index import STORAGE_DIR
+from id3_tags import read_tag, frame_text, write_tag
+
+CONFIG_FILE = os.path.join(STORAGE_DIR, 'config.json')
+
+# Session-only genre store, used when no persistent store is passed to resolve_genres
+GENRE_CACHE = GenreStore(':memory:')
+
+# Parsed ID3 objects (cover art included) kept from read_track for finish_track;
+# the tracks beyond this many are parsed again when their tags are written
+MAX_HELD_TAGS = 64
+_held_tags = threading.BoundedSemaphore(MAX_HELD_TAGS)
+
+def load_config():
+    """App config (HTTP pool/retry settings, slow-file threshold); empty if missing or unreadable."""
+    try:
+        with open(CONFIG_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
 def get_genre_from_file(file_path):
     """Reads the genre from a specific file if it exists."""
     if not os.path.exists(file_path):
         return None
     try:
-        audio = EasyID3(file_path)
-        genre = audio.get("genre", [None])[0]
+        genre = read_tag(ID3(file_path), "genre")
         if genre and genre.lower() not in ["", "unknown", "none"]:
             return genre
     except:
@@ -35,20 +59,12 @@ def sanitize_name(name):
 def map_genre(genre, mapping_json):
     if not genre:
         return "Unknown"
-    
+
     try:
-        patterns = json.loads(mapping_json).get('genre_patterns', {})
-    except:
+        mapper = get_mapper(mapping_json)
+    except ValueError:
         return genre
-
-    genre_lower = str(genre).lower()
-    for pattern, mapped_genre in patterns.items():
-        try:
-            if re.search(pattern, genre_lower):
-                return mapped_genre
-        except re.error:
-            continue
-    return genre
+    return mapper.map(genre)
 
 def detect_genre_with_ai(artist, album, api_key, endpoint, model, prompt):
     if not api_key:
@@ -78,13 +94,137 @@ def detect_genre_with_ai(artist, album, api_key, endpoint, model, prompt):
     }
     
     try:
-        response = requests.post(endpoint, headers=headers, json=payload, timeout=15)
+        response = get_client().post(endpoint, headers=headers, json=payload)
         response.raise_for_status()
         return response.json().get("choices", [{}])[0].get("message", {}).get("content", "Unknown").strip()
     except:
         return "Unknown"
 
-def process_file(file_path, library_path, args):
+BATCH_PROMPT = """
+Tu vas recevoir une liste numérotée d'albums (Artiste / Album).
+Pour chacun, donne son genre musical.
+Réponds UNIQUEMENT avec un objet JSON qui associe chaque numéro à un genre, par exemple: {"1": "Pop", "2": "Rock"}.
+"""
+
+def allowed_genres(mapping_json):
+    """Target genres of the configured genre_patterns mapping (empty if no mapping)."""
+    try:
+        return get_mapper(mapping_json).targets
+    except ValueError:
+        return []
+
+def validate_ai_genre(genre, mapping_json, allowed):
+    """Returns the canonical genre for an AI answer, or None if it cannot be trusted."""
+    if not isinstance(genre, str):
+        return None
+    genre = genre.strip()
+    if not genre or genre.lower() in ["unknown", "none"] or len(genre) > 60:
+        return None
+    if not allowed:
+        return genre
+    by_lower = {g.lower(): g for g in allowed}
+    if genre.lower() in by_lower:
+        return by_lower[genre.lower()]
+    mapped = map_genre(genre, mapping_json)
+    return mapped if mapped in allowed else None
+
+def parse_json_object(content):
+    """Extracts the JSON object of a chat answer, tolerating ```json fences or surrounding text."""
+    content = (content or '').strip()
+    start, end = content.find('{'), content.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(content[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def detect_genres_with_ai_batch(albums, api_key, endpoint, model, prompt, mapping_json='{}'):
+    """Classifies many (artist, album) pairs with a single chat completion.
+
+    Returns {(artist, album): genre} for the items whose answer is valid (see
+    validate_ai_genre); missing or invalid items are simply left out.
+    """
+    if not api_key or not albums:
+        return {}
+
+    allowed = allowed_genres(mapping_json)
+    system_prompt = (prompt or """
+    Tu es un expert en classification musicale. Détermine le genre musical de cet album/artiste.
+    """) + BATCH_PROMPT
+    if allowed:
+        system_prompt += "Utilise uniquement l'un de ces genres: " + ", ".join(allowed) + "\n"
+
+    lines = [f"{i}. Artiste: {artist}, Album: {album}" for i, (artist, album) in enumerate(albums, 1)]
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "\n".join(lines)}
+        ],
+        "max_tokens": 100 + 30 * len(albums),
+        "temperature": 0.3,
+        "response_format": {"type": "json_object"}
+    }
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    try:
+        response = get_client().post(endpoint, headers=headers, json=payload)
+        response.raise_for_status()
+        content = response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+    except:
+        return {}
+
+    answers = parse_json_object(content) or {}
+    results = {}
+    for i, key in enumerate(albums, 1):
+        genre = validate_ai_genre(answers.get(str(i)), mapping_json, allowed)
+        if genre:
+            results[key] = genre
+    return results
+
+def detect_genres_for_albums(albums, args, workers=4, batch_size=25):
+    """Batched AI classification with a per-album fallback for items the batch could not answer.
+
+    Returns {(artist, album): genre_or_Unknown} for every requested album.
+    """
+    chunks = [albums[i:i + batch_size] for i in range(0, len(albums), batch_size)] if batch_size > 1 else []
+    timings = getattr(args, "timings", NULL_INSTRUMENTATION)
+    detected = {}
+
+    def batch(chunk):
+        with timings.phase("ai_batch"):
+            return detect_genres_with_ai_batch(chunk, args.grok_key, args.grok_endpoint, args.grok_model, args.grok_prompt, args.mapping)
+
+    def single(key):
+        with timings.phase("ai_single"):
+            return detect_genre_with_ai(key[0], key[1], args.grok_key, args.grok_endpoint, args.grok_model, args.grok_prompt)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks) or 1))) as executor:
+        for answers in executor.map(batch, chunks):
+            detected.update(answers)
+
+    leftovers = [key for key in albums if key not in detected]
+    if leftovers:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(leftovers)))) as executor:
+            for key, genre in zip(leftovers, executor.map(single, leftovers)):
+                detected[key] = genre
+    return detected
+
+def read_track(file_path, library_path, args):
+    """Pipeline stage 1: parses the tags once and computes everything that needs no network.
+
+    Returns a track dict carrying the report, the tag values to write and the
+    planned destination. The parsed ID3 object is kept for finish_track as
+    "audio" while fewer than MAX_HELD_TAGS are held; other tracks are parsed
+    again only if something has to be written. "needs_genre" is set when the
+    genre still has to be resolved from the genre store or the AI (see
+    resolve_genres).
+    """
     report = {
         "original_file": os.path.basename(file_path),
         "status": "success",
@@ -95,25 +235,26 @@ def process_file(file_path, library_path, args):
         "logs": []
     }
     
+    track = {"file_path": file_path, "report": report, "failed": False, "needs_genre": False}
+    timings = getattr(args, "timings", NULL_INSTRUMENTATION)
+
     def add_log(msg):
         report["logs"].append(msg)
 
     try:
-        audio = EasyID3(file_path)
-        audio_full = ID3(file_path) # Full ID3 for TDRC date support
+        # Parse the tag once; every read and write below works on this object
+        with timings.phase("parse", file_path):
+            audio = ID3(file_path)
         
         # Capture metadata before
-        old_genre = audio.get("genre", ["Unknown"])[0]
+        old_genre = read_tag(audio, "genre", "Unknown")
         # Robust date extraction
-        date = audio.get("originaldate", [None])[0]
-        if not date:
-            tdrc = audio_full.get('TDRC')
-            date = str(tdrc.text[0]) if tdrc and tdrc.text else "0000"
+        date = read_tag(audio, "originaldate") or read_tag(audio, "date", "0000")
             
         report["metadata_before"] = {
-            "title": audio.get("title", ["Unknown"])[0],
-            "artist": audio.get("artist", ["Unknown"])[0],
-            "album": audio.get("album", ["Unknown"])[0],
+            "title": read_tag(audio, "title", "Unknown"),
+            "artist": read_tag(audio, "artist", "Unknown"),
+            "album": read_tag(audio, "album", "Unknown"),
             "genre": old_genre,
             "date": date
         }
@@ -124,12 +265,12 @@ def process_file(file_path, library_path, args):
         # Tagging logic & Featuring detection
         # ... (Artist, Title, featuring logic omitted for brevity in thought, but included in full replacement)
         # 1. Determine main artist (prioritize albumartist)
-        if "albumartist" in audio:
-            main_artist = sanitize_name(audio["albumartist"][0])
+        if read_tag(audio, "albumartist") is not None:
+            main_artist = sanitize_name(read_tag(audio, "albumartist"))
             add_log(f"Main artist from albumartist: {main_artist}")
-        elif "artist" in audio:
+        elif read_tag(audio, "artist") is not None:
             # Split by comma if multiple artists listed
-            artists = [sanitize_name(a.strip()) for a in audio["artist"][0].split(",") if a.strip()]
+            artists = [sanitize_name(a.strip()) for a in read_tag(audio, "artist").split(",") if a.strip()]
             main_artist = artists[0] if artists else "Unknown"
             add_log(f"Main artist from first listed artist: {main_artist}")
         else:
@@ -138,15 +279,15 @@ def process_file(file_path, library_path, args):
 
         # 2. Extract featuring artists
         featuring_artists = []
-        if "artist" in audio:
-            artist_str = audio["artist"][0]
+        if read_tag(audio, "artist") is not None:
+            artist_str = read_tag(audio, "artist")
             # Some apps use comma, some use semicolon
             all_artists = [sanitize_name(a.strip()) for a in re.split(',|;', artist_str) if a.strip()]
             all_artists = list(dict.fromkeys(all_artists)) # Deduplicate
             featuring_artists = [a for a in all_artists if a != main_artist]
         
         # 3. Update Title with featuring
-        original_title = sanitize_name(audio.get("title", ["Untitled"])[0])
+        original_title = sanitize_name(read_tag(audio, "title", "Untitled"))
         final_title = original_title
         if featuring_artists:
             feat_str = f"(feat. {', '.join(featuring_artists)})"
@@ -157,15 +298,15 @@ def process_file(file_path, library_path, args):
                 add_log(f"Features already in title: {original_title}")
         
         artist = main_artist
-        album = sanitize_name(audio.get("album", ["Unknown"])[0])
+        album = sanitize_name(read_tag(audio, "album", "Unknown"))
         title = final_title
-        tracknum = str(audio.get("tracknumber", ["1"])[0].split("/")[0]).zfill(2)
+        tracknum = str(read_tag(audio, "tracknumber", "1").split("/")[0]).zfill(2)
         ext = os.path.splitext(file_path)[1].lower()
         
-        # Save updated tags back via EasyID3
-        audio["artist"] = main_artist
-        audio["title"] = final_title
-        audio["date"] = date
+        # Only compared here; the file is written once, in finish_track, if anything changed
+        tag_writes = {"artist": main_artist, "title": final_title, "date": date}
+        tags_changed = any(frame_text(audio, key) != [value] for key, value in tag_writes.items())
+        genre_text = frame_text(audio, "genre")
         
         # Prepare destination path early for optimization
         artist_dir = os.path.join(library_path, artist)
@@ -184,85 +325,155 @@ def process_file(file_path, library_path, args):
                 new_genre = mapped_genre
                 genre_source = "Mapping"
 
-        # 2. If genre is still unknown, try optimizations
+        # 2. If genre is still unknown, check if the PRECISE file already exists in destination
+        needs_genre = False
         if new_genre.lower() in ['', 'unknown', 'none']:
-            # A. Check if the PRECISE file already exists in destination
-            dest_genre = get_genre_from_file(final_path)
+            with timings.phase("destination_genre", file_path):
+                dest_genre = get_genre_from_file(final_path)
             if dest_genre:
                 new_genre = dest_genre
                 genre_source = "Existing File"
                 add_log(f"Found existing file at destination. Inheriting genre: {new_genre}")
             else:
-                # B. Check memory cache (Session)
-                cache_key = (artist, album)
-                if cache_key in GENRE_CACHE:
-                    new_genre = GENRE_CACHE[cache_key]
-                    genre_source = "Session Cache"
-                    add_log(f"Detected previous detection for this album in cache: {new_genre}")
-                # C. Final fallback: AI Detection
-                elif args.mode == 'ai':
-                    add_log(f"No genre found. Querying Grok for {artist} - {album}...")
-                    new_genre = detect_genre_with_ai(artist, album, args.grok_key, args.grok_endpoint, args.grok_model, args.grok_prompt)
-                    if new_genre and new_genre.lower() not in ["", "unknown", "none"]:
-                        GENRE_CACHE[cache_key] = new_genre
-                        genre_source = "AI (Grok)"
-                        add_log(f"Grok detected genre: {new_genre}")
-                    else:
-                        add_log("Grok could not determine a genre.")
-
-        audio["genre"] = new_genre
-        audio.save()
-        
-        # Double-save with full ID3 to ensure TDRC persistence
-        audio_full = ID3(file_path)
-        audio_full['TDRC'] = TDRC(encoding=3, text=date)
-        audio_full.save(file_path)
-        add_log(f"Saved tags with genre: {new_genre} (Source: {genre_source}) and date: {date}")
+                needs_genre = True
+
+        track.update({
+            "tag_writes": tag_writes, "tags_changed": tags_changed, "genre_text": genre_text, "date": date,
+            "artist": artist, "album": album, "title": title, "old_genre": old_genre,
+            "new_genre": new_genre, "genre_source": genre_source, "needs_genre": needs_genre,
+            "artist_dir": artist_dir, "final_name": final_name, "final_path": final_path
+        })
+        if _held_tags.acquire(blocking=False):
+            track["audio"] = audio
+    except Exception as e:
+        report["status"] = "error"
+        report["error"] = str(e)
+        track["failed"] = True
+        timings.error("read", file_path, e)
+
+    return track
+
+def resolve_genres(tracks, args, workers=4, store=None):
+    """Pipeline stage 2: resolves missing genres, once per (artist, album).
+
+    Tracks are grouped by album in file order. Albums are looked up in the
+    genre store, then by artist (when all known albums of the artist agree),
+    and only the remaining albums get a single AI request each, queried
+    concurrently. Genres found in the batch are fed back into the store.
+    """
+    store = store or GENRE_CACHE
+
+    groups = {}
+    for track in tracks:
+        if track["failed"]:
+            continue
+        if track["needs_genre"]:
+            groups.setdefault((track["artist"], track["album"]), []).append(track)
+        else:
+            # Genres already in the tags teach the store about this album
+            store.put(track["artist"], track["album"], track["new_genre"], source="tags", overwrite=False)
+    if not groups:
+        return
+
+    # B. Genre store: album first, then artist-level fallback
+    known = {}
+    for cache_key in groups:
+        genre = store.get_album(*cache_key)
+        if genre:
+            known[cache_key] = (genre, "Genre Store")
+            continue
+        genre = store.get_artist(cache_key[0])
+        if genre:
+            known[cache_key] = (genre, "Genre Store (artist)")
+
+    # C. Final fallback: AI Detection, batched for the albums still unknown
+    detected = {}
+    to_query = [key for key in groups if key not in known] if args.mode == 'ai' else []
+    if to_query:
+        detected = detect_genres_for_albums(to_query, args, workers=workers, batch_size=getattr(args, 'ai_batch_size', 25))
+        for key, genre in detected.items():
+            if genre and genre.lower() not in ["", "unknown", "none"]:
+                store.put(key[0], key[1], genre, source="ai")
+
+    for cache_key, album_tracks in groups.items():
+        artist, album = cache_key
+        for i, track in enumerate(album_tracks):
+            add_log = track["report"]["logs"].append
+            new_genre = detected.get(cache_key)
+            ai_ok = bool(new_genre) and new_genre.lower() not in ["", "unknown", "none"]
+            if cache_key in known:
+                track["new_genre"], track["genre_source"] = known[cache_key]
+                if track["genre_source"] == "Genre Store":
+                    add_log(f"Detected previous detection for this album in cache: {track['new_genre']}")
+                else:
+                    add_log(f"Album unknown, using the genre known for {artist}: {track['new_genre']}")
+            elif ai_ok and i > 0:
+                track["new_genre"] = new_genre
+                track["genre_source"] = "Genre Store"
+                add_log(f"Detected previous detection for this album in cache: {new_genre}")
+            elif cache_key in detected:
+                add_log(f"No genre found. Querying Grok for {artist} - {album}...")
+                if ai_ok:
+                    track["new_genre"] = new_genre
+                    track["genre_source"] = "AI (Grok)"
+                    add_log(f"Grok detected genre: {new_genre}")
+                else:
+                    add_log("Grok could not determine a genre.")
+
+def finish_track(track, args, fingerprints=None):
+    """Pipeline stage 3: writes the tags (at most once) and moves the file into the library.
+
+    With a fingerprint index (--dedupe), a file whose audio is already in the
+    library is not moved: the downloaded copy is deleted instead.
+    """
+    report = track["report"]
+    audio = track.pop("audio", None)
+    if audio is not None:
+        _held_tags.release()
+    if track["failed"]:
+        return report
+
+    def add_log(msg):
+        report["logs"].append(msg)
+
+    file_path = track["file_path"]
+    tags_changed = track["tags_changed"]
+    date = track["date"]
+    artist, title = track["artist"], track["title"]
+    old_genre, new_genre, genre_source = track["old_genre"], track["new_genre"], track["genre_source"]
+    artist_dir, final_name, final_path = track["artist_dir"], track["final_name"], track["final_path"]
+    timings = getattr(args, "timings", NULL_INSTRUMENTATION)
+
+    try:
+        if tags_changed or track["genre_text"] != [new_genre]:
+            with timings.phase("save", file_path):
+                if audio is None:
+                    audio = ID3(file_path)
+                for key, value in dict(track["tag_writes"], genre=new_genre).items():
+                    write_tag(audio, key, value)
+                audio.save()
+            add_log(f"Saved tags with genre: {new_genre} (Source: {genre_source}) and date: {date}")
+        else:
+            add_log(f"Tags already up to date (genre: {new_genre}, source: {genre_source}, date: {date}), file not rewritten")
         
         # If tags-only mode, stop here
         if args.tags_only:
             add_log("Tags-only mode: skipping move.")
             return report
 
-        # Move
-        if not os.path.exists(artist_dir):
-            os.makedirs(artist_dir)
-            add_log(f"Created directory: {artist_dir}")
-
-        if os.path.exists(final_path):
-            add_log(f"Overwriting existing file: {final_name}")
-        
-        try:
-            shutil.move(file_path, final_path)
-            add_log(f"Moved to: {final_path}")
-        except Exception as move_err:
-            # Fallback for cross-device move issues
-            if os.path.exists(final_path):
-                # EPERM (Errno 1) usually means metadata/chown failure on CIFS/exFAT
-                # If file exists, the data is safe. We can ignore this specific error content-wise.
-                is_eperm = getattr(move_err, 'errno', 0) == 1
-                
-                if is_eperm:
-                     add_log(f"Info: Metadata preservation excluded by filesystem (EPERM), but data copied successfully.")
-                else:
-                     add_log(f"Warning: Move operation raised error, but destination exists. Verifying... ({str(move_err)})")
-                
-                try:
-                    os.remove(file_path)
-                    if is_eperm:
-                        add_log("Source file removed. Move considered successful.")
-                    else:
-                        add_log("Source file removed manually.")
-                        
-                    # If it was just EPERM, we don't flag as warning in the main report, keep it 'success'
-                    if not is_eperm:
-                         report["status"] = "warning"
-                         
-                except Exception as del_err:
-                    add_log(f"Critical: Source file could not be removed: {str(del_err)}")
-                    report["status"] = "warning"
-            else:
-                raise move_err
+        duplicate = None
+        if fingerprints is not None:
+            with timings.phase("dedupe", file_path):
+                duplicate = find_library_duplicate(file_path, final_path, args.library, fingerprints)
+        if duplicate:
+            os.remove(file_path)
+            add_log(f"Same audio already in library: {duplicate}. Move skipped, downloaded copy removed.")
+            report["duplicate_of"] = duplicate
+            final_path, final_name = duplicate, os.path.basename(duplicate)
+        else:
+            # Move
+            with timings.phase("move", file_path):
+                move_track(file_path, artist_dir, final_path, final_name, report, add_log)
         
         report["final_path"] = final_path
         report["final_name"] = final_name
@@ -278,9 +489,107 @@ def process_file(file_path, library_path, args):
     except Exception as e:
         report["status"] = "error"
         report["error"] = str(e)
+        timings.error("finish", file_path, e)
         
     return report
 
+_destination_locks = {}
+_destination_guard = threading.Lock()
+_indexed_destinations = set()
+
+def index_destination(artist_dir, fingerprints):
+    """Fingerprints the files already in a destination artist folder, once per run.
+
+    The rest of the library is only known through the index kept current by
+    `audio_fingerprint.py --every` in the background: the move never crawls it.
+    """
+    with _destination_guard:
+        lock = _destination_locks.setdefault(artist_dir, threading.Lock())
+    with lock:
+        if artist_dir in _indexed_destinations or not os.path.isdir(artist_dir):
+            return
+        index_directory(artist_dir, fingerprints, workers=1, prune=False)
+        _indexed_destinations.add(artist_dir)
+
+def find_library_duplicate(file_path, final_path, library_path, fingerprints):
+    """Returns a library file with the same audio as file_path, or None.
+
+    Candidates are the indexed library files plus the destination artist
+    folder (see index_destination). When there is none, the digest is
+    registered for final_path right away: a rename keeps size and mtime, so a
+    later identical file of the same run finds it once it has been moved.
+    An unusable index (e.g. locked by the background pass) means a plain move.
+    """
+    digest = safe_audio_digest(file_path)
+    if digest is None:
+        return None
+    try:
+        index_destination(os.path.dirname(final_path), fingerprints)
+        st = os.stat(file_path)
+        return fingerprints.claim(digest, final_path, st.st_size, st.st_mtime_ns, root=library_path)
+    except sqlite3.Error as e:
+        print(f"Fingerprint index unavailable ({e}), moving without the duplicate check.", file=sys.stderr)
+        return None
+
+def move_track(file_path, artist_dir, final_path, final_name, report, add_log):
+    """Moves a tagged file into the library: a rename on the same device, an atomic streamed copy across devices."""
+    if not os.path.exists(artist_dir):
+        os.makedirs(artist_dir, exist_ok=True)
+        add_log(f"Created directory: {artist_dir}")
+
+    if os.path.exists(final_path):
+        add_log(f"Overwriting existing file: {final_name}")
+
+    # Raises before final_path is touched if the copy fails; no metadata copy, so no EPERM on CIFS/exFAT
+    stats = move_file(file_path, final_path)
+    report["move"] = stats
+    if stats["cross_device"]:
+        add_log(f"Copied to: {final_path} ({stats['method']}, {stats['bytes'] / 1048576:.1f} MB "
+                f"in {stats['seconds']:.2f}s, {stats['mb_per_s']} MB/s)")
+    else:
+        add_log(f"Moved to: {final_path}")
+
+    if "source_error" in stats:
+        add_log(f"Critical: Source file could not be removed: {stats['source_error']}")
+        report["status"] = "warning"
+
+def process_file(file_path, library_path, args):
+    """Runs the three pipeline stages for a single file (serial path)."""
+    track = read_track(file_path, library_path, args)
+    resolve_genres([track], args, workers=1)
+    return finish_track(track, args)
+
+def process_files(file_paths, library_path, args, workers=4, ai_workers=4, store=None, fingerprints=None):
+    """Staged pipeline over many files; reports come back in file order.
+
+    1. tag reads on a thread pool
+    2. genre resolution, deduplicated per (artist, album), AI calls in parallel
+    3. tag writes and moves on a bounded I/O pool. Files sharing a destination
+       are handled by the same task in file order, so two files are never moved
+       to the same place at once and the last one still wins, as in serial mode.
+    """
+    workers = max(1, workers)
+    timings = getattr(args, "timings", NULL_INSTRUMENTATION)
+    with timings.phase("stage_read"), ThreadPoolExecutor(max_workers=workers) as executor:
+        tracks = list(executor.map(lambda path: read_track(path, library_path, args), file_paths))
+
+    with timings.phase("stage_genres"):
+        resolve_genres(tracks, args, workers=ai_workers, store=store)
+
+    by_destination = {}
+    for track in tracks:
+        key = os.path.normcase(os.path.abspath(track["final_path"])) if not track["failed"] else track["file_path"]
+        by_destination.setdefault(key, []).append(track)
+
+    def finish_group(group):
+        for track in group:
+            finish_track(track, args, fingerprints)
+
+    with timings.phase("stage_finish"), ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(finish_group, by_destination.values()))
+
+    return [track["report"] for track in tracks]
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--source", required=True)
@@ -292,21 +601,55 @@ def main():
     parser.add_argument("--grok-model", default="grok-beta")
     parser.add_argument("--grok-prompt", default="")
     parser.add_argument("--tags-only", action="store_true", help="Only update tags, do not move files")
+    parser.add_argument("--http-stats", action="store_true", help="Print per-host HTTP latency/error counters to stderr")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel tag reads and write/move operations")
+    parser.add_argument("--ai-workers", type=int, default=4, help="Parallel AI genre requests (one per distinct album)")
+    parser.add_argument("--ai-batch-size", type=int, default=25, help="Albums classified per AI request (1 = one request per album)")
+    parser.add_argument("--no-genre-store", action="store_true", help="Only cache genres for this run (no persistent store)")
+    parser.add_argument("--genre-store-size", type=int, default=20000, help="Maximum number of albums kept in the genre store")
+    parser.add_argument("--dedupe", action="store_true", help="Do not move files whose audio is already in the library (the downloaded copy is deleted)")
+    parser.add_argument("--instrument", action="store_true", help="Time each phase and file; adds an \"instrumentation\" key to the JSON output")
+    parser.add_argument("--slow-ms", type=float, default=None, help="Files taking at least this long are listed as slow (with --instrument)")
+    parser.add_argument("--profile", default=None, help="Write cProfile stats to this file (implies --instrument)")
     
     args = parser.parse_args()
     
-    results = []
-    
     if not os.path.exists(args.source):
         print(json.dumps({"error": f"Source directory {args.source} not found"}))
         return
 
-    for filename in os.listdir(args.source):
-        if filename.lower().endswith('.mp3'):
-            file_path = os.path.join(args.source, filename)
-            results.append(process_file(file_path, args.library, args))
+    config = load_config()
+    # First use creates the shared client: pool size and retries come from the config
+    get_client(config)
+    args.timings = from_options(args.instrument, args.slow_ms, args.profile, config)
+    with args.timings.phase("crawl"):
+        file_paths = [entry.path for entry in scan_files(args.source, ('.mp3',), max_depth=0)]
+
+    # Seeded from the library in the background (genre_store.py --every), never here
+    store = None if args.no_genre_store else open_genre_store(max_entries=args.genre_store_size)
+
+    fingerprints = None
+    if args.dedupe and not args.tags_only:
+        # No library crawl here: digests come from the background index and the destination folders
+        fingerprints = open_fingerprint_index()
+
+    try:
+        results = process_files(file_paths, args.library, args, workers=args.workers, ai_workers=args.ai_workers,
+                                store=store, fingerprints=fingerprints)
+    finally:
+        if store:
+            store.close()
+        if fingerprints:
+            fingerprints.close()
             
-    print(json.dumps({"results": results}))
+    output = {"results": results}
+    instrumentation = args.timings.summary()
+    if instrumentation is not None:
+        output["instrumentation"] = instrumentation
+    print(json.dumps(output))
+
+    if args.http_stats:
+        print(json.dumps({"http": get_client().stats()}), file=sys.stderr)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""Turns zotify's console output into progress events and a JSON status file.
+
+Used by `music_downloader.py --progress-file PATH`: zotify's stdout/stderr is
+read through a pipe, echoed as before (minus the tqdm bars unless they were
+asked for) and parsed line by line. The status file is replaced atomically
+(temp file + rename), so readers never see half a document. It keeps the keys
+the worker already wrote (status, percentage, filename, speed) and adds:
+
+    track, track_percentage, bytes, total_bytes, speed_bps,
+    tracks: {done, skipped, failed, total}, seq, events: [last 20 events],
+    files: [every downloaded path, kept in full so a killed run still lists them]
+
+Events are {"seq", "time", "event": "track_started|track_done|skipped|error", ...}.
+"""
+import os
+import re
+import json
+import time
+
+# tqdm bar: "Artist - Title:  45%|████▌     | 3.21M/7.10M [00:02<00:02, 1.52MB/s]"
+BAR_RE = re.compile(
+    r'^(?:(?P<desc>.*?):\s*)?(?P<pct>\d{1,3})%\|[^|]*\|\s*'
+    r'(?P<n>[\d.]+)(?P<n_scale>[kMGTPEZY]?)/(?P<total>[\d.]+|\?)(?P<total_scale>[kMGTPEZY]?)\s*'
+    r'\[[^\],]*(?:,\s*(?P<rate>[^\]]*))?\]'
+)
+RATE_RE = re.compile(r'^(?P<value>[\d.]+|\?)(?P<scale>[kMGTPEZY]?)(?P<unit>[A-Za-z]+)/s$')
+# zotify's fmt_seconds prints "45s" under a minute, then "MM:SS" and "HH:MM:SS"
+DOWNLOADED_RE = re.compile(r'###\s+Downloaded\s+"(?P<name>.+?)"\s+to\s+"(?P<path>.+?)"(?:\s+in\s+(?P<took>[\dhms .:]+?))?(?:\s+\(|\s+###|$)', re.IGNORECASE)
+SKIPPING_RE = re.compile(r'###\s+SKIPPING:\s+(?P<what>.*?)\s+###', re.IGNORECASE)
+ERROR_RE = re.compile(r'###\s+ERROR:\s*(?P<message>.*?)\s*###', re.IGNORECASE)
+DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([hms])')
+
+SCALES = {'': 1, 'k': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4, 'P': 1024 ** 5, 'E': 1024 ** 6, 'Z': 1024 ** 7, 'Y': 1024 ** 8}
+MAX_EVENTS = 20
+WRITE_INTERVAL = 0.5
+
+def parse_duration(text):
+    """'45s' / '01:03' / '01:02:03' / '1m 3s' -> seconds (None if nothing matched).
+
+    Checked with `python3 -m doctest cli/zotify_progress.py`:
+
+    >>> [parse_duration(text) for text in ('02s', '01:03', '01:02:03', '1m 3s', '')]
+    [2.0, 63.0, 3723.0, 63.0, None]
+    >>> line = '###   Downloaded "A - B" to "x/y.mp3" in 01:03 (plus 02s converting)   ###'
+    >>> DOWNLOADED_RE.search(line).group('name', 'path', 'took')
+    ('A - B', 'x/y.mp3', '01:03')
+    >>> DOWNLOADED_RE.search('###   Downloaded "A - B" to "x/y.mp3" in 45s   ###').group('took')
+    '45s'
+    """
+    text = (text or '').strip()
+    if re.fullmatch(r'\d+(?::\d+){1,2}', text):
+        seconds = 0.0
+        for part in text.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    parts = DURATION_RE.findall(text)
+    if not parts:
+        return None
+    return sum(float(value) * {'h': 3600, 'm': 60, 's': 1}[unit] for value, unit in parts)
+
+def format_speed(bytes_per_sec):
+    # Same format as DownloadManager::formatSpeed on the PHP side
+    if bytes_per_sec is None:
+        return None
+    if bytes_per_sec > 1024 * 1024:
+        return f"{round(bytes_per_sec / 1024 / 1024, 2)} MB/s"
+    if bytes_per_sec > 1024:
+        return f"{round(bytes_per_sec / 1024, 2)} KB/s"
+    return f"{round(bytes_per_sec, 2)} B/s"
+
+def split_skip_reason(what):
+    """'Artist - Song (SONG ALREADY EXISTS)' -> ('Artist - Song', 'SONG ALREADY EXISTS')."""
+    match = re.match(r'^(?P<name>.*?)\s*\((?P<reason>[^()]*)\)$', what)
+    if match:
+        return match.group('name'), match.group('reason')
+    return '', what
+
+class ProgressTracker:
+    """Parses zotify lines and keeps the current download state.
+
+    feed() returns the events a line produced (usually none). A bar measured
+    in bytes is the current track; any other bar (unit 'song') is the
+    album/playlist position, which zotify shows instead of the per-track bar.
+    """
+
+    def __init__(self, root_path='', total_tracks=None, clock=time.time):
+        self.root_path = root_path
+        self.clock = clock
+        self.started_at = clock()
+        self.seq = 0
+        self.events = []
+        self.track = None
+        self.track_percentage = 0
+        self.bytes = 0
+        self.total_bytes = None
+        self.speed_bps = None
+        self.bytes_done = 0
+        self.position = None
+        self.tracks = {'done': 0, 'skipped': 0, 'failed': 0, 'total': total_tracks}
+        self.files = []
+        self.status = 'downloading'
+
+    def emit(self, event, **fields):
+        self.seq += 1
+        record = {'seq': self.seq, 'time': round(self.clock(), 3), 'event': event}
+        record.update(fields)
+        self.events.append(record)
+        del self.events[:-MAX_EVENTS]
+        return record
+
+    def feed(self, line):
+        line = line.strip()
+        if not line:
+            return []
+        bar = BAR_RE.match(line)
+        if bar:
+            return self.feed_bar(bar)
+
+        match = DOWNLOADED_RE.search(line)
+        if match:
+            return [self.track_done(match.group('name'), match.group('path'), parse_duration(match.group('took')))]
+        match = SKIPPING_RE.search(line)
+        if match:
+            name, reason = split_skip_reason(match.group('what'))
+            if 'ERROR' in reason.upper():
+                self.tracks['failed'] += 1
+                return [self.emit('error', track=name or self.track, message=reason)]
+            self.tracks['skipped'] += 1
+            return [self.emit('skipped', track=name or self.track, reason=reason)]
+        match = ERROR_RE.search(line)
+        if match:
+            self.tracks['failed'] += 1
+            # Only blame the current track while it is still in flight
+            track = self.track if self.track_percentage < 100 else None
+            return [self.emit('error', track=track, message=match.group('message'))]
+        return []
+
+    def feed_bar(self, bar):
+        rate = RATE_RE.match((bar.group('rate') or '').strip())
+        unit = rate.group('unit') if rate else ''
+        n = float(bar.group('n')) * SCALES[bar.group('n_scale')]
+        total = None if bar.group('total') == '?' else float(bar.group('total')) * SCALES[bar.group('total_scale')]
+
+        if not unit.endswith('B'):
+            # Album / playlist bar: n tracks of total handled so far
+            self.position = int(n)
+            if total is not None:
+                self.tracks['total'] = int(total)
+            return []
+
+        events = []
+        desc = (bar.group('desc') or '').strip()
+        if desc and desc != self.track:
+            self.track = desc
+            events.append(self.emit('track_started', track=desc))
+        self.track_percentage = int(bar.group('pct'))
+        self.bytes = int(n)
+        self.total_bytes = int(total) if total is not None else None
+        if rate and rate.group('value') != '?':
+            self.speed_bps = float(rate.group('value')) * SCALES[rate.group('scale')]
+        return events
+
+    def track_done(self, name, path, seconds):
+        if path and not os.path.isabs(path) and self.root_path:
+            path = os.path.join(self.root_path, path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = self.total_bytes
+        self.tracks['done'] += 1
+        if path:
+            self.files.append(path)
+        self.track_percentage = 100
+        if size:
+            self.bytes_done += size
+            if seconds:
+                self.speed_bps = size / seconds
+        return self.emit('track_done', track=name, path=path, bytes=size, seconds=seconds)
+
+    def percentage(self):
+        """Overall progress when the track count is known, else the current track's."""
+        total = self.tracks['total']
+        if not total:
+            return self.track_percentage
+        handled = self.tracks['done'] + self.tracks['skipped'] + self.tracks['failed']
+        if self.position is not None:
+            handled = max(handled, self.position)
+        current = self.track_percentage / 100 if self.track_percentage < 100 else 0
+        return min(100, int(100 * (handled + current) / total))
+
+    def snapshot(self):
+        elapsed = self.clock() - self.started_at
+        average = self.bytes_done / elapsed if self.bytes_done and elapsed > 0 else None
+        speed = self.speed_bps if self.status == 'downloading' else average
+        handled = self.tracks['done'] + self.tracks['skipped'] + self.tracks['failed']
+        label = self.track or 'Starting...'
+        if self.tracks['total']:
+            label = f"{label} ({min(handled + 1, self.tracks['total'])}/{self.tracks['total']})"
+        return {
+            'status': self.status,
+            'percentage': 100 if self.status == 'finished' else self.percentage(),
+            'filename': label,
+            'speed': format_speed(speed) or 'STREAMING',
+            'track': self.track,
+            'track_percentage': self.track_percentage,
+            'bytes': self.bytes,
+            'total_bytes': self.total_bytes,
+            'speed_bps': round(speed, 1) if speed else None,
+            'average_bps': round(average, 1) if average else None,
+            'tracks': dict(self.tracks),
+            'seq': self.seq,
+            'events': list(self.events),
+            'files': list(self.files),
+            'last_update': int(self.clock()),
+        }
+
+def write_status(path, data):
+    """Replaces the status file atomically; progress is best effort, errors are ignored."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+class StatusWriter:
+    """Writes tracker snapshots at most every interval seconds, or right away after an event."""
+
+    def __init__(self, path, tracker, interval=WRITE_INTERVAL):
+        self.path = path
+        self.tracker = tracker
+        self.interval = interval
+        self.last_write = 0.0
+
+    def update(self, force=False):
+        now = time.monotonic()
+        if force or now - self.last_write >= self.interval:
+            write_status(self.path, self.tracker.snapshot())
+            self.last_write = now
+
+    def finish(self, returncode):
+        self.tracker.status = 'finished' if returncode == 0 else 'failed'
+        self.update(force=True)
@@ -153,6 +153,11 @@ class DownloadWorkerCommand extends Command
         $isWindows = strtoupper(substr(PHP_OS, 0, 3)) === 'WIN';
         $activate = $isWindows ? "call \"$venvPath\\Scripts\\activate\"" : ". \"$venvPath/bin/activate\"";
 
+        // The wrapper parses zotify's output and keeps this file current (status, percentage, speed, events)
+        $progressFile = $storage->getStorageDir() . '/progress_' . $downloadId . '.json';
+        $cmdArgs['--progress-file'] = $progressFile;
+        $cmdArgs['--progress-total'] = count($item['expected_tracks'] ?? []);
+
         $cmdStr = "($activate && python3 \"$wrapperPath\" \"$url\"";
         foreach ($cmdArgs as $key => $val) {
             $cmdStr .= " $key \"$val\"";
@@ -180,8 +185,6 @@ class DownloadWorkerCommand extends Command
         file_put_contents($activeLogFile, "Executing Music Downloader:\n\"$url\" ...\n" . str_repeat("-", 40) . "\n", FILE_APPEND);
         file_put_contents($historyLogFile, "Executing Full Command:\n$cmdStr\n" . str_repeat("-", 40) . "\n", FILE_APPEND);
 
-        $progressFile = $storage->getStorageDir() . '/progress_' . $downloadId . '.json';
-
         $log("Executing: $cmdStr");
 
         $expectedTracks = $item['expected_tracks'] ?? [];
@@ -200,6 +203,8 @@ class DownloadWorkerCommand extends Command
                 'PYTHONUNBUFFERED' => '1'
             ]);
 
+            // Files written by this download are newer than this (minus a margin for coarse mtimes)
+            $downloadStartedAt = time() - 60;
             $process->start();
 
             while ($process->isRunning()) {
@@ -214,18 +219,6 @@ class DownloadWorkerCommand extends Command
                 if ($buffer !== '') {
                     file_put_contents($activeLogFile, $buffer, FILE_APPEND);
                     file_put_contents($historyLogFile, $buffer, FILE_APPEND);
-
-                    // Extract last line for progress
-                    $lines = explode("\n", trim($buffer));
-                    if (!empty($lines)) {
-                        $lastLine = end($lines);
-                        file_put_contents($progressFile, json_encode([
-                            'status' => 'downloading',
-                            'percentage' => 100,
-                            'filename' => $lastLine,
-                            'speed' => 'STREAMING'
-                        ]));
-                    }
                 }
 
                 usleep(500000); // 0.5s
@@ -259,42 +252,33 @@ class DownloadWorkerCommand extends Command
             goto retry_check; // Skip verification and jump to retry logic
         }
 
-        // Post-download Verification
+        // Post-download Verification: only the files written by this download are read,
+        // expected tracks are matched on normalised artist/album/title keys by the Python side
         $rootPath = $config['music_root_path'] ?? '';
         $log("Verifying downloaded tracks in: $rootPath");
-        $verifyCmd = "($activate && python3 \"$wrapperPath\" --verify \"$rootPath\")";
+        $verifyCmd = "($activate && python3 \"$wrapperPath\" --match \"$rootPath\" --since $downloadStartedAt)";
         $verifyProcess = \Symfony\Component\Process\Process::fromShellCommandline($verifyCmd);
         $verifyProcess->setEnv([
             'HOME' => $customHome,
             'USERPROFILE' => $customHome,
             'APPDATA' => $customHome . DIRECTORY_SEPARATOR . 'AppData' . DIRECTORY_SEPARATOR . 'Roaming'
         ]);
+        $verifyProcess->setInput(json_encode(array_values($expectedTracks)));
+        $verifyProcess->setTimeout(600);
 
         $verifyProcess->run();
 
-        $verifiedTracks = [];
+        $matchResult = [];
         if ($verifyProcess->isSuccessful()) {
-            $verifiedTracks = json_decode($verifyProcess->getOutput(), true) ?: [];
+            $matchResult = json_decode($verifyProcess->getOutput(), true) ?: [];
         }
 
-        $missingTracks = [];
-        foreach ($expectedTracks as $expected) {
-            $found = false;
-            foreach ($verifiedTracks as $verified) {
-                if (
-                    strtolower(trim($expected['artist'])) === strtolower(trim($verified['artist'])) &&
-                    strtolower(trim($expected['album'])) === strtolower(trim($verified['album'])) &&
-                    strtolower(trim($expected['song_name'])) === strtolower(trim($verified['song_name']))
-                ) {
-                    $found = true;
-                    $matchedTracks[] = $verified;
-                    $validatedCount++;
-                    break;
-                }
-            }
-            if (!$found) {
-                $missingTracks[] = $expected;
-            }
+        $matchedTracks = $matchResult['matched'] ?? [];
+        $missingTracks = $matchResult['missing'] ?? $expectedTracks;
+        $validatedCount = count($matchedTracks);
+
+        if (!empty($matchResult['extra'])) {
+            $log(count($matchResult['extra']) . " new file(s) did not match any expected track.");
         }
 
         // Determine status: success (all found), warning (some found), error (none found)
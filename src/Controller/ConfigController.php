@@ -46,14 +46,19 @@ class ConfigController extends AbstractController
                 'music_library_path' => $request->request->get('music_library_path', ''),
                 'music_genre_mapping' => $request->request->get('music_genre_mapping', ''),
                 'music_genre_tagging_mode' => $request->request->get('music_genre_tagging_mode', 'ai'),
+                'music_library_dedupe' => $request->request->get('music_library_dedupe') === '1',
                 'music_genre_grok_prompt' => $request->request->get('music_genre_grok_prompt', ''),
                 'music_genre_grok_model' => $request->request->get('music_genre_grok_model', 'grok-4-fast-non-reasoning'),
                 'music_genres' => $request->request->get('music_genres') === '1',
                 'genius_api_token' => $request->request->get('genius_api_token', ''),
                 'lrclib_token' => $request->request->get('lrclib_token', ''),
+                'lyrics_write_sylt' => $request->request->get('lyrics_write_sylt') === '1',
+                'lyrics_write_lrc' => $request->request->get('lyrics_write_lrc') === '1',
                 'admin_user' => $request->request->get('admin_user', 'admin'),
                 'admin_password' => $request->request->get('admin_password', 'admin'),
                 'history_retention_limit' => (int) $request->request->get('history_retention_limit', 500),
+                'cli_instrumentation' => $request->request->get('cli_instrumentation') === '1',
+                'cli_slow_file_ms' => (int) $request->request->get('cli_slow_file_ms', 1000),
                 'grok_renaming_prompt' => $request->request->get('grok_renaming_prompt', ''),
                 'allow_xxx_search' => $request->request->get('allow_xxx_search') === '1',
                 'music_librespot_auth_binary' => $request->request->get('music_librespot_auth_binary', '/var/www/html/var/librespot-auth/target/release/librespot-auth')
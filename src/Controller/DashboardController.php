@@ -7,6 +7,7 @@ use App\Service\DownloadManager;
 use App\Service\GrokService;
 use App\Service\JsonStorage;
 use App\Service\QueueManager;
+use App\Service\TagDaemonClient;
 use App\Service\TorrentDbService;
 use App\Service\MediaTypeHelper;
 use GuzzleHttp\Client;
@@ -172,7 +173,7 @@ class DashboardController extends AbstractController
     }
 
     #[Route('/music-files', name: 'music_files')]
-    public function musicFiles(JsonStorage $storage, KernelInterface $kernel): Response
+    public function musicFiles(JsonStorage $storage, KernelInterface $kernel, TagDaemonClient $tagDaemon): Response
     {
         if (!$storage->hasMusicPath()) {
             return $this->render('dashboard/locked.html.twig', [
@@ -189,20 +190,29 @@ class DashboardController extends AbstractController
         $files = [];
 
         if (!empty($root) && is_dir($root)) {
-            $venvPath = $config['music_venv_path'] ?? '/opt/venv';
-            $script = $kernel->getProjectDir() . DIRECTORY_SEPARATOR . 'cli' . DIRECTORY_SEPARATOR . 'music_downloader.py';
+            // Prefer the warm tag daemon, fall back to a one-shot verification process.
+            // index_only: while library_watcher.py runs this is an index read, not a crawl.
+            $rawFiles = $tagDaemon->call('verify', ['directory' => $root, 'recursive' => true, 'index_only' => true], 600);
+            if ($rawFiles === null || isset($rawFiles['error'])) {
+                $rawFiles = null;
+                $venvPath = $config['music_venv_path'] ?? '/opt/venv';
+                $script = $kernel->getProjectDir() . DIRECTORY_SEPARATOR . 'cli' . DIRECTORY_SEPARATOR . 'music_downloader.py';
 
-            $isWindows = strtoupper(substr(PHP_OS, 0, 3)) === 'WIN';
-            $activate = $isWindows ? "call \"$venvPath\\Scripts\\activate\"" : ". \"$venvPath/bin/activate\"";
+                $isWindows = strtoupper(substr(PHP_OS, 0, 3)) === 'WIN';
+                $activate = $isWindows ? "call \"$venvPath\\Scripts\\activate\"" : ". \"$venvPath/bin/activate\"";
 
-            // Run verification with recursion support
-            $cmd = "($activate && python3 " . escapeshellarg($script) . " --verify " . escapeshellarg($root) . " --recursive)";
+                // Run verification with recursion support
+                $cmd = "($activate && python3 " . escapeshellarg($script) . " --verify " . escapeshellarg($root) . " --recursive --index-only)";
 
-            $process = Process::fromShellCommandline($cmd);
-            $process->run();
+                $process = Process::fromShellCommandline($cmd);
+                $process->run();
+
+                if ($process->isSuccessful()) {
+                    $rawFiles = json_decode($process->getOutput(), true) ?: [];
+                }
+            }
 
-            if ($process->isSuccessful()) {
-                $rawFiles = json_decode($process->getOutput(), true) ?: [];
+            if ($rawFiles !== null) {
                 foreach ($rawFiles as $rf) {
                     $files[] = [
                         'name' => $rf['filename'],
@@ -211,7 +221,8 @@ class DashboardController extends AbstractController
                         'mtime' => (int) $rf['mtime'],
                         'rel_path' => $rf['rel_path'],
                         'genre' => $rf['genre'] ?? '',
-                        'has_lyrics' => $rf['lyrics'] ?? false
+                        'has_lyrics' => $rf['lyrics'] ?? false,
+                        'lyrics_kind' => $rf['lyrics_kind'] ?? null
                     ];
                 }
 
@@ -227,7 +238,7 @@ class DashboardController extends AbstractController
     }
 
     #[Route('/file-tags', name: 'file_tags', methods: ['POST'])]
-    public function fileTags(Request $request, KernelInterface $kernel, JsonStorage $storage): Response
+    public function fileTags(Request $request, KernelInterface $kernel, JsonStorage $storage, TagDaemonClient $tagDaemon): Response
     {
         $data = json_decode($request->getContent(), true);
         $filePath = $data['path'] ?? '';
@@ -236,6 +247,11 @@ class DashboardController extends AbstractController
             return $this->json(['success' => false, 'message' => 'File not found: ' . $filePath]);
         }
 
+        $tags = $tagDaemon->call('tags', ['path' => $filePath]);
+        if ($tags !== null) {
+            return $this->json(['success' => true, 'tags' => $tags]);
+        }
+
         $config = $storage->get('config', []);
         $venvPath = $config['music_venv_path'] ?? 'venv';
         $script = $kernel->getProjectDir() . DIRECTORY_SEPARATOR . 'cli' . DIRECTORY_SEPARATOR . 'music_downloader.py';
@@ -261,7 +277,7 @@ class DashboardController extends AbstractController
     }
 
     #[Route('/update-tags', name: 'update_tags', methods: ['POST'])]
-    public function updateTags(Request $request, KernelInterface $kernel, JsonStorage $storage): Response
+    public function updateTags(Request $request, KernelInterface $kernel, JsonStorage $storage, TagDaemonClient $tagDaemon): Response
     {
         $data = json_decode($request->getContent(), true);
         $filePath = $data['path'] ?? '';
@@ -275,6 +291,14 @@ class DashboardController extends AbstractController
             return $this->json(['success' => false, 'message' => 'No tags provided']);
         }
 
+        $result = $tagDaemon->call('update-tags', ['path' => $filePath, 'tags' => $tags]);
+        if ($result !== null) {
+            if (isset($result['error'])) {
+                return $this->json(['success' => false, 'message' => 'Failed to update tags: ' . $result['error']]);
+            }
+            return $this->json(['success' => true]);
+        }
+
         $config = $storage->get('config', []);
         $venvPath = $config['music_venv_path'] ?? 'venv';
         $script = $kernel->getProjectDir() . DIRECTORY_SEPARATOR . 'cli' . DIRECTORY_SEPARATOR . 'music_downloader.py';
@@ -302,6 +326,51 @@ class DashboardController extends AbstractController
         return $this->json(['success' => true]);
     }
 
+    #[Route('/bulk-update-tags', name: 'bulk_update_tags', methods: ['POST'])]
+    public function bulkUpdateTags(Request $request, KernelInterface $kernel, JsonStorage $storage, TagDaemonClient $tagDaemon): Response
+    {
+        $data = json_decode($request->getContent(), true);
+        $edits = $data['edits'] ?? [];
+
+        if (empty($edits) || !is_array($edits)) {
+            return $this->json(['success' => false, 'message' => 'No edits provided']);
+        }
+
+        // One call for the whole batch: the daemon (or a single process) loads and saves each file once
+        $result = $tagDaemon->call('bulk-update-tags', ['edits' => array_values($edits)], 300);
+        if ($result === null) {
+            $config = $storage->get('config', []);
+            $venvPath = $config['music_venv_path'] ?? 'venv';
+            $script = $kernel->getProjectDir() . DIRECTORY_SEPARATOR . 'cli' . DIRECTORY_SEPARATOR . 'music_downloader.py';
+
+            $isWindows = strtoupper(substr(PHP_OS, 0, 3)) === 'WIN';
+            $activate = $isWindows ? "call \"$venvPath\\Scripts\\activate\"" : ". \"$venvPath/bin/activate\"";
+
+            $process = Process::fromShellCommandline("($activate && python3 " . escapeshellarg($script) . " --bulk-update-tags)");
+            $process->setInput(json_encode(array_values($edits)));
+            $process->setTimeout(300);
+            $process->run();
+
+            $result = json_decode($process->getOutput(), true);
+            if (!$process->isSuccessful() || !is_array($result)) {
+                return $this->json([
+                    'success' => false,
+                    'message' => 'Failed to update tags: ' . ($result['error'] ?? $process->getErrorOutput())
+                ]);
+            }
+        }
+
+        if (isset($result['error'])) {
+            return $this->json(['success' => false, 'message' => 'Failed to update tags: ' . $result['error']]);
+        }
+
+        return $this->json([
+            'success' => ($result['summary']['failed'] ?? 0) === 0,
+            'results' => $result['results'] ?? [],
+            'summary' => $result['summary'] ?? []
+        ]);
+    }
+
     #[Route('/queue', name: 'queue')]
     public function queue(QueueManager $queueManager): Response
     {
@@ -681,7 +750,9 @@ class DashboardController extends AbstractController
                 "--mapping \"$mappingEscaped\" " .
                 "--grok-key \"$grokKey\" " .
                 "--grok-model \"$grokModel\" " .
-                "--grok-prompt \"$promptEscaped\")";
+                "--grok-prompt \"$promptEscaped\"" .
+                (!empty($config['music_library_dedupe']) ? " --dedupe" : "") .
+                (!empty($config['cli_instrumentation']) ? " --instrument --slow-ms " . (int) ($config['cli_slow_file_ms'] ?? 1000) : "") . ")";
 
             $process = Process::fromShellCommandline($cmd);
             $process->setTimeout(300);
@@ -725,6 +796,9 @@ class DashboardController extends AbstractController
                 'message' => 'Processed ' . count($results) . ' files into ' . $libraryPath,
                 'details' => $results
             ];
+            if (isset($output['instrumentation'])) {
+                $history[count($history) - 1]['instrumentation'] = $output['instrumentation'];
+            }
 
             // Enforce history limit
             $limit = (int) ($config['history_retention_limit'] ?? 100);
@@ -1175,7 +1249,7 @@ class DashboardController extends AbstractController
     }
 
     #[Route('/music/fetch-lyrics', name: 'fetch_lyrics', methods: ['POST'])]
-    public function fetchLyrics(Request $request, JsonStorage $storage, KernelInterface $kernel): Response
+    public function fetchLyrics(Request $request, JsonStorage $storage, KernelInterface $kernel, TagDaemonClient $tagDaemon): Response
     {
         try {
             $config = $storage->get('config', []);
@@ -1197,6 +1271,23 @@ class DashboardController extends AbstractController
                 return $this->json(['success' => false, 'message' => 'Invalid path specified.']);
             }
 
+            $instrument = !empty($config['cli_instrumentation']);
+            $slowMs = (int) ($config['cli_slow_file_ms'] ?? 1000);
+
+            $results = $tagDaemon->call('lyrics', [
+                'path' => $path,
+                'force_save' => true,
+                'add_unsync' => true,
+                'instrument' => $instrument,
+                'slow_ms' => $slowMs
+            ], 600);
+            if ($results !== null) {
+                if (isset($results['error'])) {
+                    return $this->json(['success' => false, 'message' => 'Lyrics search failed.', 'details' => $results['error']]);
+                }
+                return $this->json($this->lyricsResponse($results));
+            }
+
             $script = $kernel->getProjectDir() . DIRECTORY_SEPARATOR . 'cli' . DIRECTORY_SEPARATOR . 'lyrics_fetcher.py';
 
             // Determine OS and activate command
@@ -1219,7 +1310,8 @@ class DashboardController extends AbstractController
             // Build command: activate venv AND run script
             // Note: On Windows, use & or &&. Chaining with && ensures python runs only if activate succeeds.
             // We need to run inside a shell.
-            $cmd = "($activate && python3 " . escapeshellarg($script) . " " . escapeshellarg($path) . " --force-save --add-unsync --json)";
+            $cmd = "($activate && python3 " . escapeshellarg($script) . " " . escapeshellarg($path) . " --force-save --add-unsync --json" .
+                ($instrument ? " --instrument --slow-ms $slowMs" : "") . ")";
 
             $process = Process::fromShellCommandline($cmd);
             $process->setWorkingDirectory($kernel->getProjectDir());
@@ -1236,13 +1328,23 @@ class DashboardController extends AbstractController
 
             $results = json_decode($process->getOutput(), true);
 
-            return $this->json([
-                'success' => true,
-                'results' => $results
-            ]);
+            return $this->json($this->lyricsResponse($results));
 
         } catch (\Exception $e) {
             return $this->json(['success' => false, 'message' => $e->getMessage()]);
         }
     }
+
+    /**
+     * With instrumentation the lyrics summary comes wrapped as {results, instrumentation}.
+     */
+    private function lyricsResponse($results): array
+    {
+        $response = ['success' => true, 'results' => $results];
+        if (is_array($results) && isset($results['instrumentation'])) {
+            $response['results'] = $results['results'] ?? [];
+            $response['instrumentation'] = $results['instrumentation'];
+        }
+        return $response;
+    }
 }
@@ -0,0 +1,78 @@
+<?php
+
+namespace App\Service;
+
+/**
+ * Client for the persistent tag daemon (cli/music_downloader.py --serve).
+ *
+ * Speaks line-delimited JSON-RPC over a Unix socket in var/storage/.
+ * call() returns null when the daemon is not reachable, so callers can
+ * fall back to spawning the CLI script as before.
+ */
+class TagDaemonClient
+{
+    private const SOCKET_NAME = 'music_tags.sock';
+
+    private string $socketPath;
+    private int $requestId = 0;
+
+    public function __construct(JsonStorage $storage)
+    {
+        $this->socketPath = $storage->getStorageDir() . '/' . self::SOCKET_NAME;
+    }
+
+    public function isAvailable(): bool
+    {
+        return !str_starts_with(PHP_OS, 'WIN') && file_exists($this->socketPath);
+    }
+
+    /**
+     * Calls a daemon method (tags, update-tags, verify, lyrics).
+     * Returns the result, ['error' => ...] on a daemon-side failure, or null if unreachable.
+     */
+    public function call(string $method, array $params = [], int $timeout = 30): mixed
+    {
+        if (!$this->isAvailable()) {
+            return null;
+        }
+
+        $fp = @stream_socket_client('unix://' . $this->socketPath, $errno, $errstr, 1.0);
+        if (!$fp) {
+            return null;
+        }
+
+        stream_set_timeout($fp, $timeout);
+        $request = json_encode([
+            'jsonrpc' => '2.0',
+            'id' => ++$this->requestId,
+            'method' => $method,
+            'params' => (object) $params
+        ]) . "\n";
+
+        if (@fwrite($fp, $request) === false) {
+            fclose($fp);
+            return null;
+        }
+
+        $line = fgets($fp);
+        $meta = stream_get_meta_data($fp);
+        fclose($fp);
+
+        if ($meta['timed_out']) {
+            return ['error' => "Tag daemon timed out after {$timeout}s"];
+        }
+        if ($line === false) {
+            return null;
+        }
+
+        $response = json_decode($line, true);
+        if (!is_array($response)) {
+            return ['error' => 'Invalid response from tag daemon'];
+        }
+        if (isset($response['error'])) {
+            return ['error' => $response['error']['message'] ?? 'Unknown tag daemon error'];
+        }
+
+        return $response['result'] ?? null;
+    }
+}
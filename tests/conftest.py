@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The cli/ scripts import each other as top-level modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'cli'))
+sys.path.insert(0, os.path.join(ROOT, 'cli', 'benchmarks'))
@@ -0,0 +1,10 @@
+"""Batched AI genre lookups of tag_rename_move against the local Grok stub."""
+import pytest
+
+from stub_servers import check_genre_batching
+
+@pytest.mark.parametrize('album_count, batch_size, fail', [(60, 25, 3), (7, 3, 0), (1, 25, 1)])
+def test_batched_lookups(album_count, batch_size, fail):
+    runs, mismatches = check_genre_batching(album_count, batch_size, fail)
+    assert mismatches == []
+    assert [run['requests'] for run in runs] == [run['expected_requests'] for run in runs]